@@ -2,6 +2,7 @@
 
 from typing import Optional, Iterator, TYPE_CHECKING
 import re
+import time
 
 from core.agent import Agent
 from core.llm import MyAgentsLLM
@@ -105,8 +106,16 @@ class SimpleAgent(Agent):
             # 智能参数解析
             param_dict = self._parse_tool_parameters(tool_name, parameters)
 
-            # 调用工具
-            result = tool.run(param_dict)
+            # 调用工具（记录延迟、错误与载荷大小）
+            start = time.perf_counter()
+            try:
+                result = tool.run(param_dict)
+            except Exception as e:
+                self.tool_registry.metrics.record(
+                    tool_name, param_dict, str(e), time.perf_counter() - start, error=True
+                )
+                raise
+            self.tool_registry.metrics.record(tool_name, param_dict, result, time.perf_counter() - start)
             return f"🔧 工具 {tool_name} 执行结果：\n{result}"
 
         except Exception as e:
@@ -9,6 +9,8 @@
 
 # Memory Core Layer (记忆核心层)
 from .manager import MemoryManager
+from .maintenance import MaintenanceScheduler
+from .pool import MemoryManagerPool, get_memory_manager
 
 # Memory Types Layer (记忆类型层)
 from .types.working import WorkingMemory
@@ -24,6 +26,9 @@ from .base import MemoryItem, MemoryConfig, BaseMemory
 __all__ = [
     # Core Layer
     "MemoryManager",
+    "MaintenanceScheduler",
+    "MemoryManagerPool",
+    "get_memory_manager",
 
     # Memory Types
     "WorkingMemory",
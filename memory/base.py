@@ -7,10 +7,17 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
+import hashlib
+import logging
+import re
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
+_UNSAFE_PATH_CHARS_RE = re.compile(r"[^\w.-]+")
+
 
 class MemoryItem(BaseModel):
     """记忆项数据结构"""
@@ -45,6 +52,66 @@ class MemoryConfig(BaseModel):
     # 感知记忆特定配置
     perceptual_memory_modalities: List[str] = ["text", "image", "audio", "video"]
 
+    # 跨类型检索配置：并发线程数与各类型截止时间（秒），超时的类型返回部分结果
+    retrieval_max_workers: int = 4
+    retrieval_deadlines: Dict[str, float] = {"working": 1.0, "episodic": 3.0, "semantic": 5.0}
+    retrieval_default_deadline: float = 3.0
+
+    # 批量写入配置：嵌入批大小（None 表示按嵌入提供商上限）与向量 upsert 批大小
+    embedding_batch_size: Optional[int] = None
+    vector_upsert_batch_size: int = 256
+
+    # 后台维护调度（整合、过期、容量遗忘），默认关闭
+    maintenance_enabled: bool = False
+    maintenance_interval_seconds: float = 300.0
+    maintenance_item_watermark: Optional[int] = None  # 新写入条数达到该值时提前触发
+    maintenance_token_watermark: Optional[int] = None  # 新写入token数达到该值时提前触发
+    maintenance_ops_per_second: float = 20.0  # 维护操作限速（每秒迁移/删除的记忆条数）
+    maintenance_idle_wait_seconds: float = 2.0  # 有检索进行时最多等待的时间
+    maintenance_consolidate_threshold: float = 0.7
+    maintenance_forget_threshold: float = 0.1
+    maintenance_forget_max_age_days: Optional[int] = 30  # 长期记忆的保存天数，None 表示不按时间过期
+
+    # 写后模式：情景/语义记忆写入先追加到本地日志并立即确认，后台分批写入存储
+    write_behind_enabled: bool = False
+    write_behind_batch_size: int = 64
+    write_behind_flush_interval: float = 0.5
+    write_behind_max_backoff: float = 60.0
+    write_behind_max_attempts: int = 8
+    write_behind_fsync: bool = True
+    write_behind_settle_timeout: float = 10.0  # 更新/删除未写入记忆时等待写入的时间
+
+    # 情景记忆：SQLite 为权威存储，进程内只保留有界 LRU 缓存
+    episodic_cache_size: int = 2000
+    episodic_page_size: int = 500  # 全量遍历时每页从SQLite加载的条数
+    episodic_prefetch_sessions: int = 0  # 启动时预加载最近的会话数
+
+    # 会话压缩：已结束的会话中低重要性情景合并为摘要情景，原文归档后移出索引
+    compaction_enabled: bool = False  # 是否纳入后台维护
+    compaction_min_age_days: float = 7.0  # 会话最近活动早于该天数才视为已结束
+    compaction_max_importance: float = 0.5  # 重要性不高于该值的情景才会被压缩
+    compaction_min_session_size: int = 20  # 会话情景数达到该值才压缩
+    compaction_summary_sentences: int = 5  # 抽取式摘要保留的句子数
+    compaction_archive_dir: Optional[str] = None  # 归档目录（默认 storage_path/archive）
+
+    # 语义记忆图谱异步增强：写入只做嵌入与向量入库，实体/关系抽取与Neo4j写入由后台队列分批完成
+    semantic_async_enrichment: bool = False
+    semantic_enrichment_batch_size: int = 32  # 每批增强的记忆数（同时作为 nlp.pipe 的批大小）
+    semantic_enrichment_flush_interval: float = 0.5
+    semantic_enrichment_max_attempts: int = 3
+
+
+def safe_path_component(value: str) -> str:
+    """把用户ID等外部输入转换为安全的文件名片段
+
+    只保留字母数字（含中文）、下划线、点与连字符；发生替换时追加原值摘要，避免不同ID映射到同一文件。
+    """
+    cleaned = _UNSAFE_PATH_CHARS_RE.sub("_", value or "").strip("._")[:64]
+    if cleaned and cleaned == value:
+        return cleaned
+    digest = hashlib.blake2b((value or "").encode("utf-8"), digest_size=4).hexdigest()
+    return f"{cleaned or 'id'}_{digest}"
+
 
 class BaseMemory(ABC):
     """记忆基类
@@ -56,6 +123,31 @@ class BaseMemory(ABC):
         self.config = config
         self.storage = storage_backend
         self.memory_type = self.__class__.__name__.lower().replace("memory", "")
+        # 记忆被删除（含过期、遗忘、容量淘汰）时的回调，由 MemoryManager 用于同步路由索引
+        self.removal_listener: Optional[Callable[[str], None]] = None
+        # 批量删除的回调（未设置时逐条调用 removal_listener）
+        self.batch_removal_listener: Optional[Callable[[List[str]], None]] = None
+
+    def _notify_removed(self, memory_id: str):
+        """通知记忆已被删除"""
+        if self.removal_listener is not None:
+            try:
+                self.removal_listener(memory_id)
+            except Exception as e:
+                logger.warning(f"删除回调失败 {memory_id}: {e}", exc_info=True)
+
+    def _notify_removed_batch(self, memory_ids: List[str]):
+        """通知一批记忆已被删除"""
+        if not memory_ids:
+            return
+        if self.batch_removal_listener is not None:
+            try:
+                self.batch_removal_listener(memory_ids)
+            except Exception as e:
+                logger.warning(f"批量删除回调失败 ({len(memory_ids)} 条): {e}", exc_info=True)
+            return
+        for memory_id in memory_ids:
+            self._notify_removed(memory_id)
 
     @abstractmethod
     def add(self, memory_item: MemoryItem) -> str:
@@ -69,6 +161,29 @@ class BaseMemory(ABC):
         """
         pass
 
+    def add_batch(
+            self,
+            memory_items: List[MemoryItem],
+            embeddings: Optional[List[Any]] = None
+    ) -> List[Optional[str]]:
+        """批量添加记忆项（默认逐条添加，子类可覆盖为批量写入）
+
+        Args:
+            memory_items: 记忆项列表
+            embeddings: 与记忆项对齐的已有向量（None 表示需要计算；不使用向量的类型忽略）
+
+        Returns:
+            与输入对齐的错误信息列表，None 表示添加成功
+        """
+        errors: List[Optional[str]] = []
+        for memory_item in memory_items:
+            try:
+                self.add(memory_item)
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e))
+        return errors
+
     @abstractmethod
     def retrieve(self, query: str, limit: int = 5, **kwargs) -> List[MemoryItem]:
         """检索相关记忆
@@ -111,6 +226,28 @@ class BaseMemory(ABC):
         """
         pass
 
+    def get_embeddings(self, memory_ids: List[str]) -> Dict[str, Any]:
+        """批量取回已有向量（记忆整合时随记忆一起迁移），默认没有向量
+
+        Args:
+            memory_ids: 记忆ID列表
+
+        Returns:
+            memory_id -> 向量（没有向量的ID不出现在结果中）
+        """
+        return {}
+
+    def remove_batch(self, memory_ids: List[str]) -> List[str]:
+        """批量删除记忆（默认逐条删除，子类可覆盖为批量删除）
+
+        Args:
+            memory_ids: 记忆ID列表
+
+        Returns:
+            实际删除的记忆ID列表
+        """
+        return [memory_id for memory_id in dict.fromkeys(memory_ids) if self.remove(memory_id)]
+
     @abstractmethod
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在
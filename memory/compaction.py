@@ -0,0 +1,232 @@
+"""情景记忆会话压缩
+
+长期运行的用户会在每个会话中积累大量低重要性情景，撑大 Qdrant / SQLite 与检索候选集。
+压缩任务把已结束会话中的低重要性情景合并为一条摘要情景：
+- 摘要默认抽取式（按会话内词频与重要性挑选句子），也可传入 LLM 摘要器
+- 原始情景完整写入归档文件（JSONL 冷存储）后，从 SQLite / Qdrant 批量删除
+- 通过会话空闲时间、重要性上限与会话大小控制压缩范围
+"""
+
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+from collections import Counter
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import re
+import uuid
+
+from .base import MemoryItem, safe_path_component
+from .indexes import tokenize
+
+if TYPE_CHECKING:
+    from .types.episodic import EpisodicMemory
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[List[Dict[str, Any]]], str]
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[。！？!?])|(?<=\.)\s+|\n+")
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text or "") if s and s.strip()]
+
+
+def extractive_summary(docs: List[Dict[str, Any]], max_sentences: int = 5) -> str:
+    """抽取式摘要：按会话内词频（乘以所在情景的重要性）给句子打分，按时间顺序输出得分最高的句子"""
+    sentences = []  # (位置, 句子, 重要性)
+    for doc in docs:
+        for sentence in _split_sentences(doc["content"]):
+            sentences.append((len(sentences), sentence, float(doc.get("importance", 0.5))))
+    if not sentences:
+        return ""
+
+    frequency = Counter(term for _, sentence, _ in sentences for term in tokenize(sentence))
+    scored = []
+    seen = set()
+    for position, sentence, importance in sentences:
+        if sentence in seen:
+            continue
+        seen.add(sentence)
+        terms = tokenize(sentence)
+        if not terms:
+            continue
+        score = sum(frequency[t] for t in terms) / len(terms) * (0.5 + importance)
+        scored.append((score, position, sentence))
+
+    top = sorted(scored, key=lambda x: (-x[0], x[1]))[:max(1, max_sentences)]
+    return " ".join(sentence for _, _, sentence in sorted(top, key=lambda x: x[1]))
+
+
+def llm_summarizer(llm=None, max_chars: int = 8000) -> Summarizer:
+    """构造基于 LLM 的摘要器（llm 需提供 invoke(messages)，默认使用 MyAgentsLLM）"""
+
+    def summarize(docs: List[Dict[str, Any]]) -> str:
+        client = llm
+        if client is None:
+            from ..core.llm import MyAgentsLLM
+            client = MyAgentsLLM()
+        lines = []
+        used = 0
+        for doc in docs:
+            line = f"[{datetime.fromtimestamp(doc['timestamp']).isoformat()}] {doc['content']}"
+            if used + len(line) > max_chars:
+                break
+            lines.append(line)
+            used += len(line)
+        prompt = (
+            "请将以下同一会话中的交互记录压缩为一段简洁的摘要，保留关键事实、决定和结果，"
+            "不要编造内容：\n\n" + "\n".join(lines)
+        )
+        return (client.invoke([{"role": "user", "content": prompt}]) or "").strip()
+
+    return summarize
+
+
+def _session_docs(episodic: "EpisodicMemory", user_id: str, session_id: str) -> List[Dict[str, Any]]:
+    """按时间正序读取会话的全部情景记录（键集分页）"""
+    docs: List[Dict[str, Any]] = []
+    cursor = None
+    while True:
+        page = episodic.doc_store.list_memories(
+            user_id=user_id,
+            memory_type="episodic",
+            session_id=session_id,
+            after=cursor,
+            order="oldest",
+            limit=episodic.page_size
+        )
+        docs.extend(page)
+        if len(page) < episodic.page_size:
+            return docs
+        cursor = (page[-1]["timestamp"], page[-1]["memory_id"])
+
+
+def _candidate_sessions(
+        episodic: "EpisodicMemory",
+        user_id: Optional[str],
+        cutoff: int,
+        min_session_size: int,
+        max_importance: float,
+        page_size: int
+):
+    """按最近活动时间游标分页遍历可压缩的会话
+
+    只返回低重要性情景至少两条的会话：已压缩的会话只剩一条低重要性摘要，不会被反复读取；
+    游标分页保证排在前面但无可压缩内容的会话不会挡住更早的会话。
+    """
+    cursor = None
+    while True:
+        page = episodic.doc_store.list_sessions(
+            user_id=user_id,
+            memory_type="episodic",
+            last_before=cutoff,
+            min_count=min_session_size,
+            max_importance=max_importance,
+            min_candidates=2,
+            before=cursor,
+            limit=page_size
+        )
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = (page[-1]["last_ts"], page[-1]["user_id"], page[-1]["session_id"])
+
+
+def compact_sessions(
+        episodic: "EpisodicMemory",
+        user_id: Optional[str] = None,
+        min_age_days: Optional[float] = None,
+        max_importance: Optional[float] = None,
+        min_session_size: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+        archive_dir: Optional[str] = None,
+        max_sessions: int = 100,
+        dry_run: bool = False
+) -> Dict[str, Any]:
+    """压缩已结束的会话
+
+    Args:
+        episodic: 情景记忆实例
+        user_id: 只压缩该用户的会话（None 表示全部用户）
+        min_age_days / max_importance / min_session_size: 覆盖 MemoryConfig 中的 compaction_* 配置
+        summarizer: 摘要函数，输入会话中被压缩的情景记录，返回摘要文本（默认抽取式）
+        archive_dir: 归档目录（默认 compaction_archive_dir 或 storage_path/archive）
+        max_sessions: 单次最多压缩的会话数
+        dry_run: 只统计不修改
+
+    Returns:
+        报告：处理的会话数、归档/删除的情景数、生成的摘要ID
+    """
+    config = episodic.config
+    min_age_days = config.compaction_min_age_days if min_age_days is None else min_age_days
+    max_importance = config.compaction_max_importance if max_importance is None else max_importance
+    min_session_size = config.compaction_min_session_size if min_session_size is None else min_session_size
+    archive_dir = archive_dir or config.compaction_archive_dir or os.path.join(config.storage_path, "archive")
+    max_sentences = config.compaction_summary_sentences
+
+    cutoff = int((datetime.now() - timedelta(days=min_age_days)).timestamp())
+
+    report: Dict[str, Any] = {"sessions": 0, "archived": 0, "removed": 0, "summaries": [], "dry_run": dry_run}
+    for session in _candidate_sessions(episodic, user_id, cutoff, min_session_size, max_importance, max_sessions):
+        if report["sessions"] >= max_sessions:
+            break
+        docs = _session_docs(episodic, session["user_id"], session["session_id"])
+        victims = [
+            doc for doc in docs
+            if doc["importance"] <= max_importance
+            and not (doc.get("properties") or {}).get("context", {}).get("compacted")
+        ]
+        if len(victims) < 2:
+            continue
+        report["sessions"] += 1
+        if dry_run:
+            report["archived"] += len(victims)
+            continue
+
+        try:
+            summary = summarizer(victims) if summarizer else extractive_summary(victims, max_sentences)
+        except Exception as e:
+            logger.warning(f"⚠️ 会话 {session['session_id']} 摘要失败，回退到抽取式摘要: {e}")
+            summary = extractive_summary(victims, max_sentences)
+        if not summary:
+            continue
+
+        summary_item = MemoryItem(
+            id=str(uuid.uuid4()),
+            content=summary,
+            memory_type="episodic",
+            user_id=session["user_id"],
+            timestamp=datetime.fromtimestamp(victims[-1]["timestamp"]),
+            importance=max(doc["importance"] for doc in victims),
+            metadata={
+                "session_id": session["session_id"],
+                "context": {
+                    "compacted": True,
+                    "source_count": len(victims),
+                    "source_start": datetime.fromtimestamp(victims[0]["timestamp"]).isoformat(),
+                    "source_end": datetime.fromtimestamp(victims[-1]["timestamp"]).isoformat()
+                },
+                "tags": ["session_summary"]
+            }
+        )
+
+        # 先归档原文，再写摘要，最后删除原始情景
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"episodic_{safe_path_component(session['user_id'])}.jsonl")
+        archived_at = datetime.now().isoformat()
+        with open(archive_path, "a", encoding="utf-8") as f:
+            for doc in victims:
+                record = {**doc, "archived_at": archived_at, "summary_id": summary_item.id}
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        report["archived"] += len(victims)
+
+        episodic.add(summary_item)
+        report["summaries"].append(summary_item.id)
+        report["removed"] += len(episodic.remove_batch([doc["memory_id"] for doc in victims]))
+
+    logger.info(f"会话压缩完成: {report['sessions']} 个会话, 归档 {report['archived']} 条")
+    return report
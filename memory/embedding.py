@@ -12,7 +12,7 @@
 - EMBED_BASE_URL: Embedding Base URL（统一命名，可选）
 """
 
-from typing import List, Union, Optional
+from typing import Any, List, Union, Optional
 import threading
 import os
 import numpy as np
@@ -25,6 +25,9 @@ import numpy as np
 class EmbeddingModel:
     """嵌入模型基类（最小接口）"""
 
+    # 单次请求允许的最大文本数（批量嵌入时按此切分）
+    max_batch_size: int = 64
+
     def encode(self, texts: Union[str, List[str]]):
         raise NotImplementedError
 
@@ -35,6 +38,8 @@ class EmbeddingModel:
 class TFIDFEmbedding(EmbeddingModel):
     """TF-IDF 简易兜底（在无深度模型时保证可用）"""
 
+    max_batch_size = 1024
+
     def __init__(self, max_features: int = 1000):
         self.max_features = max_features
         self._vectorizer = None
@@ -81,6 +86,9 @@ class DashScopeEmbedding(EmbeddingModel):
     - 否则使用官方 dashscope SDK 的 TextEmbedding.call。
     """
 
+    # text-embedding-v3 单次请求最多 10 条
+    max_batch_size = 10
+
     def __init__(self, model_name: str = "text-embedding-v3", api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.model_name = model_name
         self.api_key = api_key
@@ -170,6 +178,42 @@ def create_embedding_model_with_fallback(preferred_type: str = "dashscope", **kw
     raise RuntimeError("所有嵌入模型都不可用，请安装依赖或检查配置")
 
 
+def encode_in_batches(
+    texts: List[str],
+    model: Optional[EmbeddingModel] = None,
+    batch_size: Optional[int] = None
+) -> List[np.ndarray]:
+    """按提供商允许的批大小分批嵌入，返回与输入对齐的向量列表"""
+    model = model or get_text_embedder()
+    size = max(1, batch_size or getattr(model, "max_batch_size", 64))
+    vectors: List[np.ndarray] = []
+    for start in range(0, len(texts), size):
+        chunk = list(texts[start:start + size])
+        encoded = model.encode(chunk)
+        if encoded is None or len(encoded) != len(chunk):
+            raise RuntimeError(f"嵌入结果数量与输入不一致: 期望{len(chunk)}")
+        vectors.extend(np.asarray(vec) for vec in encoded)
+    return vectors
+
+
+def fill_embeddings(
+    texts: List[str],
+    embeddings: Optional[List[Optional[Any]]] = None,
+    model: Optional[EmbeddingModel] = None,
+    batch_size: Optional[int] = None
+) -> List[np.ndarray]:
+    """补全向量列表：已携带的向量直接复用，缺失（None）的一次性分批计算"""
+    vectors: List[Optional[np.ndarray]] = list(embeddings) if embeddings is not None else [None] * len(texts)
+    if len(vectors) != len(texts):
+        raise ValueError(f"向量数量与文本数量不一致: {len(vectors)} != {len(texts)}")
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    if missing:
+        encoded = encode_in_batches([texts[i] for i in missing], model=model, batch_size=batch_size)
+        for i, vec in zip(missing, encoded):
+            vectors[i] = vec
+    return [np.asarray(vec) for vec in vectors]
+
+
 # ==================
 # Provider（单例）
 # ==================
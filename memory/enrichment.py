@@ -0,0 +1,201 @@
+"""语义记忆图谱异步增强队列
+
+语义记忆写入的快速路径只做嵌入与向量入库，实体识别、依存分析、关系构建与 Neo4j 写入
+放入本队列，由后台线程分批完成：
+- 批处理：每批记忆交给 enrich_batch 回调（内部用 nlp.pipe 批量分析、UNWIND 批量写图）
+- 重试：整批失败（后端不可用）时指数退避；单条反复失败超过上限后放弃并回调 on_give_up
+- 状态：is_pending() 供检索判断记忆的图数据是否已就绪
+
+队列只在进程内，关闭时尽量处理完；未处理的记忆保持仅向量可检索的状态。
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class GraphEnrichmentQueue:
+    """图谱增强队列
+
+    Args:
+        enrich_batch: 批量增强回调，输入记忆项列表，返回与输入对齐的错误列表（None 表示成功）
+        batch_size: 每批记忆数
+        flush_interval: 无新任务时的轮询间隔（秒）
+        max_backoff: 整批失败时的最大退避时间（秒）
+        max_attempts: 单条最大尝试次数
+        on_give_up: 单条超过尝试次数后的回调 (item, error)
+    """
+
+    def __init__(
+            self,
+            enrich_batch: Callable[[List[Any]], List[Optional[str]]],
+            batch_size: int = 32,
+            flush_interval: float = 0.5,
+            max_backoff: float = 60.0,
+            max_attempts: int = 3,
+            on_give_up: Optional[Callable[[Any, str], None]] = None
+    ):
+        self.enrich_batch = enrich_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max(1, max_attempts)
+        self.on_give_up = on_give_up
+
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, Any] = {}
+        self._attempts: Dict[str, int] = {}
+        self._backoff = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"submitted": 0, "enriched": 0, "failed": 0, "batches": 0, "retries": 0}
+
+    # ==================== 提交 ====================
+
+    def submit(self, items: List[Any]):
+        """提交待增强的记忆项（同ID重复提交时以最新的为准）"""
+        if not items:
+            return
+        with self._cond:
+            for item in items:
+                self._pending.pop(item.id, None)
+                self._pending[item.id] = item
+                self._attempts.pop(item.id, None)
+            self._stats["submitted"] += len(items)
+            self._cond.notify_all()
+
+    def cancel(self, memory_ids: List[str]) -> int:
+        """撤销尚未处理的任务（记忆被删除时调用），返回撤销数"""
+        cancelled = 0
+        with self._cond:
+            for memory_id in memory_ids:
+                if self._pending.pop(memory_id, None) is not None:
+                    cancelled += 1
+                self._attempts.pop(memory_id, None)
+            self._cond.notify_all()
+        return cancelled
+
+    def is_pending(self, memory_id: str) -> bool:
+        with self._cond:
+            return memory_id in self._pending or memory_id in self._inflight
+
+    def clear(self):
+        with self._cond:
+            self._pending.clear()
+            self._attempts.clear()
+            self._cond.notify_all()
+
+    # ==================== 后台处理 ====================
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-graph-enrichment", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 10.0):
+        if flush:
+            self.flush(timeout=timeout)
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待当前所有任务处理完；超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(self.flush_interval)
+                    continue
+                batch = [self._pending.popitem(last=False)[1]
+                         for _ in range(min(self.batch_size, len(self._pending)))]
+                for item in batch:
+                    self._inflight[item.id] = item
+
+            try:
+                errors = self.enrich_batch(batch)
+            except Exception as e:
+                errors = [str(e)] * len(batch)
+
+            failed = self._settle(batch, errors)
+            if failed == len(batch):
+                self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 1.0)
+                self._stats["retries"] += 1
+                logger.warning(f"图谱增强失败，{self._backoff:.1f}s 后重试: {errors[0] if errors else ''}")
+                self._stop_event.wait(self._backoff)
+            else:
+                self._backoff = 0.0
+
+    def _settle(self, batch: List[Any], errors: List[Optional[str]]) -> int:
+        """处理一批增强结果；返回失败条数"""
+        failed = 0
+        given_up = []
+        with self._cond:
+            self._stats["batches"] += 1
+            retry = []
+            for item, error in zip(batch, errors):
+                self._inflight.pop(item.id, None)
+                if error is None:
+                    self._attempts.pop(item.id, None)
+                    self._stats["enriched"] += 1
+                    continue
+                failed += 1
+                attempts = self._attempts.get(item.id, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(item.id, None)
+                    self._stats["failed"] += 1
+                    given_up.append((item, error))
+                else:
+                    self._attempts[item.id] = attempts
+                    retry.append(item)
+
+            # 失败条目放回队首（处理期间被重新提交的以新提交为准，尝试次数重新计算）
+            if retry:
+                remaining = list(self._pending.items())
+                resubmitted = set(self._pending)
+                self._pending.clear()
+                for item in retry:
+                    if item.id in resubmitted:
+                        self._attempts.pop(item.id, None)
+                    else:
+                        self._pending[item.id] = item
+                self._pending.update(remaining)
+            self._cond.notify_all()
+
+        for item, error in given_up:
+            logger.warning(f"⚠️ 放弃图谱增强 {item.id}: {error}")
+            if self.on_give_up is not None:
+                try:
+                    self.on_give_up(item, error)
+                except Exception:
+                    pass
+        return failed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._pending) + len(self._inflight),
+                "backoff": self._backoff,
+                "running": self._thread is not None and self._thread.is_alive()
+            }
@@ -0,0 +1,81 @@
+"""集合式遗忘引擎
+
+各记忆类型共用的遗忘筛选：把候选记忆的重要性、时间戳整理为 NumPy 列，
+一次向量化计算选出全部待删除记忆，再交给记忆类型的 remove_batch 批量删除
+（SQLite 单条 DELETE ... IN、Qdrant 单次按 memory_id 过滤删除、Neo4j UNWIND 删除），
+内存结构只重建一次，避免逐条删除与逐条比较带来的 O(n²) 开销。
+"""
+
+from typing import Iterable, List, Optional, Tuple
+from datetime import datetime
+
+import numpy as np
+
+STRATEGIES = ("importance_based", "time_based", "capacity_based")
+
+
+def to_columns(rows: Iterable[Tuple[str, float, float]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """把 (memory_id, importance, timestamp秒) 行整理为 ID 列表与两列数组"""
+    ids: List[str] = []
+    importance: List[float] = []
+    timestamps: List[float] = []
+    for memory_id, imp, ts in rows:
+        ids.append(memory_id)
+        importance.append(imp)
+        timestamps.append(ts)
+    return ids, np.asarray(importance, dtype=np.float64), np.asarray(timestamps, dtype=np.float64)
+
+
+def select_victims(
+        importance: np.ndarray,
+        timestamps: np.ndarray,
+        strategy: str = "importance_based",
+        threshold: float = 0.1,
+        max_age_days: float = 30,
+        capacity: Optional[int] = None,
+        now: Optional[datetime] = None
+) -> np.ndarray:
+    """一次向量化选出待遗忘记忆的位置
+
+    Args:
+        importance: 按位置排列的重要性
+        timestamps: 按位置排列的时间戳（秒）
+        strategy: importance_based（重要性低于阈值）/ time_based（早于 max_age_days）/
+            capacity_based（超出 capacity 的部分，保留最重要的；同重要性先删较旧的）
+        threshold: 重要性阈值
+        max_age_days: 最大保存天数
+        capacity: 容量上限（capacity_based 使用）
+        now: 当前时间（批量计算共用）
+
+    Returns:
+        待删除记忆的位置数组（升序）
+    """
+    n = len(importance)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if strategy == "importance_based":
+        return np.flatnonzero(importance < threshold)
+
+    if strategy == "time_based":
+        cutoff = (now or datetime.now()).timestamp() - max_age_days * 24 * 3600
+        return np.flatnonzero(timestamps < cutoff)
+
+    if strategy == "capacity_based":
+        excess = n - (capacity if capacity is not None else n)
+        if excess <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if excess >= n:
+            return np.arange(n)
+        # 按 (重要性, 时间戳) 字典序取最小的 excess 个：先用 argpartition 在重要性上取候选，
+        # 再在分界值上按时间戳补足，整体 O(n)
+        part = np.argpartition(importance, excess - 1)
+        boundary = importance[part[excess - 1]]
+        below = np.flatnonzero(importance < boundary)
+        ties = np.flatnonzero(importance == boundary)
+        need = excess - below.size
+        if need < ties.size:
+            ties = ties[np.argpartition(timestamps[ties], need - 1)[:need]]
+        return np.sort(np.concatenate([below, ties]))
+
+    return np.zeros(0, dtype=np.int64)
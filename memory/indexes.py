@@ -0,0 +1,300 @@
+"""记忆检索用的内存索引
+
+- BM25Index：增量维护的 BM25 倒排索引，增删改只触及文档自身的词项，
+  查询只对倒排表命中的候选文档打分，耗时取决于命中数而不是总文档数
+- ColumnStore：工作记忆的列式存储（时间戳、重要性、token数、用户、倒排词项矩阵），
+  打分与遗忘筛选以 NumPy 向量化方式一次完成
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional
+from collections import Counter
+import math
+import re
+
+import numpy as np
+
+# 拉丁字母/数字按词切分；中日韩文字无空格分词，按单字 + 相邻二元组切分
+_WORD_RE = re.compile(r"[a-z0-9_]+|[぀-ヿ㐀-䶿一-鿿가-힯]+")
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def tokenize(text: str) -> List[str]:
+    """检索分词：小写化，拉丁文按词，中日韩文按单字与二元组"""
+    tokens: List[str] = []
+    for run in _WORD_RE.findall((text or "").lower()):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class BM25Index:
+    """增量 BM25 倒排索引
+
+    Args:
+        k1: 词频饱和参数
+        b: 文档长度归一化参数
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}  # term -> {doc_id: tf}
+        self.doc_terms: Dict[Hashable, Counter] = {}  # doc_id -> 词频（删除时定位倒排表）
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: Hashable, text: str):
+        """添加文档（已存在则替换）"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def update(self, doc_id: Hashable, text: str):
+        self.add(doc_id, text)
+
+    def remove(self, doc_id: Hashable) -> bool:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+        return True
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_terms.clear()
+        self.doc_lengths.clear()
+        self.total_length = 0
+
+    def search(self, query: str, allowed: Optional[Iterable[Hashable]] = None) -> Dict[Hashable, float]:
+        """对命中查询词的候选文档打分
+
+        Args:
+            query: 查询文本
+            allowed: 可选的文档ID白名单
+
+        Returns:
+            doc_id -> BM25 分数（仅包含候选文档）
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return {}
+        allowed_set = set(allowed) if allowed is not None else None
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                if allowed_set is not None and doc_id not in allowed_set:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def score_array(self, query: str, doc_lengths: np.ndarray) -> np.ndarray:
+        """向量化打分（文档ID须为 [0, len(doc_lengths)) 内的整数槽位）
+
+        Args:
+            query: 查询文本
+            doc_lengths: 按槽位排列的文档长度
+
+        Returns:
+            按槽位排列的 BM25 分数，未命中的槽位为 0
+        """
+        scores = np.zeros(len(doc_lengths), dtype=np.float64)
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return scores
+        avg_length = self.total_length / n_docs or 1.0
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            slots = np.fromiter(posting.keys(), dtype=np.int64, count=df)
+            tfs = np.fromiter(posting.values(), dtype=np.float64, count=df)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[slots] / avg_length)
+            scores[slots] += qtf * idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+
+class ColumnStore:
+    """列式记忆存储（struct-of-arrays）
+
+    每条记忆占一个整数槽位，各属性存放在按槽位排列的 NumPy 数组中；
+    删除的槽位进入空闲列表复用。倒排词项矩阵由以槽位为文档ID的 BM25Index 承担。
+
+    Args:
+        initial_capacity: 初始槽位数（不足时倍增）
+    """
+
+    def __init__(self, initial_capacity: int = 64):
+        self.index = BM25Index()
+        self.slot_of: Dict[str, int] = {}
+        self.ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._user_codes: Dict[str, int] = {}
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int):
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.importance = np.zeros(capacity, dtype=np.float64)
+        self.tokens = np.zeros(capacity, dtype=np.int64)
+        self.doc_lengths = np.zeros(capacity, dtype=np.float64)
+        self.users = np.full(capacity, -1, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.forgotten = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        capacity = len(self.timestamps) * 2
+        for name in ("timestamps", "importance", "tokens", "doc_lengths", "users", "alive", "forgotten"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            if name == "users":
+                new.fill(-1)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self.slot_of
+
+    @property
+    def size(self) -> int:
+        """已使用过的槽位数（数组有效前缀长度）"""
+        return len(self.ids)
+
+    def user_code(self, user_id: str) -> int:
+        return self._user_codes.setdefault(user_id, len(self._user_codes))
+
+    def add(
+            self,
+            memory_id: str,
+            content: str,
+            timestamp: float,
+            importance: float,
+            user_id: str,
+            tokens: int,
+            forgotten: bool = False
+    ) -> int:
+        """写入一条记忆，返回槽位（已存在则替换）"""
+        self.remove(memory_id)
+        if self._free:
+            slot = self._free.pop()
+            self.ids[slot] = memory_id
+        else:
+            slot = len(self.ids)
+            if slot >= len(self.timestamps):
+                self._grow()
+            self.ids.append(memory_id)
+        self.slot_of[memory_id] = slot
+        self.index.add(slot, content)
+        self.timestamps[slot] = timestamp
+        self.importance[slot] = importance
+        self.tokens[slot] = tokens
+        self.doc_lengths[slot] = self.index.doc_lengths[slot]
+        self.users[slot] = self.user_code(user_id)
+        self.alive[slot] = True
+        self.forgotten[slot] = forgotten
+        return slot
+
+    def update(
+            self,
+            memory_id: str,
+            content: Optional[str] = None,
+            importance: Optional[float] = None,
+            tokens: Optional[int] = None,
+            forgotten: Optional[bool] = None
+    ) -> bool:
+        slot = self.slot_of.get(memory_id)
+        if slot is None:
+            return False
+        if content is not None:
+            self.index.update(slot, content)
+            self.doc_lengths[slot] = self.index.doc_lengths[slot]
+        if importance is not None:
+            self.importance[slot] = importance
+        if tokens is not None:
+            self.tokens[slot] = tokens
+        if forgotten is not None:
+            self.forgotten[slot] = forgotten
+        return True
+
+    def remove(self, memory_id: str) -> bool:
+        slot = self.slot_of.pop(memory_id, None)
+        if slot is None:
+            return False
+        self.index.remove(slot)
+        self.ids[slot] = None
+        self.alive[slot] = False
+        self.forgotten[slot] = False
+        self._free.append(slot)
+        return True
+
+    def clear(self):
+        self.index.clear()
+        self.slot_of.clear()
+        self.ids.clear()
+        self._free.clear()
+        self._user_codes.clear()
+        self._allocate(len(self.timestamps))
+
+    def mask(self, user_id: Optional[str] = None, include_forgotten: bool = False) -> np.ndarray:
+        """有效槽位掩码（长度为 size）"""
+        n = self.size
+        mask = self.alive[:n].copy()
+        if not include_forgotten:
+            mask &= ~self.forgotten[:n]
+        if user_id:
+            code = self._user_codes.get(user_id)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= self.users[:n] == code
+        return mask
+
+    def bm25(self, query: str) -> np.ndarray:
+        """按槽位排列的 BM25 分数（长度为 size）"""
+        return self.index.score_array(query, self.doc_lengths[:self.size])
+
+    def ids_at(self, slots: Iterable[int]) -> List[str]:
+        return [self.ids[slot] for slot in slots]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回分数最高的 k 个正分位置（降序），k 较小时用 argpartition 避免全量排序"""
+    positive = np.flatnonzero(scores > 0)
+    if k <= 0 or positive.size == 0:
+        return positive[:0]
+    if positive.size > k:
+        part = np.argpartition(-scores[positive], k - 1)[:k]
+        positive = positive[part]
+    return positive[np.argsort(-scores[positive], kind="stable")]
@@ -0,0 +1,329 @@
+"""写后日志（write-behind journal）
+
+记忆写入先追加到本地只追加日志（JSONL）并立即确认，后台线程再分批写入
+SQLite / Qdrant / Neo4j：
+- 检查点：记录已写入存储的最大连续序号，重启时重放检查点之后的条目
+- 确认记录：检查点之后乱序完成（写入成功或移入死信）的条目追加 ack 记录，重放时跳过，
+  不依赖 apply_batch 的幂等性
+- 重试：整批失败（后端不可用）时指数退避；单条反复失败超过上限后移入死信文件
+- 覆盖层：尚未写入存储的条目可通过 pending_entries() 被读取方看到
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindJournal:
+    """写后日志
+
+    Args:
+        journal_path: 日志文件路径（检查点与死信文件放在同一目录）
+        apply_batch: 批量写入回调，返回与输入对齐的错误列表（None 表示成功）
+        batch_size: 每批写入条数
+        flush_interval: 无新写入时的轮询间隔（秒）
+        max_backoff: 整批失败时的最大退避时间（秒）
+        max_attempts: 单条最大尝试次数，超过后移入死信文件
+        fsync: 追加后是否 fsync（关闭可提升吞吐，但掉电可能丢失最近的写入）
+        compact_bytes: 日志全部写入后超过该大小则截断
+    """
+
+    def __init__(
+            self,
+            journal_path: str,
+            apply_batch: Callable[[List[Dict[str, Any]]], List[Optional[str]]],
+            batch_size: int = 64,
+            flush_interval: float = 0.5,
+            max_backoff: float = 60.0,
+            max_attempts: int = 8,
+            fsync: bool = True,
+            compact_bytes: int = 4 * 1024 * 1024
+    ):
+        self.journal_path = journal_path
+        self.checkpoint_path = journal_path + ".checkpoint"
+        self.dead_letter_path = journal_path + ".dead"
+        self.apply_batch = apply_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._attempts: Dict[str, int] = {}
+        self._seq = 0
+        self._checkpoint = 0
+        self._backoff = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"appended": 0, "applied": 0, "retries": 0, "dead_lettered": 0, "replayed": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        self._replay()
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    # ==================== 持久化 ====================
+
+    def _replay(self):
+        """读取检查点并重放其后的条目"""
+        if os.path.exists(self.checkpoint_path):
+            try:
+                with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                    self._checkpoint = int(json.load(f).get("seq", 0))
+            except Exception as e:
+                logger.warning(f"读取写后日志检查点失败，将重放全部日志: {e}")
+        self._seq = self._checkpoint
+
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下半行，跳过
+                    logger.warning("写后日志存在损坏的行，已跳过")
+                    continue
+                self._seq = max(self._seq, record.get("seq", 0))
+                if record.get("seq", 0) <= self._checkpoint:
+                    continue
+                op = record.get("op")
+                if op == "cancel":
+                    self._pending.pop(record["id"], None)
+                elif op == "ack":
+                    pending = self._pending.get(record["id"])
+                    if pending is not None and pending.get("seq") == record.get("ref"):
+                        self._pending.pop(record["id"])
+                else:
+                    self._pending[record["id"]] = record
+        self._stats["replayed"] = len(self._pending)
+        if self._pending:
+            logger.info(f"写后日志重放 {len(self._pending)} 条未写入的记忆")
+
+    def _write_record(self, record: Dict[str, Any]):
+        self._write_records([record])
+
+    def _write_records(self, records: List[Dict[str, Any]]):
+        """追加多条记录（一次 flush / fsync）"""
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _save_checkpoint(self, seq: int):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._checkpoint = seq
+
+    def _maybe_compact(self):
+        """全部写入后截断日志（调用方持有锁）"""
+        if self._pending or self._inflight:
+            return
+        if self._file.tell() < self.compact_bytes:
+            return
+        self._file.close()
+        self._file = open(self.journal_path, "w", encoding="utf-8")
+        logger.debug("写后日志已截断")
+
+    def _dead_letter(self, record: Dict[str, Any], error: str):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**record, "error": error}, ensure_ascii=False, default=str) + "\n")
+        self._stats["dead_lettered"] += 1
+        logger.error(f"记忆 {record['id']} 多次写入失败，已移入死信文件: {error}")
+
+    # ==================== 写入接口 ====================
+
+    def append(self, entry: Dict[str, Any]) -> str:
+        """追加一条写入并立即返回记忆ID"""
+        with self._cond:
+            self._seq += 1
+            record = {"op": "add", "seq": self._seq, **entry}
+            self._write_record(record)
+            self._pending[entry["id"]] = record
+            self._stats["appended"] += 1
+            self._cond.notify_all()
+        return entry["id"]
+
+    def append_many(self, entries: List[Dict[str, Any]]) -> List[str]:
+        """批量追加（一次 fsync）"""
+        if not entries:
+            return []
+        with self._cond:
+            records = []
+            for entry in entries:
+                self._seq += 1
+                record = {"op": "add", "seq": self._seq, **entry}
+                records.append(record)
+                self._pending[entry["id"]] = record
+            self._write_records(records)
+            self._stats["appended"] += len(entries)
+            self._cond.notify_all()
+        return [entry["id"] for entry in entries]
+
+    def cancel(self, memory_id: str) -> bool:
+        """取消尚未开始写入的条目；已在写入中的条目返回 False"""
+        with self._cond:
+            if memory_id not in self._pending:
+                return False
+            self._pending.pop(memory_id)
+            self._attempts.pop(memory_id, None)
+            self._seq += 1
+            self._write_record({"op": "cancel", "seq": self._seq, "id": memory_id})
+            self._cond.notify_all()
+            return True
+
+    def is_pending(self, memory_id: str) -> bool:
+        with self._cond:
+            return memory_id in self._pending or memory_id in self._inflight
+
+    def pending_entries(self) -> List[Dict[str, Any]]:
+        """尚未写入存储的条目（含正在写入的），供读取方做覆盖层"""
+        with self._cond:
+            return list(self._inflight.values()) + list(self._pending.values())
+
+    def clear(self):
+        """丢弃全部未写入条目并截断日志"""
+        with self._cond:
+            self._pending.clear()
+            self._attempts.clear()
+            self._file.close()
+            self._file = open(self.journal_path, "w", encoding="utf-8")
+            self._save_checkpoint(self._seq)
+            self._cond.notify_all()
+
+    # ==================== 后台写入 ====================
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 10.0):
+        if flush:
+            self.flush(timeout=timeout)
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        with self._cond:
+            self._file.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待当前所有条目写入存储；超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(self.flush_interval)
+                    continue
+                batch = [self._pending.popitem(last=False)[1]
+                         for _ in range(min(self.batch_size, len(self._pending)))]
+                for record in batch:
+                    self._inflight[record["id"]] = record
+
+            try:
+                errors = self.apply_batch([self._strip(record) for record in batch])
+            except Exception as e:
+                errors = [str(e)] * len(batch)
+
+            failed = self._settle(batch, errors)
+            if failed == len(batch):
+                # 整批失败，多半是后端不可用：指数退避后重试
+                self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 1.0)
+                self._stats["retries"] += 1
+                logger.warning(f"写后日志写入失败，{self._backoff:.1f}s 后重试: {errors[0] if errors else ''}")
+                self._stop_event.wait(self._backoff)
+            else:
+                self._backoff = 0.0
+
+    @staticmethod
+    def _strip(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in record.items() if k not in ("op", "seq")}
+
+    def _settle(self, batch: List[Dict[str, Any]], errors: List[Optional[str]]) -> int:
+        """处理一批写入结果，推进检查点；返回失败条数"""
+        failed = 0
+        with self._cond:
+            retry: List[Dict[str, Any]] = []
+            finished: List[Dict[str, Any]] = []
+            for record, error in zip(batch, errors):
+                self._inflight.pop(record["id"], None)
+                if error is None:
+                    self._attempts.pop(record["id"], None)
+                    self._stats["applied"] += 1
+                    finished.append(record)
+                    continue
+                failed += 1
+                attempts = self._attempts.get(record["id"], 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(record["id"], None)
+                    self._dead_letter(record, error)
+                    finished.append(record)
+                else:
+                    self._attempts[record["id"]] = attempts
+                    retry.append(record)
+
+            # 失败条目放回队首，保持写入顺序
+            if retry:
+                remaining = list(self._pending.items())
+                self._pending.clear()
+                for record in retry:
+                    self._pending[record["id"]] = record
+                self._pending.update(remaining)
+
+            # 检查点推进到最早未完成条目之前
+            unfinished = [r["seq"] for r in self._pending.values()] + [r["seq"] for r in self._inflight.values()]
+            checkpoint = (min(unfinished) - 1) if unfinished else self._seq
+            # 检查点之后已完成的条目写确认记录，重放时不会再次写入
+            acks = []
+            for record in finished:
+                if record["seq"] > checkpoint:
+                    self._seq += 1
+                    acks.append({"op": "ack", "seq": self._seq, "id": record["id"], "ref": record["seq"]})
+            if acks:
+                self._write_records(acks)
+            if checkpoint > self._checkpoint:
+                self._save_checkpoint(checkpoint)
+            self._maybe_compact()
+            self._cond.notify_all()
+        return failed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._pending) + len(self._inflight),
+                "checkpoint": self._checkpoint,
+                "seq": self._seq,
+                "backoff": self._backoff,
+                "running": self._thread is not None and self._thread.is_alive()
+            }
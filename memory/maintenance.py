@@ -0,0 +1,220 @@
+"""后台记忆维护调度器
+
+在后台线程中周期性执行记忆维护：
+- 工作记忆过期清理
+- 记忆整合（工作记忆 -> 情景记忆）
+- 长期记忆过期（超过 maintenance_forget_max_age_days）与基于容量的遗忘
+- 会话压缩（可选）
+
+触发方式：固定周期，或写入量达到水位线（条数 / token 数）时提前触发。
+维护操作经令牌桶限速，并在有交互式检索进行时让路，避免与检索争抢 I/O。
+"""
+
+from typing import Any, Dict, Optional, TYPE_CHECKING
+import logging
+import threading
+import time
+
+if TYPE_CHECKING:
+    from .manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限速器（允许透支，透支部分由后续等待偿还）"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = max(rate, 1e-6)
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def consume(self, amount: float = 1.0):
+        """直接扣除令牌（可透支）"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+    def acquire(self, amount: float = 1.0, stop_event: Optional[threading.Event] = None) -> bool:
+        """阻塞直到获得令牌；stop_event 置位时放弃并返回 False"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait_seconds = (amount - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait_seconds):
+                    return False
+            else:
+                time.sleep(wait_seconds)
+
+
+class MaintenanceScheduler:
+    """记忆维护调度器（守护线程）
+
+    由 MemoryManager.start_maintenance() 创建；参数取自 MemoryConfig 的 maintenance_* 配置。
+    """
+
+    def __init__(self, manager: "MemoryManager"):
+        self.manager = manager
+        config = manager.config
+        self.interval = config.maintenance_interval_seconds
+        self.item_watermark = config.maintenance_item_watermark
+        self.token_watermark = config.maintenance_token_watermark
+        self.idle_wait = config.maintenance_idle_wait_seconds
+        self.bucket = TokenBucket(config.maintenance_ops_per_second)
+
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending_lock = threading.Lock()
+        self._pending_items = 0
+        self._pending_tokens = 0
+
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.last_report: Dict[str, Any] = {}
+
+    # ==================== 生命周期 ====================
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="memory-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(f"记忆维护调度器已启动，周期 {self.interval}s")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("记忆维护调度器已停止")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ==================== 触发 ====================
+
+    def note_writes(self, items: int, tokens: int):
+        """记录新写入；达到水位线时唤醒调度线程"""
+        with self._pending_lock:
+            self._pending_items += items
+            self._pending_tokens += tokens
+            reached = (
+                (self.item_watermark is not None and self._pending_items >= self.item_watermark) or
+                (self.token_watermark is not None and self._pending_tokens >= self.token_watermark)
+            )
+        if reached:
+            self._wake_event.set()
+
+    def trigger(self):
+        """立即触发一次维护"""
+        self._wake_event.set()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            woke = self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.run_once(reason="watermark" if woke else "interval")
+            except Exception as e:
+                logger.warning(f"记忆维护失败: {e}")
+
+    # ==================== 执行 ====================
+
+    def _yield_to_retrieval(self) -> bool:
+        """有交互式检索时等待其完成（最多 idle_wait 秒）；调度器停止时返回 False"""
+        deadline = time.monotonic() + self.idle_wait
+        while self.manager.active_retrievals > 0 and time.monotonic() < deadline:
+            if self._stop_event.wait(0.05):
+                return False
+        return not self._stop_event.is_set()
+
+    def _step(self, cost: float = 1.0) -> bool:
+        """每个维护步骤前：先让路给检索，再申请令牌"""
+        return self._yield_to_retrieval() and self.bucket.acquire(cost, self._stop_event)
+
+    def run_once(self, reason: str = "manual") -> Dict[str, Any]:
+        """执行一轮维护，返回报告"""
+        with self._pending_lock:
+            self._pending_items = 0
+            self._pending_tokens = 0
+
+        config = self.manager.config
+        start = time.perf_counter()
+        report: Dict[str, Any] = {"reason": reason, "expired": 0, "consolidated": 0, "forgotten": 0}
+
+        # 1) 工作记忆过期清理（纯内存，代价低）
+        if self.manager.memory_types.get("working") is not None and self._step():
+            report["expired"] = self.manager.expire_working_memories()
+
+        # 2) 记忆整合：按批迁移，每条消耗一个令牌
+        if self.manager.memory_types.get("working") and self.manager.memory_types.get("episodic"):
+            report["consolidated"] = self.manager.consolidate_memories(
+                from_type="working",
+                to_type="episodic",
+                importance_threshold=config.maintenance_consolidate_threshold,
+                step=self._step
+            )
+
+        # 3) 遗忘：长期记忆先按保存天数过期，再按容量遗忘；按类型执行，实际删除量计入令牌（允许透支）
+        passes = ["capacity_based"]
+        if config.maintenance_forget_max_age_days is not None:
+            passes.insert(0, "time_based")
+        steps = [
+            (memory_type, strategy)
+            for memory_type in list(self.manager.memory_types)
+            for strategy in passes
+            if not (strategy == "time_based" and memory_type == "working")  # 工作记忆由步骤 1 的TTL清理
+        ]
+        for memory_type, strategy in steps:
+            if not self._step():
+                break
+            forgotten = self.manager.forget_memories(
+                strategy,
+                config.maintenance_forget_threshold,
+                config.maintenance_forget_max_age_days,
+                memory_types=[memory_type]
+            )
+            report["forgotten"] += forgotten
+            if forgotten > 1:
+                self.bucket.consume(forgotten - 1)
+
+        # 4) 会话压缩（可选）：整体消耗一个令牌
+        if config.compaction_enabled and self.manager.memory_types.get("episodic") and self._step():
+            compaction = self.manager.compact_sessions()
+            report["compacted_sessions"] = compaction["sessions"]
+            report["archived"] = compaction["archived"]
+
+        report["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_report = report
+        logger.info(f"记忆维护完成: {report}")
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            pending = {"items": self._pending_items, "tokens": self._pending_tokens}
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_report": self.last_report,
+            "pending": pending
+        }
@@ -1,19 +1,35 @@
 """记忆管理器 - 记忆核心层的统一管理接口"""
 
-from typing import List, Dict, Any, Optional, Union
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+import json
+import os
+import threading
+import time
 import uuid
 import logging
 
-from .base import MemoryItem, MemoryConfig
+from .base import MemoryItem, MemoryConfig, safe_path_component
 from .types.working import WorkingMemory
 from .types.episodic import EpisodicMemory
 from .types.semantic import SemanticMemory
+from .storage import SQLiteDocumentStore
+from .maintenance import MaintenanceScheduler
+from .journal import WriteBehindJournal
+from .snapshot import export_snapshot, import_snapshot
 
 # 存储和检索功能已被各记忆类型内部实现替代
 
 logger = logging.getLogger(__name__)
 
+# 各记忆类型的存储位置描述（写入路由表）
+MEMORY_LOCATORS = {
+    "working": "memory",
+    "episodic": "sqlite+qdrant",
+    "semantic": "qdrant+neo4j",
+}
+
 
 class MemoryManager:
     """记忆管理器 - 统一的记忆操作接口
@@ -31,7 +47,9 @@ class MemoryManager:
             user_id: str = "default_user",
             enable_working: bool = True,
             enable_episodic: bool = True,
-            enable_semantic: bool = True
+            enable_semantic: bool = True,
+            retrieval_executor: Optional[ThreadPoolExecutor] = None,
+            restore_working: bool = False
     ):
         self.config = config or MemoryConfig()
         self.user_id = user_id
@@ -46,10 +64,61 @@ class MemoryManager:
 
         if enable_episodic:
             self.memory_types['episodic'] = EpisodicMemory(self.config)
+            if self.config.episodic_prefetch_sessions > 0:
+                self.memory_types['episodic'].prefetch_sessions(user_id=self.user_id)
 
         if enable_semantic:
             self.memory_types['semantic'] = SemanticMemory(self.config)
 
+        # 全局路由索引：memory_id -> 记忆类型（SQLite 持久化 + 内存缓存）
+        os.makedirs(self.config.storage_path, exist_ok=True)
+        self.route_store = SQLiteDocumentStore(db_path=os.path.join(self.config.storage_path, "memory.db"))
+        self._routes: Dict[str, str] = {}
+        self._routes_lock = threading.Lock()
+        for memory_instance in self.memory_types.values():
+            memory_instance.removal_listener = self._on_memory_removed
+            memory_instance.batch_removal_listener = self._on_memories_removed
+        # 工作记忆只存在于进程内，上次运行遗留的路由已失效
+        self.route_store.clear_routes(memory_type="working", user_id=self.user_id)
+
+        # 跨类型并发检索线程池（有界；由管理器池创建时多用户共享）
+        self._owns_executor = retrieval_executor is None
+        self._retrieval_executor = retrieval_executor or ThreadPoolExecutor(
+            max_workers=max(1, self.config.retrieval_max_workers),
+            thread_name_prefix="memory-retrieve"
+        )
+        self.last_retrieval_stats: Dict[str, Any] = {}
+
+        # 写操作与后台维护互斥（可重入）；维护线程在有检索进行时让路
+        self._lock = threading.RLock()
+        self._active_retrievals = 0
+        self._active_lock = threading.Lock()
+        self.maintenance: Optional[MaintenanceScheduler] = None
+        if self.config.maintenance_enabled:
+            self.start_maintenance()
+
+        # 写后日志：情景/语义记忆写入先落本地日志，后台分批写入存储
+        self.journal: Optional[WriteBehindJournal] = None
+        if self.config.write_behind_enabled:
+            journal_path = os.path.join(
+                self.config.storage_path, f"write_journal_{safe_path_component(self.user_id)}.jsonl"
+            )
+            self._adopt_legacy_journal(journal_path)
+            self.journal = WriteBehindJournal(
+                journal_path=journal_path,
+                apply_batch=self._apply_journal_batch,
+                batch_size=self.config.write_behind_batch_size,
+                flush_interval=self.config.write_behind_flush_interval,
+                max_backoff=self.config.write_behind_max_backoff,
+                max_attempts=self.config.write_behind_max_attempts,
+                fsync=self.config.write_behind_fsync
+            )
+            self.journal.start()
+
+        # 恢复被换出时保存的工作记忆（由管理器池创建时开启）
+        if restore_working and "working" in self.memory_types:
+            self._restore_working_snapshot()
+
         logger.info(f"MemoryManager初始化完成，启用记忆类型: {list(self.memory_types.keys())}")
 
     def add_memory(
@@ -93,12 +162,154 @@ class MemoryManager:
 
         # 添加到对应的记忆类型
         if memory_type in self.memory_types:
-            memory_id = self.memory_types[memory_type].add(memory_item)
+            if self.journal is not None and memory_type != "working":
+                # 写后模式：追加日志后立即返回，由后台线程写入存储
+                memory_id = self.journal.append(self._to_journal_entry(memory_item))
+                self._note_writes([content])
+                return memory_id
+            with self._lock:
+                memory_id = self.memory_types[memory_type].add(memory_item)
+                self._set_route(memory_id, memory_type)
+            self._note_writes([content])
             logger.debug(f"添加记忆到 {memory_type}: {memory_id}")
             return memory_id
         else:
             raise ValueError(f"不支持的记忆类型: {memory_type}")
 
+    def add_memories(
+            self,
+            items: List[Union[str, Dict[str, Any]]],
+            memory_type: str = "working",
+            auto_classify: bool = True
+    ) -> List[Dict[str, Any]]:
+        """批量添加记忆
+
+        分类与重要性评估一次完成，按记忆类型分组后调用各类型的批量写入
+        （嵌入分批计算、SQLite 单事务、Qdrant 分批 upsert、Neo4j UNWIND）。
+
+        Args:
+            items: 记忆列表；每项为内容字符串，或包含 content 以及可选
+                   memory_type / importance / metadata / id / timestamp 的字典
+            memory_type: 未指定类型时的默认记忆类型
+            auto_classify: 是否对未显式指定类型的项自动分类
+
+        Returns:
+            与输入对齐的结果列表，每项形如
+            {"index": 0, "id": "...", "memory_type": "episodic", "success": True, "error": None}
+        """
+        results: List[Dict[str, Any]] = []
+        groups: Dict[str, List[Tuple[int, MemoryItem]]] = {}
+
+        for index, raw in enumerate(items):
+            spec = {"content": raw} if isinstance(raw, str) else dict(raw or {})
+            content = spec.get("content")
+            metadata = spec.get("metadata") or {}
+            result = {"index": index, "id": None, "memory_type": None, "success": False, "error": None}
+            results.append(result)
+            if not content:
+                result["error"] = "记忆内容为空"
+                continue
+
+            item_type = spec.get("memory_type")
+            if item_type is None:
+                item_type = self._classify_memory_type(content, metadata) if auto_classify else memory_type
+            result["memory_type"] = item_type
+            if item_type not in self.memory_types:
+                result["error"] = f"不支持的记忆类型: {item_type}"
+                continue
+
+            importance = spec.get("importance")
+            if importance is None:
+                importance = self._calculate_importance(content, metadata)
+            timestamp = spec.get("timestamp") or datetime.now()
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)
+
+            memory_item = MemoryItem(
+                id=spec.get("id") or str(uuid.uuid4()),
+                content=content,
+                memory_type=item_type,
+                user_id=self.user_id,
+                timestamp=timestamp,
+                importance=importance,
+                metadata=metadata
+            )
+            result["id"] = memory_item.id
+            groups.setdefault(item_type, []).append((index, memory_item))
+
+        # 写后模式：持久化类型先追加到日志并立即确认，由后台线程写入存储
+        if self.journal is not None:
+            queued = [
+                (index, memory_item)
+                for item_type in list(groups) if item_type != "working"
+                for index, memory_item in groups.pop(item_type)
+            ]
+            self.journal.append_many([self._to_journal_entry(m) for _, m in queued])
+            for index, _ in queued:
+                results[index].update(success=True, queued=True)
+            self._note_writes([m.content for _, m in queued])
+
+        errors = self._write_groups({t: [m for _, m in entries] for t, entries in groups.items()})
+        for entries in groups.values():
+            for index, memory_item in entries:
+                results[index]["error"] = errors.get(memory_item.id)
+                results[index]["success"] = results[index]["error"] is None
+
+        self._note_writes([
+            memory_item.content
+            for entries in groups.values() for index, memory_item in entries
+            if results[index]["success"]
+        ])
+        added = sum(1 for r in results if r["success"])
+        logger.info(f"批量添加记忆完成: {added}/{len(results)} 条成功")
+        return results
+
+    def _write_groups(self, groups: Dict[str, List[MemoryItem]]) -> Dict[str, Optional[str]]:
+        """按类型批量写入存储并记录路由，返回 memory_id -> 错误信息（None 表示成功）"""
+        errors: Dict[str, Optional[str]] = {}
+        routes = []
+        with self._lock:
+            for item_type, memory_items in groups.items():
+                try:
+                    item_errors = self.memory_types[item_type].add_batch(memory_items)
+                except Exception as e:
+                    logger.error(f"批量添加 {item_type} 记忆失败: {e}")
+                    item_errors = [str(e)] * len(memory_items)
+                for memory_item, error in zip(memory_items, item_errors):
+                    errors[memory_item.id] = error
+                    if error is None:
+                        routes.append((memory_item.id, item_type))
+            self._set_routes(routes)
+        return errors
+
+    def import_items(
+            self,
+            memory_type: str,
+            memory_items: List[MemoryItem],
+            **add_kwargs
+    ) -> List[Optional[str]]:
+        """导入已构建好的记忆项（快照导入等）：调用该类型的批量写入并记录路由
+
+        Args:
+            memory_type: 记忆类型
+            memory_items: 记忆项列表（user_id 应为当前用户）
+            **add_kwargs: 透传给记忆类型 add_batch 的参数（如 embeddings、extract_graph）
+
+        Returns:
+            与输入对齐的错误列表（None 表示成功）
+        """
+        with self._lock:
+            try:
+                errors = self.memory_types[memory_type].add_batch(memory_items, **add_kwargs)
+            except Exception as e:
+                logger.error(f"导入 {memory_type} 记忆失败: {e}")
+                errors = [str(e)] * len(memory_items)
+            self._set_routes([
+                (memory_item.id, memory_type)
+                for memory_item, error in zip(memory_items, errors) if error is None
+            ])
+        return errors
+
     def retrieve_memories(
             self,
             query: str,
@@ -119,32 +330,158 @@ class MemoryManager:
         Returns:
             检索到的记忆列表
         """
+        results, _ = self.retrieve_memories_with_stats(
+            query=query,
+            memory_types=memory_types,
+            limit=limit,
+            min_importance=min_importance,
+            time_range=time_range
+        )
+        return results
+
+    def retrieve_memories_with_stats(
+            self,
+            query: str,
+            memory_types: Optional[List[str]] = None,
+            limit: int = 10,
+            min_importance: float = 0.0,
+            time_range: Optional[tuple] = None,
+            deadlines: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[MemoryItem], Dict[str, Any]]:
+        """并发检索各类型记忆，并返回各类型耗时明细
+
+        各类型在有界线程池中并发执行，每个类型有独立截止时间；
+        超时或出错的类型不影响其它类型，返回部分结果。
+
+        Args:
+            query: 查询内容
+            memory_types: 要检索的记忆类型列表
+            limit: 返回数量限制
+            min_importance: 最小重要性阈值
+            time_range: 时间范围 (start_time, end_time)
+            deadlines: 各类型截止时间（秒），默认取自配置
+
+        Returns:
+            (记忆列表, 统计信息)，统计信息形如
+            {"total_ms": 12.3, "types": {"episodic": {"status": "ok", "ms": 8.1, "count": 3}}}
+        """
         if memory_types is None:
             memory_types = list(self.memory_types.keys())
+        targets = [t for t in memory_types if t in self.memory_types]
+        deadlines = {**self.config.retrieval_deadlines, **(deadlines or {})}
 
-        # 从各个记忆类型中检索
-        all_results = []
-        per_type_limit = max(1, limit // len(memory_types))
+        start = time.perf_counter()
+        stats: Dict[str, Any] = {"types": {}}
 
-        for memory_type in memory_types:
-            if memory_type in self.memory_types:
-                memory_instance = self.memory_types[memory_type]
-                try:
-                    # 使用各个记忆类型自己的检索方法
-                    type_results = memory_instance.retrieve(
-                        query=query,
-                        limit=per_type_limit,
-                        min_importance=min_importance,
-                        user_id=self.user_id
-                    )
-                    all_results.extend(type_results)
-                except Exception as e:
-                    logger.warning(f"检索 {memory_type} 记忆时出错: {e}")
+        def run_one(memory_type: str) -> Tuple[List[MemoryItem], float]:
+            t0 = time.perf_counter()
+            # 使用各个记忆类型自己的检索方法；每个类型都多取一些，统一排序后再截断
+            items = self.memory_types[memory_type].retrieve(
+                query=query,
+                limit=limit,
+                min_importance=min_importance,
+                user_id=self.user_id,
+                time_range=time_range
+            )
+            return items, (time.perf_counter() - t0) * 1000
+
+        with self._active_lock:
+            self._active_retrievals += 1
+        try:
+            per_type_results = self._collect_retrievals(run_one, targets, deadlines, start, stats)
+        finally:
+            with self._active_lock:
+                self._active_retrievals -= 1
+
+        # 覆盖层：写后日志中尚未写入存储的记忆
+        if self.journal is not None:
+            for memory_type, items in self._pending_overlay(query, targets, min_importance, time_range).items():
+                per_type_results.setdefault(memory_type, []).extend(items)
+                stats["types"].setdefault(memory_type, {"status": "ok", "ms": 0.0, "count": 0})
+                stats["types"][memory_type]["pending"] = len(items)
+
+        merged = self._merge_ranked_results(per_type_results, limit)
+        stats["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        stats["partial"] = any(v["status"] != "ok" for v in stats["types"].values())
+        self.last_retrieval_stats = stats
+        return merged, stats
+
+    def _collect_retrievals(
+            self,
+            run_one: Callable[[str], Tuple[List[MemoryItem], float]],
+            targets: List[str],
+            deadlines: Dict[str, float],
+            start: float,
+            stats: Dict[str, Any]
+    ) -> Dict[str, List[MemoryItem]]:
+        """提交各类型检索并按截止时间收集结果"""
+        futures = {t: self._retrieval_executor.submit(run_one, t) for t in targets}
+
+        per_type_results: Dict[str, List[MemoryItem]] = {}
+        for memory_type, future in futures.items():
+            deadline = deadlines.get(memory_type, self.config.retrieval_default_deadline)
+            remaining = max(0.0, start + deadline - time.perf_counter())
+            try:
+                items, elapsed_ms = future.result(timeout=remaining)
+                per_type_results[memory_type] = items
+                stats["types"][memory_type] = {"status": "ok", "ms": round(elapsed_ms, 2), "count": len(items)}
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning(f"检索 {memory_type} 记忆超时（>{deadline:.2f}s），返回部分结果")
+                stats["types"][memory_type] = {"status": "timeout", "ms": round(deadline * 1000, 2), "count": 0}
+            except Exception as e:
+                logger.warning(f"检索 {memory_type} 记忆时出错: {e}")
+                stats["types"][memory_type] = {"status": "error", "error": str(e), "count": 0}
+        return per_type_results
+
+    def _merge_ranked_results(
+            self,
+            per_type_results: Dict[str, List[MemoryItem]],
+            limit: int
+    ) -> List[MemoryItem]:
+        """跨类型合并：各类型分数归一化到 [0, 1] 后统一排序
+
+        各类型自带的相关性分数（已包含重要性加权）尺度不同，这里在类型内做 min-max 归一化，
+        使每个类型的最佳结果都落在 1、最差结果落在 0，跨类型可比；
+        没有分数的结果按类型内排名给分。
+        """
+        scored: List[Tuple[float, float, MemoryItem]] = []
+        seen_ids = set()
+        for memory_type, items in per_type_results.items():
+            scores = self._normalized_scores([self._raw_relevance(item) for item in items])
+            for item, score in zip(items, scores):
+                if item.id in seen_ids:
                     continue
+                seen_ids.add(item.id)
+                item.metadata["retrieval_score"] = score
+                scored.append((score, item.importance, item))
+
+        scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        return [item for _, _, item in scored[:limit]]
 
-        # 按重要性和相关性排序
-        all_results.sort(key=lambda x: x.importance, reverse=True)
-        return all_results[:limit]
+    @staticmethod
+    def _normalized_scores(raw_scores: List[Optional[float]]) -> List[float]:
+        """类型内归一化：有分数的做 min-max（全部相同时取 1），没有分数的按排名线性给分"""
+        known = [s for s in raw_scores if s is not None]
+        low, high = (min(known), max(known)) if known else (0.0, 0.0)
+        total = len(raw_scores)
+        normalized = []
+        for rank, raw in enumerate(raw_scores):
+            if raw is None:
+                normalized.append(1.0 - rank / total)
+            elif high > low:
+                normalized.append((raw - low) / (high - low))
+            else:
+                normalized.append(1.0)
+        return normalized
+
+    @staticmethod
+    def _raw_relevance(item: MemoryItem) -> Optional[float]:
+        for key in ("relevance_score", "combined_score"):
+            value = item.metadata.get(key)
+            if isinstance(value, (int, float)):
+                return float(value)
+        return None
 
     def update_memory(
             self,
@@ -164,13 +501,14 @@ class MemoryManager:
         Returns:
             是否更新成功
         """
-        # 查找记忆所在的类型
-        for memory_type, memory_instance in self.memory_types.items():
-            if memory_instance.has_memory(memory_id):
-                return memory_instance.update(memory_id, content, importance, metadata)
-
-        logger.warning(f"未找到记忆: {memory_id}")
-        return False
+        if self.journal is not None and self.journal.is_pending(memory_id):
+            self.journal.flush(timeout=self.config.write_behind_settle_timeout)
+        memory_type = self._resolve_memory_type(memory_id)
+        if memory_type is None:
+            logger.warning(f"未找到记忆: {memory_id}")
+            return False
+        with self._lock:
+            return self.memory_types[memory_type].update(memory_id, content, importance, metadata)
 
     def remove_memory(self, memory_id: str) -> bool:
         """删除记忆
@@ -181,18 +519,25 @@ class MemoryManager:
         Returns:
             是否删除成功
         """
-        for memory_type, memory_instance in self.memory_types.items():
-            if memory_instance.has_memory(memory_id):
-                return memory_instance.remove(memory_id)
-
-        logger.warning(f"未找到记忆: {memory_id}")
-        return False
+        if self.journal is not None:
+            if self.journal.cancel(memory_id):
+                return True
+            if self.journal.is_pending(memory_id):
+                self.journal.flush(timeout=self.config.write_behind_settle_timeout)
+        memory_type = self._resolve_memory_type(memory_id)
+        if memory_type is None:
+            logger.warning(f"未找到记忆: {memory_id}")
+            return False
+        # 路由由记忆类型的删除回调同步清理
+        with self._lock:
+            return self.memory_types[memory_type].remove(memory_id)
 
     def forget_memories(
             self,
             strategy: str = "importance_based",
             threshold: float = 0.1,
-            max_age_days: int = 30
+            max_age_days: int = 30,
+            memory_types: Optional[List[str]] = None
     ) -> int:
         """记忆遗忘机制
 
@@ -200,32 +545,51 @@ class MemoryManager:
             strategy: 遗忘策略 ("importance_based", "time_based", "capacity_based")
             threshold: 遗忘阈值
             max_age_days: 最大保存天数
+            memory_types: 只对这些记忆类型执行（默认全部）
 
         Returns:
             遗忘的记忆数量
         """
         total_forgotten = 0
 
-        for memory_type, memory_instance in self.memory_types.items():
+        for memory_type, memory_instance in list(self.memory_types.items()):
+            if memory_types is not None and memory_type not in memory_types:
+                continue
             if hasattr(memory_instance, 'forget'):
-                forgotten = memory_instance.forget(strategy, threshold, max_age_days)
+                with self._lock:
+                    forgotten = memory_instance.forget(strategy, threshold, max_age_days, user_id=self.user_id)
                 total_forgotten += forgotten
 
         logger.info(f"记忆遗忘完成: {total_forgotten} 条记忆")
         return total_forgotten
 
+    def expire_working_memories(self) -> int:
+        """按TTL清理过期的工作记忆，返回清理条数"""
+        working = self.memory_types.get("working")
+        if working is None:
+            return 0
+        with self._lock:
+            return working.expire()
+
     def consolidate_memories(
             self,
             from_type: str = "working",
             to_type: str = "episodic",
-            importance_threshold: float = 0.7
+            importance_threshold: float = 0.7,
+            step: Optional[Callable[[], bool]] = None,
+            batch_size: int = 500
     ) -> int:
         """记忆整合 - 将重要的短期记忆转换为长期记忆
 
+        按批迁移：目标类型 add_batch 单事务写入并复用源类型已有的向量，
+        源类型 remove_batch 批量删除，路由一次登记。
+
         Args:
             from_type: 源记忆类型
             to_type: 目标记忆类型
             importance_threshold: 重要性阈值
+            step: 每迁移一条记忆前调用的节流回调（后台维护用于限速），返回 False 时提前结束
+            batch_size: 每批迁移的记忆数（每批持锁一次）
 
         Returns:
             整合的记忆数量
@@ -245,14 +609,38 @@ class MemoryManager:
             if m.importance >= importance_threshold
         ]
 
+        # 节流：每条候选消耗一次 step，被拒绝时只整合已放行的部分
+        if step is not None:
+            admitted = []
+            for memory in candidates:
+                if not step():
+                    break
+                admitted.append(memory)
+            candidates = admitted
+
         consolidated_count = 0
-        for memory in candidates:
-            # 移动到目标记忆类型
-            if source_memory.remove(memory.id):
-                memory.memory_type = to_type
-                memory.importance *= 1.1  # 提升重要性
-                target_memory.add(memory)
-                consolidated_count += 1
+        for start in range(0, len(candidates), max(1, batch_size)):
+            chunk = candidates[start:start + max(1, batch_size)]
+            # 按批加锁，前台写入可在两批之间插入
+            with self._lock:
+                chunk = [m for m in chunk if source_memory.has_memory(m.id)]
+                if not chunk:
+                    continue
+                # 随记忆携带源类型已有的向量，缺失的由目标类型一次批量补算
+                vectors = source_memory.get_embeddings([m.id for m in chunk])
+                moved = [
+                    m.model_copy(update={"memory_type": to_type, "importance": m.importance * 1.1})  # 提升重要性
+                    for m in chunk
+                ]
+                errors = target_memory.add_batch(moved, embeddings=[vectors.get(m.id) for m in moved])
+                written = [m for m, error in zip(moved, errors) if error is None]
+                for m, error in zip(moved, errors):
+                    if error is not None:
+                        logger.warning(f"整合记忆失败 {m.id}: {error}")
+                # 先写目标再删源；源删除回调会清理旧路由，随后登记新路由
+                source_memory.remove_batch([m.id for m in written])
+                self._set_routes([(m.id, to_type) for m in written])
+                consolidated_count += len(written)
 
         logger.info(f"记忆整合完成: {consolidated_count} 条记忆从 {from_type} 转移到 {to_type}")
         return consolidated_count
@@ -277,14 +665,361 @@ class MemoryManager:
             # 使用count字段（活跃记忆数），而不是total_count（包含已遗忘的）
             stats["total_memories"] += type_stats.get("count", 0)
 
+        if self.maintenance is not None:
+            stats["maintenance"] = self.maintenance.get_stats()
+        if self.journal is not None:
+            stats["write_behind"] = self.journal.get_stats()
+
         return stats
 
     def clear_all_memories(self):
         """清空所有记忆"""
-        for memory_type, memory_instance in self.memory_types.items():
-            memory_instance.clear()
+        if self.journal is not None:
+            self.journal.clear()
+        with self._lock:
+            for memory_type, memory_instance in self.memory_types.items():
+                memory_instance.clear()
+            with self._routes_lock:
+                self._routes.clear()
+                self.route_store.clear_routes(user_id=self.user_id)
         logger.info("所有记忆已清空")
 
+    # ==================== 后台维护 ====================
+
+    @property
+    def active_retrievals(self) -> int:
+        """正在进行的检索数（后台维护据此让路）"""
+        with self._active_lock:
+            return self._active_retrievals
+
+    def start_maintenance(self) -> MaintenanceScheduler:
+        """启动后台维护调度器（整合、过期清理、容量遗忘）"""
+        if self.maintenance is None:
+            self.maintenance = MaintenanceScheduler(self)
+        self.maintenance.start()
+        return self.maintenance
+
+    def stop_maintenance(self):
+        """停止后台维护调度器"""
+        if self.maintenance is not None:
+            self.maintenance.stop()
+
+    def _note_writes(self, contents: List[str]):
+        if self.maintenance is not None and contents:
+            self.maintenance.note_writes(len(contents), sum(len(c.split()) for c in contents))
+
+    # ==================== 写后日志 ====================
+
+    def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """等待写后日志中的记忆全部写入存储；未启用写后模式时直接返回 True"""
+        if self.journal is None:
+            return True
+        return self.journal.flush(timeout=timeout)
+
+    def close(self):
+        """停止后台线程（写后日志尽量刷盘，未写入的条目下次启动时重放；图谱增强队列尽量处理完）"""
+        self.stop_maintenance()
+        if self.journal is not None:
+            self.journal.stop(flush=True, timeout=self.config.write_behind_settle_timeout)
+        semantic = self.memory_types.get("semantic")
+        if semantic is not None and semantic.enrichment is not None:
+            semantic.enrichment.stop(flush=True, timeout=self.config.write_behind_settle_timeout)
+        if self._owns_executor:
+            self._retrieval_executor.shutdown(wait=False)
+
+    def compact_sessions(self, **kwargs) -> Dict[str, Any]:
+        """压缩当前用户已结束的情景会话（参数见 memory.compaction.compact_sessions）
+
+        Returns:
+            压缩报告；未启用情景记忆时返回空报告
+        """
+        episodic = self.memory_types.get("episodic")
+        if episodic is None:
+            return {"sessions": 0, "archived": 0, "removed": 0, "summaries": []}
+        if self.journal is not None:
+            self.flush_writes(timeout=self.config.write_behind_settle_timeout)
+        with self._lock:
+            report = episodic.compact_sessions(user_id=self.user_id, **kwargs)
+            self._set_routes([(summary_id, "episodic") for summary_id in report["summaries"]])
+        return report
+
+    def migrate_graph_ids(self, dry_run: bool = False) -> Dict[str, Any]:
+        """一次性把语义图谱中旧版 hash() 节点ID迁移为内容寻址ID并合并重复节点
+
+        Returns:
+            迁移报告；未启用语义记忆时返回空报告
+        """
+        semantic = self.memory_types.get("semantic")
+        if semantic is None:
+            return {"scanned": 0, "remapped": 0, "targets": 0, "dry_run": dry_run}
+        if self.journal is not None:
+            self.flush_writes(timeout=self.config.write_behind_settle_timeout)
+        if semantic.enrichment is not None:
+            semantic.enrichment.flush(timeout=self.config.write_behind_settle_timeout)
+        with self._lock:
+            return semantic.migrate_graph_ids(dry_run=dry_run)
+
+    # ==================== 快照 ====================
+
+    def export_snapshot(
+            self,
+            path: str,
+            memory_types: Optional[List[str]] = None,
+            batch_size: int = 500
+    ) -> Dict[str, Any]:
+        """导出当前用户的记忆（内容、元数据、向量、图数据）到快照目录
+
+        Args:
+            path: 快照目录
+            memory_types: 要导出的记忆类型（默认全部启用的类型）
+            batch_size: 每页读取的记忆数
+
+        Returns:
+            快照清单
+        """
+        return export_snapshot(self, path, memory_types, batch_size)
+
+    def import_snapshot(
+            self,
+            path: str,
+            memory_types: Optional[List[str]] = None,
+            batch_size: int = 500
+    ) -> Dict[str, Any]:
+        """从快照目录导入记忆到当前用户（直接使用快照中的向量，不重新嵌入）
+
+        Args:
+            path: 快照目录
+            memory_types: 要导入的记忆类型
+            batch_size: 每批写入条数
+
+        Returns:
+            各类型导入报告
+        """
+        return import_snapshot(self, path, memory_types, batch_size)
+
+    # ==================== 换出 / 恢复 ====================
+
+    def suspend(self):
+        """换出：工作记忆写入SQLite并停止后台线程，下次创建同一用户的管理器时恢复
+
+        情景/语义记忆本身已持久化，换出后只释放进程内缓存。
+        """
+        working = self.memory_types.get("working")
+        if working is not None and working.count():
+            with self._lock:
+                records = [
+                    {
+                        "memory_id": m.id,
+                        "user_id": self.user_id,
+                        "content": m.content,
+                        "timestamp": int(m.timestamp.timestamp()),
+                        "importance": m.importance,
+                        "properties": json.loads(json.dumps(m.metadata, ensure_ascii=False, default=str))
+                    }
+                    for m in working.get_all()
+                ]
+                self.route_store.save_working_snapshot(records)
+        self.close()
+        logger.info(f"MemoryManager已换出: user={self.user_id}")
+
+    def _restore_working_snapshot(self):
+        try:
+            rows = self.route_store.pop_working_snapshot(self.user_id)
+        except Exception as e:
+            logger.warning(f"读取工作记忆快照失败: {e}")
+            return
+        if not rows:
+            return
+        items = [
+            MemoryItem(
+                id=row["memory_id"],
+                content=row["content"],
+                memory_type="working",
+                user_id=row["user_id"],
+                timestamp=datetime.fromtimestamp(row["timestamp"]),
+                importance=row["importance"],
+                metadata=row["properties"]
+            )
+            for row in rows
+        ]
+        self.memory_types["working"].add_batch(items)
+        self._set_routes([(m.id, "working") for m in self.memory_types["working"].get_all()])
+        logger.info(f"恢复工作记忆快照: {len(items)} 条")
+
+    def resident_size(self) -> Dict[str, int]:
+        """进程内常驻的记忆条数与内容字节数（估算），供管理器池做预算
+
+        各记忆类型在写入路径上增量维护计数，这里只做 O(1) 汇总。
+        """
+        items = 0
+        size = 0
+        working = self.memory_types.get("working")
+        if working is not None:
+            items += working.count()
+            size += working.content_bytes
+        episodic = self.memory_types.get("episodic")
+        if episodic is not None:
+            items += len(episodic.cache)
+            size += episodic.cache.content_bytes
+        semantic = self.memory_types.get("semantic")
+        if semantic is not None:
+            items += len(semantic.semantic_memories)
+            size += semantic.resident_bytes
+        return {"items": items, "bytes": size}
+
+    def _adopt_legacy_journal(self, journal_path: str):
+        """旧版日志文件名直接使用用户ID；文件名规范化后把仍在存储目录内的旧日志改名接管，避免未写入的条目丢失"""
+        legacy_path = os.path.join(self.config.storage_path, f"write_journal_{self.user_id}.jsonl")
+        if legacy_path == journal_path or os.path.exists(journal_path) or not os.path.isfile(legacy_path):
+            return
+        storage_dir = os.path.realpath(self.config.storage_path)
+        if os.path.dirname(os.path.realpath(legacy_path)) != storage_dir:
+            return
+        try:
+            os.replace(legacy_path, journal_path)
+        except OSError as e:
+            logger.warning(f"接管旧写后日志失败: {e}")
+
+    @staticmethod
+    def _to_journal_entry(memory_item: MemoryItem) -> Dict[str, Any]:
+        return {
+            "id": memory_item.id,
+            "content": memory_item.content,
+            "memory_type": memory_item.memory_type,
+            "user_id": memory_item.user_id,
+            "timestamp": memory_item.timestamp.isoformat(),
+            "importance": memory_item.importance,
+            "metadata": memory_item.metadata
+        }
+
+    @staticmethod
+    def _from_journal_entry(entry: Dict[str, Any]) -> MemoryItem:
+        return MemoryItem(
+            id=entry["id"],
+            content=entry["content"],
+            memory_type=entry["memory_type"],
+            user_id=entry["user_id"],
+            timestamp=datetime.fromisoformat(entry["timestamp"]),
+            importance=entry["importance"],
+            metadata=dict(entry.get("metadata") or {})
+        )
+
+    def _apply_journal_batch(self, entries: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """写后日志的批量写入回调"""
+        groups: Dict[str, List[MemoryItem]] = {}
+        for entry in entries:
+            memory_item = self._from_journal_entry(entry)
+            groups.setdefault(memory_item.memory_type, []).append(memory_item)
+        unknown = [t for t in groups if t not in self.memory_types]
+        for memory_type in unknown:
+            groups.pop(memory_type)
+        errors = self._write_groups(groups)
+        return [
+            errors.get(entry["id"], f"不支持的记忆类型: {entry['memory_type']}")
+            for entry in entries
+        ]
+
+    def _pending_overlay(
+            self,
+            query: str,
+            memory_types: List[str],
+            min_importance: float,
+            time_range: Optional[tuple]
+    ) -> Dict[str, List[MemoryItem]]:
+        """对尚未写入存储的记忆做关键词匹配，作为检索结果的覆盖层"""
+        terms = [t for t in query.lower().split() if t] or [query.lower()]
+        overlay: Dict[str, List[MemoryItem]] = {}
+        for entry in self.journal.pending_entries():
+            if entry["memory_type"] not in memory_types or entry["importance"] < min_importance:
+                continue
+            memory_item = self._from_journal_entry(entry)
+            if time_range and not (time_range[0] <= memory_item.timestamp <= time_range[1]):
+                continue
+            content = memory_item.content.lower()
+            hits = sum(1 for term in terms if term in content)
+            if not hits:
+                continue
+            memory_item.metadata["relevance_score"] = hits / len(terms) * (0.8 + memory_item.importance * 0.4)
+            memory_item.metadata["pending_write"] = True
+            overlay.setdefault(memory_item.memory_type, []).append(memory_item)
+        return overlay
+
+    # ==================== 路由索引 ====================
+
+    def _set_route(self, memory_id: str, memory_type: str):
+        """记录记忆所在类型（内存 + SQLite）"""
+        with self._routes_lock:
+            self._routes[memory_id] = memory_type
+            try:
+                self.route_store.set_route(
+                    memory_id, memory_type, MEMORY_LOCATORS.get(memory_type, memory_type), self.user_id
+                )
+            except Exception as e:
+                logger.warning(f"写入记忆路由失败: {e}")
+
+    def _set_routes(self, routes: List[Tuple[str, str]]):
+        """批量记录路由，routes 为 (memory_id, memory_type) 列表"""
+        if not routes:
+            return
+        with self._routes_lock:
+            self._routes.update(routes)
+            try:
+                self.route_store.set_routes([
+                    (memory_id, memory_type, MEMORY_LOCATORS.get(memory_type, memory_type), self.user_id)
+                    for memory_id, memory_type in routes
+                ])
+            except Exception as e:
+                logger.warning(f"批量写入记忆路由失败: {e}")
+
+    def _drop_route(self, memory_id: str):
+        with self._routes_lock:
+            self._routes.pop(memory_id, None)
+            try:
+                self.route_store.delete_routes([memory_id])
+            except Exception as e:
+                logger.warning(f"删除记忆路由失败: {e}")
+
+    def _drop_routes(self, memory_ids: List[str]):
+        with self._routes_lock:
+            for memory_id in memory_ids:
+                self._routes.pop(memory_id, None)
+            try:
+                self.route_store.delete_routes(memory_ids)
+            except Exception as e:
+                logger.warning(f"删除记忆路由失败: {e}")
+
+    def _on_memory_removed(self, memory_id: str):
+        """记忆类型内部删除（过期、遗忘、容量淘汰）时同步路由"""
+        self._drop_route(memory_id)
+
+    def _on_memories_removed(self, memory_ids: List[str]):
+        """批量删除（集合式遗忘、会话压缩）时一次同步路由"""
+        self._drop_routes(memory_ids)
+
+    def _resolve_memory_type(self, memory_id: str) -> Optional[str]:
+        """O(1) 查找记忆所在类型；路由缺失时回退到逐类型扫描并修复路由"""
+        with self._routes_lock:
+            memory_type = self._routes.get(memory_id)
+        if memory_type is None:
+            try:
+                route = self.route_store.get_route(memory_id)
+            except Exception as e:
+                logger.warning(f"读取记忆路由失败: {e}")
+                route = None
+            if route:
+                memory_type = route["memory_type"]
+                with self._routes_lock:
+                    self._routes[memory_id] = memory_type
+        if memory_type in self.memory_types:
+            return memory_type
+
+        # 回退：旧数据或路由丢失
+        for candidate, memory_instance in self.memory_types.items():
+            if memory_instance.has_memory(memory_id):
+                self._set_route(memory_id, candidate)
+                return candidate
+        return None
+
     def _classify_memory_type(self, content: str, metadata: Optional[Dict[str, Any]]) -> str:
         """自动分类记忆类型"""
         if metadata and metadata.get("type"):
@@ -0,0 +1,260 @@
+"""记忆管理器池 - 多用户服务中按用户复用 MemoryManager
+
+- 按 (user_id, 配置, 启用的记忆类型) 缓存管理器实例
+- 后端连接与模型在进程内共享：SQLite（按路径单例）、Qdrant/Neo4j（连接管理器）、
+  嵌入模型（全局单例）、spaCy 管道（模块级缓存）、跨类型检索线程池（池内共享）
+- 只保留热用户的进程内状态：超过用户数 / 常驻条数 / 常驻字节预算时按 LRU 换出冷用户，
+  换出时工作记忆写入SQLite，下次访问时恢复
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import json
+import logging
+import threading
+
+from .base import MemoryConfig
+from .manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryManagerPool:
+    """进程级 MemoryManager 池（LRU 换出）
+
+    池锁只保护内部字典：创建管理器（模型加载、数据库连接、快照恢复）与换出（日志刷盘）都在锁外进行，
+    冷启动或换出某个用户不会阻塞其他用户的 get()。同一用户的并发创建只执行一次，
+    新实例会等待该用户正在进行的换出完成后再恢复工作记忆快照。
+
+    通过 lease() 取得的管理器在租约期间不会被换出；get() 不持有租约，换出时只跳过正在检索的管理器，
+    调用方应在每次请求时重新获取，而不是长期持有引用。
+
+    Args:
+        max_managers: 最多常驻的管理器数量
+        max_items: 所有常驻管理器的进程内记忆条数上限（None 表示不限制）
+        max_bytes: 所有常驻管理器的进程内内容字节数上限（None 表示不限制）
+        retrieval_workers: 池内共享的检索线程数
+    """
+
+    _default: Optional["MemoryManagerPool"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+            self,
+            max_managers: int = 64,
+            max_items: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            retrieval_workers: int = 8
+    ):
+        self.max_managers = max(1, max_managers)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._managers: "OrderedDict[Tuple[str, str], MemoryManager]" = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._leases: Dict[Tuple[str, str], int] = {}
+        self._creating: Dict[Tuple[str, str], Future] = {}
+        self._suspending: Dict[Tuple[str, str], threading.Event] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, retrieval_workers),
+                                            thread_name_prefix="memory-pool-retrieve")
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def default(cls) -> "MemoryManagerPool":
+        """进程级默认池"""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    @staticmethod
+    def _make_key(user_id: str, config: MemoryConfig, enabled: Tuple[bool, bool, bool]) -> Tuple[str, str]:
+        material = json.dumps(
+            {"config": config.model_dump(mode="json"), "enabled": enabled},
+            sort_keys=True, default=str
+        )
+        return user_id, material
+
+    def get(
+            self,
+            user_id: str,
+            config: Optional[MemoryConfig] = None,
+            enable_working: bool = True,
+            enable_episodic: bool = True,
+            enable_semantic: bool = True
+    ) -> MemoryManager:
+        """获取（必要时创建）用户的管理器，并按预算换出冷用户（不持有租约）"""
+        key, manager = self._acquire(user_id, config, (enable_working, enable_episodic, enable_semantic), lease=False)
+        return manager
+
+    @contextmanager
+    def lease(
+            self,
+            user_id: str,
+            config: Optional[MemoryConfig] = None,
+            enable_working: bool = True,
+            enable_episodic: bool = True,
+            enable_semantic: bool = True
+    ) -> Iterator[MemoryManager]:
+        """在 with 块内持有用户的管理器，期间不会被换出"""
+        key, manager = self._acquire(user_id, config, (enable_working, enable_episodic, enable_semantic), lease=True)
+        try:
+            yield manager
+        finally:
+            with self._lock:
+                remaining = self._leases.get(key, 0) - 1
+                if remaining > 0:
+                    self._leases[key] = remaining
+                else:
+                    self._leases.pop(key, None)
+                victims = self._pick_victims(keep=None)
+            self._suspend_all(victims)
+
+    def _acquire(
+            self,
+            user_id: str,
+            config: Optional[MemoryConfig],
+            enabled: Tuple[bool, bool, bool],
+            lease: bool
+    ) -> Tuple[Tuple[str, str], MemoryManager]:
+        config = config or MemoryConfig()
+        key = self._make_key(user_id, config, enabled)
+        while True:
+            with self._lock:
+                manager = self._managers.get(key)
+                if manager is not None:
+                    self._managers.move_to_end(key)
+                    self._stats["hits"] += 1
+                    break
+                future = self._creating.get(key)
+                creator = future is None
+                if creator:
+                    future = Future()
+                    self._creating[key] = future
+                    self._stats["misses"] += 1
+                suspending = self._suspending.get(key)
+            if not creator:
+                # 其他线程正在创建同一管理器：等待后重新查表（创建失败时由本线程重试）
+                try:
+                    future.result()
+                except Exception:
+                    pass
+                continue
+            try:
+                if suspending is not None:
+                    suspending.wait()  # 换出写入工作记忆快照后再恢复
+                manager = MemoryManager(
+                    config=config,
+                    user_id=user_id,
+                    enable_working=enabled[0],
+                    enable_episodic=enabled[1],
+                    enable_semantic=enabled[2],
+                    retrieval_executor=self._executor,
+                    restore_working=True
+                )
+            except BaseException as e:
+                with self._lock:
+                    self._creating.pop(key, None)
+                future.set_exception(e)
+                raise
+            with self._lock:
+                self._creating.pop(key, None)
+                self._managers[key] = manager
+            future.set_result(manager)
+            break
+
+        with self._lock:
+            if lease:
+                self._leases[key] = self._leases.get(key, 0) + 1
+            # 常驻量由各记忆类型在写入路径上增量维护，这里只读取计数
+            self._sizes[key] = manager.resident_size()
+            victims = self._pick_victims(keep=key)
+        self._suspend_all(victims)
+        return key, manager
+
+    def release(self, user_id: str) -> int:
+        """主动换出某个用户未被租用的全部管理器，返回换出数量"""
+        with self._lock:
+            victims = [
+                self._detach(key) for key in list(self._managers)
+                if key[0] == user_id and not self._leases.get(key)
+            ]
+        self._suspend_all(victims)
+        return len(victims)
+
+    def _totals(self) -> Dict[str, int]:
+        return {
+            "items": sum(size["items"] for size in self._sizes.values()),
+            "bytes": sum(size["bytes"] for size in self._sizes.values())
+        }
+
+    def _over_budget(self) -> bool:
+        if len(self._managers) > self.max_managers:
+            return True
+        totals = self._totals()
+        if self.max_items is not None and totals["items"] > self.max_items:
+            return True
+        if self.max_bytes is not None and totals["bytes"] > self.max_bytes:
+            return True
+        return False
+
+    def _evictable(self, key: Tuple[str, str]) -> bool:
+        return not self._leases.get(key) and self._managers[key].active_retrievals == 0
+
+    def _pick_victims(self, keep: Optional[Tuple[str, str]]) -> List[Tuple[Tuple[str, str], MemoryManager, threading.Event]]:
+        """（持锁调用）按 LRU 顺序摘下管理器直到满足预算；当前请求的、被租用的与正在检索的不换出"""
+        victims = []
+        while self._over_budget():
+            victim = next((key for key in self._managers if key != keep and self._evictable(key)), None)
+            if victim is None:
+                break
+            victims.append(self._detach(victim))
+        return victims
+
+    def _detach(self, key: Tuple[str, str]) -> Tuple[Tuple[str, str], MemoryManager, threading.Event]:
+        """（持锁调用）从池中摘下管理器，登记换出中的事件，实际换出在锁外进行"""
+        manager = self._managers.pop(key)
+        self._sizes.pop(key, None)
+        self._stats["evictions"] += 1
+        done = threading.Event()
+        self._suspending[key] = done
+        return key, manager, done
+
+    def _suspend_all(self, victims: List[Tuple[Tuple[str, str], MemoryManager, threading.Event]]):
+        for key, manager, done in victims:
+            try:
+                manager.suspend()
+            except Exception as e:
+                logger.warning(f"换出用户 {key[0]} 的记忆管理器失败: {e}")
+            finally:
+                with self._lock:
+                    if self._suspending.get(key) is done:
+                        del self._suspending[key]
+                done.set()
+
+    def close(self):
+        """换出全部管理器并关闭共享线程池"""
+        with self._lock:
+            victims = [self._detach(key) for key in list(self._managers)]
+        self._suspend_all(victims)
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            users: List[str] = sorted({key[0] for key in self._managers})
+            return {
+                **self._stats,
+                "resident_managers": len(self._managers),
+                "resident_users": users,
+                "leased_managers": len(self._leases),
+                "resident": self._totals(),
+                "budget": {"managers": self.max_managers, "items": self.max_items, "bytes": self.max_bytes}
+            }
+
+
+def get_memory_manager(user_id: str, config: Optional[MemoryConfig] = None, **kwargs) -> MemoryManager:
+    """从进程级默认池获取用户的 MemoryManager"""
+    return MemoryManagerPool.default().get(user_id, config, **kwargs)
@@ -0,0 +1,113 @@
+"""网页摄取索引 - 记录已写入知识库的网页（URL + 内容哈希 + 分块ID + 过期时间）
+
+用于搜索结果流式入库：
+- 同一 URL 内容未变化且未过期时跳过重复嵌入
+- 内容变化时替换旧分块
+- 过期页面由维护步骤按命名空间批量清理（先删分块，再删索引记录）
+"""
+
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def page_content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageIngestIndex:
+    """网页摄取索引（SQLite，线程本地连接）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._init_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取线程本地连接"""
+        if not hasattr(self.local, "connection"):
+            self.local.connection = sqlite3.connect(self.db_path, timeout=10)
+            self.local.connection.row_factory = sqlite3.Row
+        return self.local.connection
+
+    def _init_database(self):
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS web_pages (
+                namespace TEXT NOT NULL,
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                title TEXT,
+                ingested_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, url)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_web_pages_expires ON web_pages (namespace, expires_at)")
+        conn.commit()
+
+    def get(self, namespace: str, url: str) -> Optional[Dict[str, Any]]:
+        row = self._get_connection().execute(
+            "SELECT * FROM web_pages WHERE namespace = ? AND url = ?", (namespace, url)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["chunk_ids"] = json.loads(record["chunk_ids"])
+        return record
+
+    def is_current(self, namespace: str, url: str, content_hash: str) -> bool:
+        """内容未变化且未过期"""
+        record = self.get(namespace, url)
+        if record is None or record["content_hash"] != content_hash:
+            return False
+        return record["expires_at"] is None or record["expires_at"] > time.time()
+
+    def upsert(self, namespace: str, url: str, content_hash: str, chunk_ids: List[str],
+               title: Optional[str] = None, ttl: Optional[float] = None):
+        now = time.time()
+        conn = self._get_connection()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO web_pages
+                (namespace, url, content_hash, chunk_ids, title, ingested_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (namespace, url, content_hash, json.dumps(chunk_ids), title, now,
+             now + ttl if ttl else None),
+        )
+        conn.commit()
+
+    def list_expired(self, namespace: str, now: Optional[float] = None, grace: float = 0.0) -> List[Dict[str, Any]]:
+        """列出过期超过 grace 秒的页面记录（不删除，分块删除成功后再调用 delete）"""
+        cutoff = (now or time.time()) - max(0.0, grace)
+        rows = self._get_connection().execute(
+            "SELECT * FROM web_pages WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (namespace, cutoff),
+        ).fetchall()
+        expired = []
+        for row in rows:
+            record = dict(row)
+            record["chunk_ids"] = json.loads(record["chunk_ids"])
+            expired.append(record)
+        return expired
+
+    def delete(self, namespace: str, urls: List[str]):
+        conn = self._get_connection()
+        conn.executemany(
+            "DELETE FROM web_pages WHERE namespace = ? AND url = ?",
+            [(namespace, url) for url in urls],
+        )
+        conn.commit()
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        conn = self._get_connection()
+        if namespace is None:
+            return conn.execute("SELECT COUNT(*) FROM web_pages").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM web_pages WHERE namespace = ?", (namespace,)).fetchone()[0]
@@ -306,6 +306,9 @@ def _chunk_paragraphs(paragraphs: List[Dict], chunk_tokens: int, overlap_tokens:
                         break
                     kept.append(x)
                     kept_tokens += t
+                # 重叠尾部放不下下一段时放弃重叠，否则会反复输出同一分块
+                if kept_tokens + p_tokens > chunk_tokens:
+                    kept, kept_tokens = [], 0
                 cur = list(reversed(kept))
                 cur_tokens = kept_tokens
             else:
@@ -325,6 +328,61 @@ def _chunk_paragraphs(paragraphs: List[Dict], chunk_tokens: int, overlap_tokens:
     return chunks
 
 
+def _chunk_markdown_text(
+        markdown_text: str,
+        source_path: str,
+        doc_id: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        namespace: Optional[str],
+        source_label: str,
+        seen_hashes: set,
+        ext: str = "",
+        extra_metadata: Optional[Dict[str, Any]] = None,
+) -> List[Dict]:
+    """对单篇 markdown 文本做结构化分块（文件与内存文本共用）"""
+    lang = _detect_lang(markdown_text)
+    chunks: List[Dict] = []
+
+    # Always use markdown-aware chunking for better structure preservation
+    para = _split_paragraphs_with_headings(markdown_text)
+    token_chunks = _chunk_paragraphs(para, chunk_tokens=max(1, chunk_size), overlap_tokens=max(0, chunk_overlap))
+
+    for ch in token_chunks:
+        content = ch["content"]
+        start = ch.get("start", 0)
+        end = ch.get("end", start + len(content))
+        norm = content.strip()
+        if not norm:
+            continue
+
+        content_hash = hashlib.md5(norm.encode('utf-8')).hexdigest()
+        if content_hash in seen_hashes:
+            continue
+        seen_hashes.add(content_hash)
+
+        chunk_id = hashlib.md5(f"{doc_id}|{start}|{end}|{content_hash}".encode('utf-8')).hexdigest()
+        metadata = {
+            "source_path": source_path,
+            "file_ext": ext,
+            "doc_id": doc_id,
+            "lang": lang,
+            "start": start,
+            "end": end,
+            "content_hash": content_hash,
+            "namespace": namespace or "default",
+            "source": source_label,
+            "external": True,
+            "heading_path": ch.get("heading_path"),
+            "format": "markdown",  # Mark all content as markdown-processed
+        }
+        if extra_metadata:
+            metadata.update(extra_metadata)
+        chunks.append({"id": chunk_id, "content": content, "metadata": metadata})
+
+    return chunks
+
+
 def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap: int = 100,
                          namespace: Optional[str] = None, source_label: str = "rag") -> List[Dict]:
     """
@@ -350,50 +408,47 @@ def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap:
             print(f"[WARNING] No content extracted from: {path}")
             continue
 
-        lang = _detect_lang(markdown_text)
         doc_id = hashlib.md5(f"{path}|{len(markdown_text)}".encode('utf-8')).hexdigest()
-
-        # Always use markdown-aware chunking for better structure preservation
-        para = _split_paragraphs_with_headings(markdown_text)
-        token_chunks = _chunk_paragraphs(para, chunk_tokens=max(1, chunk_size), overlap_tokens=max(0, chunk_overlap))
-
-        for ch in token_chunks:
-            content = ch["content"]
-            start = ch.get("start", 0)
-            end = ch.get("end", start + len(content))
-            norm = content.strip()
-            if not norm:
-                continue
-
-            content_hash = hashlib.md5(norm.encode('utf-8')).hexdigest()
-            if content_hash in seen_hashes:
-                continue
-            seen_hashes.add(content_hash)
-
-            chunk_id = hashlib.md5(f"{doc_id}|{start}|{end}|{content_hash}".encode('utf-8')).hexdigest()
-            chunks.append({
-                "id": chunk_id,
-                "content": content,
-                "metadata": {
-                    "source_path": path,
-                    "file_ext": ext,
-                    "doc_id": doc_id,
-                    "lang": lang,
-                    "start": start,
-                    "end": end,
-                    "content_hash": content_hash,
-                    "namespace": namespace or "default",
-                    "source": source_label,
-                    "external": True,
-                    "heading_path": ch.get("heading_path"),
-                    "format": "markdown",  # Mark all content as markdown-processed
-                },
-            })
+        chunks.extend(_chunk_markdown_text(
+            markdown_text,
+            source_path=path,
+            doc_id=doc_id,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            namespace=namespace,
+            source_label=source_label,
+            seen_hashes=seen_hashes,
+            ext=ext,
+        ))
 
     print(f"[RAG] Universal loader done: total_chunks={len(chunks)}")
     return chunks
 
 
+def chunk_text(text: str, source: str, chunk_size: int = 800, chunk_overlap: int = 100,
+               namespace: Optional[str] = None, source_label: str = "rag",
+               metadata: Optional[Dict[str, Any]] = None) -> List[Dict]:
+    """
+    In-memory chunker for already-extracted markdown/plain text (e.g. fetched web pages).
+    No temp files are written; doc_id is derived from source + content so unchanged
+    text always yields the same chunk ids.
+    """
+    if not text or not text.strip():
+        return []
+    doc_id = hashlib.md5(f"{source}|{hashlib.md5(text.encode('utf-8')).hexdigest()}".encode('utf-8')).hexdigest()
+    return _chunk_markdown_text(
+        text,
+        source_path=source,
+        doc_id=doc_id,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        namespace=namespace,
+        source_label=source_label,
+        seen_hashes=set(),
+        extra_metadata=metadata,
+    )
+
+
 def build_graph_from_chunks(neo4j, chunks: List[Dict]) -> None:
     created_docs = set()
     for ch in chunks:
@@ -1178,6 +1233,30 @@ def create_rag_pipeline(
         )
         return len(chunks)
 
+    def add_text(text: str, source: str, chunk_size: int = 800, chunk_overlap: int = 100,
+                 metadata: Optional[Dict[str, Any]] = None, source_label: str = "rag") -> List[str]:
+        """Chunk and index in-memory text; returns the chunk ids written"""
+        chunks = chunk_text(
+            text,
+            source=source,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            namespace=rag_namespace,
+            source_label=source_label,
+            metadata=metadata
+        )
+        index_chunks(
+            store=store,
+            chunks=chunks,
+            rag_namespace=rag_namespace
+        )
+        return [ch["id"] for ch in chunks]
+
+    def delete_chunks(chunk_ids: List[str]):
+        """Delete indexed chunks by id"""
+        if chunk_ids:
+            store.delete_memories(list(chunk_ids))
+
     def search(query: str, top_k: int = 8, score_threshold: Optional[float] = None):
         """Search RAG knowledge base"""
         return search_vectors(
@@ -1214,6 +1293,8 @@ def create_rag_pipeline(
         "store": store,
         "namespace": rag_namespace,
         "add_documents": add_documents,
+        "add_text": add_text,
+        "delete_chunks": delete_chunks,
         "search": search,
         "search_advanced": search_advanced,
         "get_stats": get_stats
@@ -0,0 +1,358 @@
+"""记忆快照 - 用户记忆的导出与导入
+
+快照是一个目录：
+- manifest.json：版本、用户、各类型条数、向量维度与嵌入模型
+- items.jsonl：每行一条记忆（内容、元数据、向量行号）
+- vectors.npy：float32 向量矩阵（可 mmap 读取），行号与 items.jsonl 对应
+- graph.jsonl：语义记忆写入的实体与关系
+
+导入时直接使用快照中的向量分批写入 SQLite / Qdrant / Neo4j，不调用嵌入模型；
+只有缺少向量的记忆（例如当初向量入库失败）才会重新嵌入。
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from .base import MemoryItem
+from .embedding import get_dimension, get_text_embedder
+
+if TYPE_CHECKING:
+    from .manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+_PAYLOAD_FIELDS = {"memory_id", "user_id", "content", "memory_type", "timestamp", "importance", "added_at"}
+
+
+def _item_record(memory_item: MemoryItem, vector_row: Optional[int]) -> Dict[str, Any]:
+    return {
+        "id": memory_item.id,
+        "memory_type": memory_item.memory_type,
+        "content": memory_item.content,
+        "timestamp": memory_item.timestamp.isoformat(),
+        "importance": memory_item.importance,
+        "metadata": memory_item.metadata,
+        "vector_row": vector_row,
+    }
+
+
+class _VectorWriter:
+    """逐行追加写入 .npy 向量矩阵：行数据先流式写入临时文件，结束时补写 .npy 头并拼接，内存占用与总行数无关"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self.rows = 0
+        self.dimension: Optional[int] = None
+
+    def append(self, vector: Any) -> int:
+        row = np.asarray(vector, dtype="<f4").reshape(-1)
+        if self.dimension is None:
+            self.dimension = int(row.shape[0])
+        elif row.shape[0] != self.dimension:
+            raise ValueError(f"向量维度不一致: {row.shape[0]} != {self.dimension}")
+        self._file.write(row.tobytes())
+        self.rows += 1
+        return self.rows - 1
+
+    def close(self, default_dimension: int):
+        self._file.close()
+        if self.dimension is None:
+            self.dimension = default_dimension
+        header = {"descr": "<f4", "fortran_order": False, "shape": (self.rows, self.dimension)}
+        with open(self.path, "wb") as out, open(self._tmp_path, "rb") as data:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(data, out, 1 << 20)
+        os.remove(self._tmp_path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def export_snapshot(
+        manager: "MemoryManager",
+        path: str,
+        memory_types: Optional[List[str]] = None,
+        batch_size: int = 500
+) -> Dict[str, Any]:
+    """导出用户记忆到快照目录
+
+    情景记忆按 (timestamp, id) 游标分页读取，每页批量取回向量；语义记忆按 Qdrant 分页遍历。
+    items.jsonl、vectors.npy 与 graph.jsonl 均逐批写出，不在内存中保留全部记忆与向量。
+
+    Args:
+        manager: 记忆管理器
+        path: 快照目录（不存在则创建）
+        memory_types: 要导出的记忆类型（默认全部启用的类型）
+        batch_size: 每页记忆数
+
+    Returns:
+        manifest 字典
+    """
+    os.makedirs(path, exist_ok=True)
+    if manager.journal is not None:
+        manager.flush_writes(timeout=manager.config.write_behind_settle_timeout)
+    targets = [t for t in (memory_types or list(manager.memory_types)) if t in manager.memory_types]
+
+    counts: Dict[str, int] = {}
+    graph_counts = {"entities": 0, "relationships": 0}
+    vectors = _VectorWriter(os.path.join(path, "vectors.npy"))
+
+    try:
+        with open(os.path.join(path, "items.jsonl"), "w", encoding="utf-8") as items_file:
+            def write(memory_item: MemoryItem, vector: Optional[Any]):
+                row = vectors.append(vector) if vector is not None else None
+                items_file.write(json.dumps(_item_record(memory_item, row), ensure_ascii=False, default=str) + "\n")
+                counts[memory_item.memory_type] = counts.get(memory_item.memory_type, 0) + 1
+
+            if "working" in targets:
+                for memory_item in manager.memory_types["working"].get_all():
+                    write(memory_item, None)
+
+            if "episodic" in targets:
+                episodic = manager.memory_types["episodic"]
+                cursor = None
+                while True:
+                    page = episodic.doc_store.list_memories(
+                        user_id=manager.user_id,
+                        memory_type="episodic",
+                        after=cursor,
+                        order="oldest",
+                        limit=batch_size
+                    )
+                    if not page:
+                        break
+                    page_vectors = episodic.vector_store.get_vectors([row["memory_id"] for row in page])
+                    for row in page:
+                        memory_item = MemoryItem(
+                            id=row["memory_id"],
+                            content=row["content"],
+                            memory_type="episodic",
+                            user_id=row["user_id"],
+                            timestamp=datetime.fromtimestamp(row["timestamp"]),
+                            importance=row["importance"],
+                            metadata=row.get("properties") or {}
+                        )
+                        write(memory_item, page_vectors.get(row["memory_id"]))
+                    if len(page) < batch_size:
+                        break
+                    cursor = (page[-1]["timestamp"], page[-1]["memory_id"])
+
+            if "semantic" in targets:
+                semantic = manager.memory_types["semantic"]
+                graph_file = None
+                seen_entities: set = set()
+                seen_relationships: set = set()
+                pending: Dict[str, List[str]] = {}  # 记忆ID -> 记录的实体ID
+
+                def flush_graph():
+                    nonlocal graph_file
+                    if not pending:
+                        return
+                    subgraph = semantic.graph_store.export_memory_subgraph(pending, batch_size=batch_size)
+                    pending.clear()
+                    if graph_file is None:
+                        graph_file = open(os.path.join(path, "graph.jsonl"), "w", encoding="utf-8")
+                    # 共享的实体与关系可能在多批中出现，只写一次
+                    for entity in subgraph["entities"]:
+                        if entity["id"] in seen_entities:
+                            continue
+                        seen_entities.add(entity["id"])
+                        graph_file.write(json.dumps({"kind": "entity", **entity}, ensure_ascii=False, default=str) + "\n")
+                    for rel in subgraph["relationships"]:
+                        key = (rel["from_id"], rel["type"], rel["to_id"])
+                        if key in seen_relationships:
+                            continue
+                        seen_relationships.add(key)
+                        graph_file.write(json.dumps({"kind": "relationship", **rel}, ensure_ascii=False, default=str) + "\n")
+
+                try:
+                    for point in semantic.vector_store.scroll_vectors(
+                            where={"user_id": manager.user_id, "memory_type": "semantic"},
+                            batch_size=batch_size
+                    ):
+                        payload = point["metadata"]
+                        memory_item = MemoryItem(
+                            id=payload["memory_id"],
+                            content=payload.get("content", ""),
+                            memory_type="semantic",
+                            user_id=payload.get("user_id", manager.user_id),
+                            timestamp=datetime.fromtimestamp(payload.get("timestamp") or 0),
+                            importance=payload.get("importance", 0.5),
+                            metadata={k: v for k, v in payload.items() if k not in _PAYLOAD_FIELDS}
+                        )
+                        write(memory_item, point["vector"])
+                        if semantic.graph_store:
+                            pending[memory_item.id] = memory_item.metadata.get("entities") or []
+                            if len(pending) >= batch_size:
+                                flush_graph()
+                    if semantic.graph_store:
+                        flush_graph()
+                finally:
+                    if graph_file is not None:
+                        graph_file.close()
+                graph_counts = {"entities": len(seen_entities), "relationships": len(seen_relationships)}
+    except BaseException:
+        vectors.abort()
+        raise
+
+    vectors.close(default_dimension=get_dimension())
+
+    try:
+        embedder = get_text_embedder()
+        embedding_model = getattr(embedder, "model_name", type(embedder).__name__)
+    except Exception:
+        embedding_model = None
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "user_id": manager.user_id,
+        "created_at": datetime.now().isoformat(),
+        "counts": counts,
+        "vectors": vectors.rows,
+        "dimension": vectors.dimension,
+        "embedding_model": embedding_model,
+        "graph": graph_counts,
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    logger.info(f"记忆快照已导出: {path} {counts}")
+    return manifest
+
+
+def _iter_chunks(items_path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    with open(items_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_graph(graph_path: str, kind: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    with open(graph_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.pop("kind", None) != kind:
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_snapshot(
+        manager: "MemoryManager",
+        path: str,
+        memory_types: Optional[List[str]] = None,
+        batch_size: int = 500
+) -> Dict[str, Any]:
+    """从快照目录导入记忆到当前用户
+
+    Args:
+        manager: 记忆管理器
+        path: 快照目录
+        memory_types: 要导入的记忆类型（默认快照中且已启用的全部类型）
+        batch_size: 每批写入条数
+
+    Returns:
+        导入报告：各类型导入/失败/重新嵌入的条数
+    """
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"不支持的快照版本: {manifest.get('version')}")
+
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    if vectors.shape[0] and vectors.shape[1] != get_dimension():
+        raise ValueError(
+            f"快照向量维度 {vectors.shape[1]} 与当前嵌入模型维度 {get_dimension()} 不一致，"
+            f"请使用相同的嵌入模型（快照: {manifest.get('embedding_model')}）"
+        )
+
+    targets = [t for t in (memory_types or list(manager.memory_types)) if t in manager.memory_types]
+    report: Dict[str, Any] = {t: {"imported": 0, "failed": 0, "reembedded": 0} for t in targets}
+
+    # 先写图数据，向量payload中的实体ID随后即可关联。
+    # 实体与关系按内容寻址、跨用户共享：已存在的节点与关系只合并所有者列表，其余属性保持不变；
+    # user_id 只写入本次新建的节点与关系
+    graph_path = os.path.join(path, "graph.jsonl")
+    semantic = manager.memory_types.get("semantic")
+    if "semantic" in targets and semantic is not None and semantic.graph_store and os.path.exists(graph_path):
+        for chunk in _iter_graph(graph_path, "entity", batch_size):
+            for entity in chunk:
+                entity["properties"]["user_id"] = manager.user_id
+            semantic.graph_store.add_entities_batch(chunk, update_existing=False)
+        for chunk in _iter_graph(graph_path, "relationship", batch_size):
+            for rel in chunk:
+                rel["properties"]["user_id"] = manager.user_id
+            semantic.graph_store.add_relationships_batch(chunk, update_existing=False)
+
+    for chunk in _iter_chunks(os.path.join(path, "items.jsonl"), batch_size):
+        groups: Dict[str, Dict[str, List[Any]]] = {}
+        for record in chunk:
+            memory_type = record["memory_type"]
+            if memory_type not in targets:
+                continue
+            memory_item = MemoryItem(
+                id=record["id"],
+                content=record["content"],
+                memory_type=memory_type,
+                user_id=manager.user_id,
+                timestamp=datetime.fromisoformat(record["timestamp"]),
+                importance=record["importance"],
+                metadata=record.get("metadata") or {}
+            )
+            group = groups.setdefault(
+                memory_type, {"with": [], "vectors": [], "ungraphed": [], "ungraphed_vectors": [], "without": []}
+            )
+            row = record.get("vector_row")
+            if row is None or memory_type == "working":
+                group["without"].append(memory_item)
+            elif memory_type == "semantic" and memory_item.metadata.get("graph_status") == "pending":
+                # 导出时图谱尚未增强：复用向量，图数据重新抽取
+                group["ungraphed"].append(memory_item)
+                group["ungraphed_vectors"].append(np.asarray(vectors[row]))
+            else:
+                group["with"].append(memory_item)
+                group["vectors"].append(np.asarray(vectors[row]))
+
+        for memory_type, group in groups.items():
+            batches = []
+            if group["with"]:
+                kwargs = {"embeddings": group["vectors"]}
+                if memory_type == "semantic":
+                    kwargs["extract_graph"] = False
+                batches.append((group["with"], kwargs))
+            if group["ungraphed"]:
+                batches.append((group["ungraphed"], {"embeddings": group["ungraphed_vectors"]}))
+            if group["without"]:
+                if memory_type != "working":
+                    report[memory_type]["reembedded"] += len(group["without"])
+                batches.append((group["without"], {}))
+            for items, kwargs in batches:
+                errors = manager.import_items(memory_type, items, **kwargs)
+                for error in errors:
+                    report[memory_type]["imported" if error is None else "failed"] += 1
+
+    logger.info(f"记忆快照已导入: {path} {report}")
+    return report
@@ -7,12 +7,13 @@
 """
 
 from .qdrant_store import QdrantVectorStore, QdrantConnectionManager
-from .neo4j_store import Neo4jGraphStore
+from .neo4j_store import Neo4jGraphStore, Neo4jConnectionManager
 from .document_store import DocumentStore, SQLiteDocumentStore
 __all__ = [
     "QdrantVectorStore",
     "QdrantConnectionManager",
     "Neo4jGraphStore",
+    "Neo4jConnectionManager",
     "DocumentStore",
     "SQLiteDocumentStore"
 ]
@@ -5,7 +5,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import sqlite3
 import json
 import os
@@ -34,6 +34,15 @@ class DocumentStore(ABC):
         """获取单个记忆"""
         pass
 
+    def get_memories(self, memory_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取记忆，返回 memory_id -> 记录（不存在的ID不出现在结果中）"""
+        memories = {}
+        for memory_id in memory_ids:
+            memory = self.get_memory(memory_id)
+            if memory:
+                memories[memory_id] = memory
+        return memories
+
     @abstractmethod
     def search_memories(
             self,
@@ -63,6 +72,10 @@ class DocumentStore(ABC):
         """删除记忆"""
         pass
 
+    def delete_memories(self, memory_ids: List[str]) -> int:
+        """批量删除记忆，返回删除条数"""
+        return sum(1 for memory_id in memory_ids if self.delete_memory(memory_id))
+
     @abstractmethod
     def get_database_stats(self) -> Dict[str, Any]:
         """获取数据库统计信息"""
@@ -151,6 +164,22 @@ class SQLiteDocumentStore(DocumentStore):
             )
         """)
 
+        # 旧库迁移：会话ID提升为独立列，便于按会话分页加载情景
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(memories)").fetchall()}
+        if "session_id" not in columns:
+            cursor.execute("ALTER TABLE memories ADD COLUMN session_id TEXT")
+            try:
+                cursor.execute("""
+                    UPDATE memories SET session_id = json_extract(properties, '$.session_id')
+                    WHERE properties IS NOT NULL
+                """)
+            except sqlite3.OperationalError:
+                # 未编译 JSON1 扩展时逐行回填
+                rows = cursor.execute("SELECT id, properties FROM memories WHERE properties IS NOT NULL").fetchall()
+                cursor.executemany("UPDATE memories SET session_id = ? WHERE id = ?", [
+                    ((json.loads(row["properties"]) or {}).get("session_id"), row["id"]) for row in rows
+                ])
+
         # 创建概念表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS concepts (
@@ -190,14 +219,72 @@ class SQLiteDocumentStore(DocumentStore):
             )
         """)
 
+        # 创建记忆路由表（memory_id -> 记忆类型与存储位置）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS memory_routes (
+                memory_id TEXT PRIMARY KEY,
+                memory_type TEXT NOT NULL,
+                locator TEXT NOT NULL,
+                user_id TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # 情景模式聚合（随情景增删增量维护）：按 用户/天/类别 计数，类别为
+        # episode（情景数）、keyword、context、hour（小时直方图）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS episode_patterns (
+                user_id TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                pattern TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, kind, pattern, day)
+            )
+        """)
+
+        # 会话统计（随情景增删增量维护）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS session_stats (
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                episode_count INTEGER NOT NULL,
+                importance_sum REAL NOT NULL,
+                first_ts INTEGER,
+                last_ts INTEGER,
+                PRIMARY KEY (user_id, session_id)
+            )
+        """)
+
+        # 工作记忆快照（管理器被换出时保存，恢复后删除）；与 memories 表分开，避免被记忆查询读到
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS working_snapshots (
+                memory_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                importance REAL NOT NULL,
+                properties TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
         # 创建索引
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_memories_user_id ON memories (user_id)",
             "CREATE INDEX IF NOT EXISTS idx_memories_type ON memories (memory_type)",
             "CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories (timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_memories_importance ON memories (importance)",
+            "CREATE INDEX IF NOT EXISTS idx_memories_session ON memories (session_id)",
+            # 复合索引：按类型/用户/会话过滤后按 (timestamp, id) 有序扫描，支撑时间线游标分页
+            "CREATE INDEX IF NOT EXISTS idx_memories_type_time ON memories (memory_type, timestamp, id)",
+            "CREATE INDEX IF NOT EXISTS idx_memories_type_user_time ON memories (memory_type, user_id, timestamp, id)",
+            "CREATE INDEX IF NOT EXISTS idx_memories_type_session_time ON memories (memory_type, session_id, timestamp, id)",
             "CREATE INDEX IF NOT EXISTS idx_memory_concepts_memory ON memory_concepts (memory_id)",
-            "CREATE INDEX IF NOT EXISTS idx_memory_concepts_concept ON memory_concepts (concept_id)"
+            "CREATE INDEX IF NOT EXISTS idx_memory_concepts_concept ON memory_concepts (concept_id)",
+            "CREATE INDEX IF NOT EXISTS idx_memory_routes_type ON memory_routes (memory_type)",
+            "CREATE INDEX IF NOT EXISTS idx_working_snapshots_user ON working_snapshots (user_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_episode_patterns_day ON episode_patterns (user_id, day, kind)"
         ]
 
         for index_sql in indexes:
@@ -226,8 +313,8 @@ class SQLiteDocumentStore(DocumentStore):
         # 插入记忆
         cursor.execute("""
             INSERT OR REPLACE INTO memories 
-            (id, user_id, content, memory_type, timestamp, importance, properties, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            (id, user_id, content, memory_type, timestamp, importance, properties, session_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         """, (
             memory_id,
             user_id,
@@ -235,12 +322,49 @@ class SQLiteDocumentStore(DocumentStore):
             memory_type,
             timestamp,
             importance,
-            json.dumps(properties) if properties else None
+            json.dumps(properties) if properties else None,
+            (properties or {}).get("session_id")
         ))
 
         conn.commit()
         return memory_id
 
+    def add_memories(self, records: List[Dict[str, Any]]) -> List[str]:
+        """批量添加记忆（单个事务）
+
+        Args:
+            records: 记录列表，字段与 add_memory 参数一致
+
+        Returns:
+            写入的记忆ID列表
+        """
+        if not records:
+            return []
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                [(uid, uid) for uid in {r["user_id"] for r in records}]
+            )
+            conn.executemany("""
+                INSERT OR REPLACE INTO memories
+                (id, user_id, content, memory_type, timestamp, importance, properties, session_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, [
+                (
+                    r["memory_id"],
+                    r["user_id"],
+                    r["content"],
+                    r["memory_type"],
+                    r["timestamp"],
+                    r["importance"],
+                    json.dumps(r["properties"]) if r.get("properties") else None,
+                    (r.get("properties") or {}).get("session_id")
+                )
+                for r in records
+            ])
+        return [r["memory_id"] for r in records]
+
     def get_memory(self, memory_id: str) -> Optional[Dict[str, Any]]:
         """获取单个记忆"""
         conn = self._get_connection()
@@ -256,6 +380,30 @@ class SQLiteDocumentStore(DocumentStore):
         if not row:
             return None
 
+        return self._row_to_memory(row)
+
+    # SQLite 默认单条语句最多 999 个绑定参数
+    _IN_CHUNK_SIZE = 500
+
+    def get_memories(self, memory_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取记忆（按块使用 IN (...) 查询），返回 memory_id -> 记录"""
+        conn = self._get_connection()
+        ids = list(dict.fromkeys(memory_ids))
+        memories = {}
+        for start in range(0, len(ids), self._IN_CHUNK_SIZE):
+            chunk = ids[start:start + self._IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"""
+                SELECT id, user_id, content, memory_type, timestamp, importance, properties, created_at
+                FROM memories
+                WHERE id IN ({placeholders})
+            """, chunk).fetchall()
+            for row in rows:
+                memories[row["id"]] = self._row_to_memory(row)
+        return memories
+
+    @staticmethod
+    def _row_to_memory(row) -> Dict[str, Any]:
         return {
             "memory_id": row["id"],
             "user_id": row["user_id"],
@@ -316,20 +464,240 @@ class SQLiteDocumentStore(DocumentStore):
             LIMIT ?
         """, params + [limit])
 
-        memories = []
-        for row in cursor.fetchall():
-            memories.append({
-                "memory_id": row["id"],
-                "user_id": row["user_id"],
-                "content": row["content"],
-                "memory_type": row["memory_type"],
-                "timestamp": row["timestamp"],
-                "importance": row["importance"],
-                "properties": json.loads(row["properties"]) if row["properties"] else {},
-                "created_at": row["created_at"]
-            })
+        return [self._row_to_memory(row) for row in cursor.fetchall()]
 
-        return memories
+    @staticmethod
+    def _filters(
+            user_id: Optional[str] = None,
+            memory_type: Optional[str] = None,
+            session_id: Optional[str] = None
+    ) -> Tuple[List[str], List[Any]]:
+        conditions, params = [], []
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if memory_type:
+            conditions.append("memory_type = ?")
+            params.append(memory_type)
+        if session_id:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        return conditions, params
+
+    _LIST_ORDERS = {
+        "recent": "timestamp DESC, id DESC",
+        "oldest": "timestamp ASC, id ASC",
+        "importance": "importance ASC, timestamp ASC",
+    }
+
+    def list_memories(
+            self,
+            user_id: Optional[str] = None,
+            memory_type: Optional[str] = None,
+            session_id: Optional[str] = None,
+            content_like: Optional[str] = None,
+            start_time: Optional[int] = None,
+            end_time: Optional[int] = None,
+            before: Optional[Tuple[int, str]] = None,
+            after: Optional[Tuple[int, str]] = None,
+            order: str = "recent",
+            limit: int = 500,
+            offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """分页列出记忆
+
+        Args:
+            user_id / memory_type / session_id: 过滤条件
+            content_like: 内容包含该子串（不区分ASCII大小写）
+            start_time / end_time: 时间戳范围（闭区间）
+            before / after: 游标 (timestamp, memory_id)，只返回严格早于/晚于该位置的记录（键集分页）
+            order: recent（新到旧）/ oldest（旧到新）/ importance（重要性由低到高）
+            limit: 每页条数
+            offset: 偏移量（大偏移量需扫描跳过的行，长列表应使用游标）
+        """
+        conditions, params = self._filters(user_id, memory_type, session_id)
+        if start_time is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            conditions.append("timestamp <= ?")
+            params.append(end_time)
+        if before is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(before)
+        if after is not None:
+            conditions.append("(timestamp, id) > (?, ?)")
+            params.extend(after)
+        if content_like:
+            escaped = content_like.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("content LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        rows = self._get_connection().execute(f"""
+            SELECT id, user_id, content, memory_type, timestamp, importance, properties, created_at
+            FROM memories
+            {where_clause}
+            ORDER BY {self._LIST_ORDERS[order]}
+            LIMIT ? OFFSET ?
+        """, params + [limit, offset]).fetchall()
+        return [self._row_to_memory(row) for row in rows]
+
+    def summarize_memories(
+            self,
+            user_id: Optional[str] = None,
+            memory_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """聚合统计：条数、会话数、平均重要性、时间范围"""
+        conditions, params = self._filters(user_id, memory_type)
+        where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        row = self._get_connection().execute(f"""
+            SELECT COUNT(*) AS count, COUNT(DISTINCT session_id) AS sessions,
+                   AVG(importance) AS avg_importance, MIN(timestamp) AS min_ts, MAX(timestamp) AS max_ts
+            FROM memories
+            {where_clause}
+        """, params).fetchone()
+        return {
+            "count": row["count"],
+            "sessions": row["sessions"],
+            "avg_importance": row["avg_importance"] or 0.0,
+            "min_timestamp": row["min_ts"],
+            "max_timestamp": row["max_ts"]
+        }
+
+    def list_sessions(
+            self,
+            user_id: Optional[str] = None,
+            memory_type: Optional[str] = None,
+            last_before: Optional[int] = None,
+            min_count: int = 1,
+            max_importance: Optional[float] = None,
+            min_candidates: int = 1,
+            before: Optional[Tuple[int, str, str]] = None,
+            limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """按最近活动时间（新到旧）列出会话
+
+        Args:
+            user_id / memory_type: 过滤条件
+            last_before: 只返回最近活动时间不晚于该时间戳的会话（已结束的会话）
+            min_count: 会话最少记忆条数
+            max_importance / min_candidates: 只返回重要性不高于 max_importance 的记忆
+                至少有 min_candidates 条的会话
+            before: 游标 (last_ts, user_id, session_id)，只返回严格排在该会话之后的会话（键集分页）
+            limit: 最多返回会话数
+        """
+        conditions, params = self._filters(user_id, memory_type)
+        conditions.append("session_id IS NOT NULL")
+        having = ["COUNT(*) >= ?"]
+        having_params: List[Any] = [min_count]
+        if last_before is not None:
+            having.append("MAX(timestamp) <= ?")
+            having_params.append(last_before)
+        if max_importance is not None:
+            having.append("SUM(CASE WHEN importance <= ? THEN 1 ELSE 0 END) >= ?")
+            having_params.extend([max_importance, min_candidates])
+        if before is not None:
+            having.append("(MAX(timestamp), user_id, session_id) < (?, ?, ?)")
+            having_params.extend(before)
+        rows = self._get_connection().execute(f"""
+            SELECT user_id, session_id, COUNT(*) AS count, MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts
+            FROM memories
+            WHERE {" AND ".join(conditions)}
+            GROUP BY user_id, session_id
+            HAVING {" AND ".join(having)}
+            ORDER BY last_ts DESC, user_id DESC, session_id DESC
+            LIMIT ?
+        """, params + having_params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def apply_pattern_deltas(self, pattern_rows: List[tuple], session_rows: List[tuple]):
+        """累加模式聚合与会话统计（单个事务）
+
+        Args:
+            pattern_rows: (user_id, day, kind, pattern, delta) 列表
+            session_rows: (user_id, session_id, count_delta, importance_delta, first_ts, last_ts) 列表，
+                删除时 first_ts/last_ts 传 None
+        """
+        if not pattern_rows and not session_rows:
+            return
+        conn = self._get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT INTO episode_patterns (user_id, day, kind, pattern, count) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, kind, pattern, day) DO UPDATE SET count = count + excluded.count
+            """, pattern_rows)
+            conn.executemany("""
+                INSERT INTO session_stats (user_id, session_id, episode_count, importance_sum, first_ts, last_ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, session_id) DO UPDATE SET
+                    episode_count = episode_count + excluded.episode_count,
+                    importance_sum = importance_sum + excluded.importance_sum,
+                    first_ts = MIN(first_ts, COALESCE(excluded.first_ts, first_ts)),
+                    last_ts = MAX(last_ts, COALESCE(excluded.last_ts, last_ts))
+            """, session_rows)
+            if any(row[4] < 0 for row in pattern_rows):
+                conn.execute("DELETE FROM episode_patterns WHERE count <= 0")
+            if any(row[2] < 0 for row in session_rows):
+                conn.execute("DELETE FROM session_stats WHERE episode_count <= 0")
+
+    def query_patterns(
+            self,
+            kinds: List[str],
+            user_id: Optional[str] = None,
+            start_day: Optional[int] = None,
+            end_day: Optional[int] = None,
+            min_count: int = 1,
+            limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """按类别汇总模式计数（可按用户与天范围过滤），按频率降序"""
+        conditions = [f"kind IN ({','.join('?' * len(kinds))})"]
+        params: List[Any] = list(kinds)
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if start_day is not None:
+            conditions.append("day >= ?")
+            params.append(start_day)
+        if end_day is not None:
+            conditions.append("day <= ?")
+            params.append(end_day)
+        params.append(min_count)
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT ?"
+            params.append(limit)
+        rows = self._get_connection().execute(f"""
+            SELECT kind, pattern, SUM(count) AS frequency
+            FROM episode_patterns
+            WHERE {" AND ".join(conditions)}
+            GROUP BY kind, pattern
+            HAVING SUM(count) >= ?
+            ORDER BY frequency DESC, pattern ASC
+            {limit_clause}
+        """, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_session_stats(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """会话统计，按最近活动时间降序"""
+        where_clause, params = ("WHERE user_id = ?", [user_id]) if user_id else ("", [])
+        rows = self._get_connection().execute(f"""
+            SELECT user_id, session_id, episode_count, importance_sum, first_ts, last_ts
+            FROM session_stats
+            {where_clause}
+            ORDER BY last_ts DESC
+            LIMIT ?
+        """, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear_pattern_stats(self):
+        """清空模式聚合与会话统计"""
+        conn = self._get_connection()
+        with conn:
+            conn.execute("DELETE FROM episode_patterns")
+            conn.execute("DELETE FROM session_stats")
+
+    def has_pattern_stats(self) -> bool:
+        return self._get_connection().execute("SELECT 1 FROM episode_patterns LIMIT 1").fetchone() is not None
 
     def update_memory(
             self,
@@ -357,6 +725,9 @@ class SQLiteDocumentStore(DocumentStore):
         if properties is not None:
             update_fields.append("properties = ?")
             params.append(json.dumps(properties))
+            if "session_id" in properties:
+                update_fields.append("session_id = ?")
+                params.append(properties["session_id"])
 
         if not update_fields:
             return False
@@ -384,6 +755,128 @@ class SQLiteDocumentStore(DocumentStore):
         conn.commit()
         return deleted_count > 0
 
+    def delete_memories(self, memory_ids: List[str]) -> int:
+        """批量删除记忆（按块使用 DELETE ... IN (...)，单个事务），返回删除条数"""
+        ids = list(dict.fromkeys(memory_ids))
+        if not ids:
+            return 0
+        conn = self._get_connection()
+        deleted = 0
+        with conn:
+            for start in range(0, len(ids), self._IN_CHUNK_SIZE):
+                chunk = ids[start:start + self._IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = conn.execute(f"DELETE FROM memories WHERE id IN ({placeholders})", chunk)
+                deleted += cursor.rowcount
+        return deleted
+
+    def memory_columns(
+            self,
+            user_id: Optional[str] = None,
+            memory_type: Optional[str] = None,
+            with_user: bool = False
+    ) -> List[tuple]:
+        """只读取遗忘筛选所需的列：(memory_id, importance, timestamp)
+
+        with_user=True 时追加 user_id 列，供按用户分组筛选。
+        """
+        conditions, params = self._filters(user_id, memory_type)
+        where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        columns = "id, importance, timestamp, user_id" if with_user else "id, importance, timestamp"
+        return [
+            tuple(row) for row in self._get_connection().execute(
+                f"SELECT {columns} FROM memories {where_clause}", params
+            )
+        ]
+
+    def set_route(self, memory_id: str, memory_type: str, locator: str, user_id: Optional[str] = None):
+        """记录记忆所在的类型与存储位置"""
+        conn = self._get_connection()
+        conn.execute("""
+            INSERT OR REPLACE INTO memory_routes (memory_id, memory_type, locator, user_id, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (memory_id, memory_type, locator, user_id))
+        conn.commit()
+
+    def set_routes(self, routes: List[tuple]):
+        """批量记录路由，routes 为 (memory_id, memory_type, locator, user_id) 元组列表"""
+        if not routes:
+            return
+        conn = self._get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO memory_routes (memory_id, memory_type, locator, user_id, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, routes)
+
+    def get_route(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """查询记忆路由"""
+        conn = self._get_connection()
+        row = conn.execute(
+            "SELECT memory_id, memory_type, locator, user_id FROM memory_routes WHERE memory_id = ?",
+            (memory_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def delete_routes(self, memory_ids: List[str]) -> int:
+        """删除记忆路由"""
+        if not memory_ids:
+            return 0
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM memory_routes WHERE memory_id = ?", [(mid,) for mid in memory_ids])
+        conn.commit()
+        return cursor.rowcount
+
+    def clear_routes(self, memory_type: Optional[str] = None, user_id: Optional[str] = None) -> int:
+        """清空路由（可按记忆类型、用户过滤）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        where_conditions = []
+        params = []
+        if memory_type:
+            where_conditions.append("memory_type = ?")
+            params.append(memory_type)
+        if user_id:
+            where_conditions.append("user_id = ?")
+            params.append(user_id)
+        where_clause = ("WHERE " + " AND ".join(where_conditions)) if where_conditions else ""
+        cursor.execute(f"DELETE FROM memory_routes {where_clause}", params)
+        conn.commit()
+        return cursor.rowcount
+
+    def save_working_snapshot(self, records: List[Dict[str, Any]]):
+        """保存工作记忆快照（单事务），records 每项含 memory_id/user_id/content/timestamp/importance/properties"""
+        if not records:
+            return
+        conn = self._get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO working_snapshots (memory_id, user_id, content, timestamp, importance, properties)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    r["memory_id"], r["user_id"], r["content"], r["timestamp"], r["importance"],
+                    json.dumps(r.get("properties") or {}, ensure_ascii=False)
+                )
+                for r in records
+            ])
+
+    def pop_working_snapshot(self, user_id: str) -> List[Dict[str, Any]]:
+        """读取并删除用户的工作记忆快照（按时间正序，单事务）"""
+        conn = self._get_connection()
+        with conn:
+            rows = conn.execute("""
+                SELECT memory_id, user_id, content, timestamp, importance, properties
+                FROM working_snapshots WHERE user_id = ? ORDER BY timestamp ASC
+            """, (user_id,)).fetchall()
+            if rows:
+                conn.execute("DELETE FROM working_snapshots WHERE user_id = ?", (user_id,))
+        return [
+            {**dict(row), "properties": json.loads(row["properties"]) if row["properties"] else {}}
+            for row in rows
+        ]
+
     def get_database_stats(self) -> Dict[str, Any]:
         """获取数据库统计信息"""
         conn = self._get_connection()
@@ -392,7 +885,8 @@ class SQLiteDocumentStore(DocumentStore):
         stats = {}
 
         # 统计各表的记录数
-        tables = ["users", "memories", "concepts", "memory_concepts", "concept_relationships"]
+        tables = ["users", "memories", "concepts", "memory_concepts", "concept_relationships", "memory_routes",
+                  "episode_patterns", "session_stats"]
         for table in tables:
             cursor.execute(f"SELECT COUNT(*) as count FROM {table}")
             stats[f"{table}_count"] = cursor.fetchone()["count"]
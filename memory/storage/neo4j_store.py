@@ -3,6 +3,8 @@ Neo4j图数据库存储实现
 """
 
 import logging
+import re
+import threading
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from neo4j import GraphDatabase
@@ -19,6 +21,77 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 关系类型无法参数化，只允许合法标识符进入 Cypher
+_RELATIONSHIP_TYPE_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RELATIONSHIP_TYPE_INVALID_RE = re.compile(r"[^A-Za-z0-9_]+")
+
+
+def sanitize_relationship_type(relationship_type: str) -> str:
+    """把任意字符串规范为合法的关系类型（大写，非法字符替换为下划线）
+
+    Raises:
+        ValueError: 规范化后为空
+    """
+    cleaned = _RELATIONSHIP_TYPE_INVALID_RE.sub("_", (relationship_type or "").strip()).strip("_").upper()
+    if not cleaned:
+        raise ValueError(f"非法的关系类型: {relationship_type!r}")
+    if not _RELATIONSHIP_TYPE_RE.match(cleaned):
+        cleaned = f"R_{cleaned}"
+    return cleaned
+
+
+def _owners(var: str) -> str:
+    """节点/关系的所有者记忆列表表达式（兼容只有单值 memory_id 的旧数据）
+
+    实体与关系按内容寻址、被多条记忆共享：memory_ids 记录全部写入过它的记忆，
+    memory_id 只保留最后一个所有者以兼容按单值读取的调用方。
+    """
+    return (f"coalesce({var}.memory_ids, "
+            f"CASE WHEN {var}.memory_id IS NULL THEN [] ELSE [{var}.memory_id] END)")
+
+
+def _add_owner(owners: List[str], properties: Dict[str, Any]) -> List[str]:
+    """把属性中的 memory_ids（快照导入时携带）与 memory_id 合并进所有者列表（去重）
+
+    memory_ids 从属性中取出，由写入查询与库中已有的所有者合并，避免 SET += 覆盖。
+    """
+    for memory_id in list(properties.pop("memory_ids", None) or []) + [properties.get("memory_id")]:
+        if memory_id and memory_id not in owners:
+            owners.append(memory_id)
+    return owners
+
+
+class Neo4jConnectionManager:
+    """Neo4j连接管理器 - 同一数据库的图存储（驱动与连接池）在进程内共享"""
+    _instances = {}  # key: (uri, username, database) -> Neo4jGraphStore instance
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(
+            cls,
+            uri: str = "bolt://localhost:7687",
+            username: str = "neo4j",
+            database: str = "neo4j",
+            **kwargs
+    ) -> 'Neo4jGraphStore':
+        """获取或创建Neo4j实例（单例模式）"""
+        key = (uri, username, database)
+
+        if key not in cls._instances:
+            with cls._lock:
+                if key not in cls._instances:
+                    logger.debug(f"🔄 创建新的Neo4j连接: {uri}/{database}")
+                    cls._instances[key] = Neo4jGraphStore(
+                        uri=uri,
+                        username=username,
+                        database=database,
+                        **kwargs
+                    )
+        else:
+            logger.debug(f"♻️ 复用现有Neo4j连接: {uri}/{database}")
+
+        return cls._instances[key]
+
 
 class Neo4jGraphStore:
     """Neo4j图数据库存储实现"""
@@ -98,12 +171,12 @@ class Neo4jGraphStore:
             raise
 
     def _create_indexes(self):
-        """创建必要的索引以提高查询性能"""
+        """创建必要的约束与索引以提高查询性能"""
         indexes = [
-            # 实体索引
-            "CREATE INDEX entity_id_index IF NOT EXISTS FOR (e:Entity) ON (e.id)",
+            # 实体索引（Entity.id 由唯一约束提供索引）
             "CREATE INDEX entity_name_index IF NOT EXISTS FOR (e:Entity) ON (e.name)",
             "CREATE INDEX entity_type_index IF NOT EXISTS FOR (e:Entity) ON (e.type)",
+            "CREATE INDEX entity_memory_id_index IF NOT EXISTS FOR (e:Entity) ON (e.memory_id)",
 
             # 记忆索引
             "CREATE INDEX memory_id_index IF NOT EXISTS FOR (m:Memory) ON (m.id)",
@@ -112,6 +185,7 @@ class Neo4jGraphStore:
         ]
 
         with self.driver.session(database=self.database) as session:
+            self._ensure_entity_id_constraint(session)
             for index_query in indexes:
                 try:
                     session.run(index_query)
@@ -120,6 +194,37 @@ class Neo4jGraphStore:
 
         logger.info("✅ Neo4j索引创建完成")
 
+    @staticmethod
+    def _ensure_entity_id_constraint(session):
+        """Entity.id 唯一约束：MERGE 走约束索引，并发 MERGE 不会产生重复节点
+
+        旧库上的同名普通索引会与约束冲突，先删除；已有重复节点导致约束创建失败时回退为普通索引。
+        """
+        try:
+            session.run(
+                "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS FOR (e:Entity) REQUIRE e.id IS UNIQUE"
+            ).consume()
+            return
+        except Exception as e:
+            logger.debug(f"唯一约束创建失败，尝试替换旧索引: {e}")
+        try:
+            session.run("DROP INDEX entity_id_index IF EXISTS").consume()
+            session.run(
+                "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS FOR (e:Entity) REQUIRE e.id IS UNIQUE"
+            ).consume()
+        except Exception as e:
+            logger.warning(f"⚠️ Entity.id 唯一约束创建失败（可能存在重复实体），回退为普通索引: {e}")
+            try:
+                session.run("CREATE INDEX entity_id_index IF NOT EXISTS FOR (e:Entity) ON (e.id)").consume()
+            except Exception as ie:
+                logger.debug(f"索引创建跳过 (可能已存在): {ie}")
+
+    @staticmethod
+    def _write_rows(tx, query: str, rows: List[Dict[str, Any]]) -> int:
+        """托管写事务函数：执行 UNWIND 查询并返回 written 计数"""
+        record = tx.run(query, rows=rows).single()
+        return record["written"] if record else 0
+
     def add_entity(self, entity_id: str, name: str, entity_type: str, properties: Dict[str, Any] = None) -> bool:
         """
         添加实体节点
@@ -142,15 +247,23 @@ class Neo4jGraphStore:
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             })
+            memory_ids = _add_owner([], props)
 
-            query = """
-            MERGE (e:Entity {id: $entity_id})
-            SET e += $properties
+            query = f"""
+            MERGE (e:Entity {{id: $entity_id}})
+            WITH e, {_owners("e")} AS owners
+            SET e += $properties,
+                e.memory_ids = owners + [m IN $memory_ids WHERE NOT m IN owners]
             RETURN e
             """
 
             with self.driver.session(database=self.database) as session:
-                result = session.run(query, entity_id=entity_id, properties=props)
+                result = session.run(
+                    query,
+                    entity_id=entity_id,
+                    properties=props,
+                    memory_ids=memory_ids
+                )
                 record = result.single()
 
                 if record:
@@ -182,18 +295,22 @@ class Neo4jGraphStore:
             bool: 是否成功
         """
         try:
+            relationship_type = sanitize_relationship_type(relationship_type)
             props = properties or {}
             props.update({
                 "type": relationship_type,
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             })
+            memory_ids = _add_owner([], props)
 
             query = f"""
             MATCH (from:Entity {{id: $from_id}})
             MATCH (to:Entity {{id: $to_id}})
-            MERGE (from)-[r:{relationship_type}]->(to)
-            SET r += $properties
+            MERGE (from)-[r:`{relationship_type}`]->(to)
+            WITH r, {_owners("r")} AS owners
+            SET r += $properties,
+                r.memory_ids = owners + [m IN $memory_ids WHERE NOT m IN owners]
             RETURN r
             """
 
@@ -202,7 +319,8 @@ class Neo4jGraphStore:
                     query,
                     from_id=from_entity_id,
                     to_id=to_entity_id,
-                    properties=props
+                    properties=props,
+                    memory_ids=memory_ids
                 )
                 record = result.single()
 
@@ -215,6 +333,200 @@ class Neo4jGraphStore:
             logger.error(f"❌ 添加关系失败: {e}")
             return False
 
+    def add_entities_batch(
+            self,
+            entities: List[Dict[str, Any]],
+            batch_size: int = 500,
+            update_existing: bool = True
+    ) -> int:
+        """
+        批量添加实体节点（参数化 UNWIND，每批一个托管写事务，失败时由驱动重试）
+
+        同一批内重复的实体ID只保留最后一次写入的属性，所有者记忆（memory_id）合并进 memory_ids 列表。
+
+        Args:
+            entities: 实体列表，每项包含 id、name、type 与可选的 properties
+            batch_size: 每个查询携带的实体数
+            update_existing: 为 False 时属性只写入新建节点，已存在的（跨用户共享的）节点只合并所有者列表
+
+        Returns:
+            int: 写入的实体数
+        """
+        if not entities:
+            return 0
+        now = datetime.now().isoformat()
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for entity in entities:
+            props = dict(entity.get("properties") or {})
+            props.update({
+                "id": entity["id"],
+                "name": entity["name"],
+                "type": entity["type"],
+                "created_at": now,
+                "updated_at": now
+            })
+            previous = by_id.get(entity["id"])
+            owners = _add_owner(previous["memory_ids"] if previous else [], props)
+            by_id[entity["id"]] = {"id": entity["id"], "properties": props, "memory_ids": owners}
+        rows = list(by_id.values())
+
+        set_properties = "SET e += row.properties" if update_existing else "ON CREATE SET e += row.properties"
+        query = f"""
+        UNWIND $rows AS row
+        MERGE (e:Entity {{id: row.id}})
+        {set_properties}
+        WITH e, row, {_owners("e")} AS owners
+        SET e.memory_ids = owners + [m IN row.memory_ids WHERE NOT m IN owners]
+        RETURN count(e) AS written
+        """
+        written = 0
+        try:
+            with self.driver.session(database=self.database) as session:
+                for start in range(0, len(rows), batch_size):
+                    written += session.execute_write(self._write_rows, query, rows[start:start + batch_size])
+            logger.debug(f"✅ 批量添加实体: {written}")
+        except Exception as e:
+            logger.error(f"❌ 批量添加实体失败: {e}")
+        return written
+
+    def add_relationships_batch(
+            self,
+            relationships: List[Dict[str, Any]],
+            batch_size: int = 500,
+            update_existing: bool = True
+    ) -> int:
+        """
+        批量添加实体间关系（按关系类型分组的参数化 UNWIND，每批一个托管写事务）
+
+        关系类型无法作为参数传入，写入前经 sanitize_relationship_type 规范化并以反引号引用；
+        无法规范化的关系被跳过；同一批内重复的关系合并所有者记忆列表。
+
+        Args:
+            relationships: 关系列表，每项包含 from_id、to_id、type 与可选的 properties
+            batch_size: 每个查询携带的关系数
+            update_existing: 为 False 时属性只写入新建关系，已存在的关系只合并所有者列表
+
+        Returns:
+            int: 写入的关系数
+        """
+        if not relationships:
+            return 0
+        now = datetime.now().isoformat()
+        by_type: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        for rel in relationships:
+            try:
+                relationship_type = sanitize_relationship_type(rel["type"])
+            except ValueError as e:
+                logger.warning(f"⚠️ 跳过关系: {e}")
+                continue
+            props = dict(rel.get("properties") or {})
+            props.update({"type": relationship_type, "created_at": now, "updated_at": now})
+            keyed_rows = by_type.setdefault(relationship_type, {})
+            previous = keyed_rows.get((rel["from_id"], rel["to_id"]))
+            keyed_rows[(rel["from_id"], rel["to_id"])] = {
+                "from_id": rel["from_id"],
+                "to_id": rel["to_id"],
+                "properties": props,
+                "memory_ids": _add_owner(previous["memory_ids"] if previous else [], props)
+            }
+
+        set_properties = "SET r += row.properties" if update_existing else "ON CREATE SET r += row.properties"
+        written = 0
+        try:
+            with self.driver.session(database=self.database) as session:
+                for relationship_type, keyed_rows in by_type.items():
+                    rows = list(keyed_rows.values())
+                    query = f"""
+                    UNWIND $rows AS row
+                    MATCH (from:Entity {{id: row.from_id}})
+                    MATCH (to:Entity {{id: row.to_id}})
+                    MERGE (from)-[r:`{relationship_type}`]->(to)
+                    {set_properties}
+                    WITH r, row, {_owners("r")} AS owners
+                    SET r.memory_ids = owners + [m IN row.memory_ids WHERE NOT m IN owners]
+                    RETURN count(r) AS written
+                    """
+                    for start in range(0, len(rows), batch_size):
+                        written += session.execute_write(self._write_rows, query, rows[start:start + batch_size])
+            logger.debug(f"✅ 批量添加关系: {written}")
+        except Exception as e:
+            logger.error(f"❌ 批量添加关系失败: {e}")
+        return written
+
+    def export_memory_subgraph(
+            self,
+            memory_entities: Dict[str, List[str]],
+            batch_size: int = 500
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        导出指定记忆写入的实体与关系
+
+        从记忆记录的实体ID出发（走 Entity.id 唯一约束索引），只在这些实体及其出边上按所有者列表过滤，
+        不扫描全图。
+
+        Args:
+            memory_entities: 记忆ID -> 该记忆元数据中记录的实体ID列表
+            batch_size: 每个查询携带的记忆数
+
+        Returns:
+            Dict: {"entities": [{id, name, type, properties}], "relationships": [{from_id, to_id, type, properties}]}
+        """
+        entities: Dict[str, Dict[str, Any]] = {}
+        relationships: List[Dict[str, Any]] = []
+        batches = self._owner_batches(memory_entities, batch_size)
+        if not batches:
+            return {"entities": [], "relationships": []}
+        with self.driver.session(database=self.database) as session:
+            for ids, entity_ids in batches:
+                for record in session.run(
+                    f"""
+                    UNWIND $entity_ids AS eid
+                    MATCH (e:Entity {{id: eid}})
+                    WHERE any(m IN {_owners('e')} WHERE m IN $ids)
+                    RETURN properties(e) AS props
+                    """,
+                    ids=ids,
+                    entity_ids=entity_ids
+                ):
+                    props = dict(record["props"])
+                    entities[props["id"]] = {
+                        "id": props["id"],
+                        "name": props.get("name", ""),
+                        "type": props.get("type", ""),
+                        "properties": props
+                    }
+                for record in session.run(
+                    f"""
+                    UNWIND $entity_ids AS eid
+                    MATCH (a:Entity {{id: eid}})-[r]->(b:Entity)
+                    WHERE any(m IN {_owners('r')} WHERE m IN $ids)
+                    RETURN a.id AS from_id, b.id AS to_id, type(r) AS type, properties(r) AS props
+                    """,
+                    ids=ids,
+                    entity_ids=entity_ids
+                ):
+                    relationships.append({
+                        "from_id": record["from_id"],
+                        "to_id": record["to_id"],
+                        "type": record["type"],
+                        "properties": dict(record["props"])
+                    })
+        return {"entities": list(entities.values()), "relationships": relationships}
+
+    @staticmethod
+    def _owner_batches(
+            memory_entities: Dict[str, List[str]],
+            batch_size: int
+    ) -> List[Tuple[List[str], List[str]]]:
+        """按记忆分批，返回 [(记忆ID列表, 这些记忆的实体ID并集)]；没有实体的记忆不产生图操作"""
+        items = [(memory_id, entity_ids) for memory_id, entity_ids in memory_entities.items() if entity_ids]
+        batches = []
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            entity_ids = list(dict.fromkeys(eid for _, ids in chunk for eid in ids))
+            batches.append(([memory_id for memory_id, _ in chunk], entity_ids))
+        return batches
+
     def find_related_entities(
             self,
             entity_id: str,
@@ -378,6 +690,209 @@ class Neo4jGraphStore:
             logger.error(f"❌ 删除实体失败: {e}")
             return False
 
+    def delete_memory_subgraph(self, memory_entities: Dict[str, List[str]], batch_size: int = 500) -> Dict[str, int]:
+        """
+        从实体与关系的所有者列表（memory_ids）中移除指定记忆，删除已无所有者的关系，
+        以及已无所有者且不再与其他实体相连的实体
+
+        只从记忆记录的实体ID出发匹配（走 Entity.id 唯一约束索引），在局部邻域内按所有者过滤；
+        没有实体的记忆不访问图数据库。被其他记忆共享的实体与关系只移除所有者，不会被删除。
+
+        Args:
+            memory_entities: 记忆ID -> 该记忆元数据中记录的实体ID列表
+            batch_size: 每个事务处理的记忆数
+
+        Returns:
+            Dict: {"relationships": 删除的关系数, "entities": 删除的实体数}
+        """
+        deleted = {"relationships": 0, "entities": 0}
+        batches = self._owner_batches(memory_entities, batch_size)
+        if not batches:
+            return deleted
+        try:
+            with self.driver.session(database=self.database) as session:
+                for ids, entity_ids in batches:
+                    relationships, entities = session.execute_write(self._delete_subgraph_tx, ids, entity_ids)
+                    deleted["relationships"] += relationships
+                    deleted["entities"] += entities
+            logger.info(f"✅ 批量删除记忆子图: {deleted}")
+        except Exception as e:
+            logger.error(f"❌ 批量删除记忆子图失败: {e}")
+        return deleted
+
+    @staticmethod
+    def _delete_subgraph_tx(tx, ids: List[str], entity_ids: List[str]) -> Tuple[int, int]:
+        # 记忆写入的关系两端都是该记忆的实体，从实体出边匹配即可覆盖
+        relationships = tx.run(
+            f"""
+            UNWIND $entity_ids AS eid
+            MATCH (:Entity {{id: eid}})-[r]->(:Entity)
+            WITH r, {_owners("r")} AS owners
+            WHERE any(m IN owners WHERE m IN $ids)
+            WITH r, [m IN owners WHERE NOT m IN $ids] AS remaining
+            SET r.memory_ids = remaining, r.memory_id = last(remaining)
+            WITH r WHERE size(remaining) = 0
+            DELETE r
+            """,
+            ids=ids,
+            entity_ids=entity_ids
+        ).consume().counters.relationships_deleted
+        entities = tx.run(
+            f"""
+            UNWIND $entity_ids AS eid
+            MATCH (e:Entity {{id: eid}})
+            WITH e, {_owners("e")} AS owners
+            WHERE any(m IN owners WHERE m IN $ids)
+            WITH e, [m IN owners WHERE NOT m IN $ids] AS remaining
+            SET e.memory_ids = remaining, e.memory_id = last(remaining)
+            WITH e WHERE size(remaining) = 0 AND NOT (e)--()
+            DELETE e
+            """,
+            ids=ids,
+            entity_ids=entity_ids
+        ).consume().counters.nodes_deleted
+        return relationships, entities
+
+    def scan_entities(self, batch_size: int = 1000):
+        """
+        按 id 顺序分页遍历全部实体节点（生成器，键集分页）
+
+        Yields:
+            Dict: 实体属性
+        """
+        last_id = ""
+        with self.driver.session(database=self.database) as session:
+            while True:
+                records = list(session.run(
+                    """
+                    MATCH (e:Entity) WHERE e.id > $last_id
+                    RETURN properties(e) AS props
+                    ORDER BY e.id
+                    LIMIT $limit
+                    """,
+                    last_id=last_id,
+                    limit=batch_size
+                ))
+                for record in records:
+                    yield dict(record["props"])
+                if len(records) < batch_size:
+                    return
+                last_id = records[-1]["props"]["id"]
+
+    def merge_entities(self, id_mapping: Dict[str, str], batch_size: int = 200) -> Dict[str, int]:
+        """
+        把旧ID的实体合并到新ID（重复节点迁移用）
+
+        对每个新ID：已存在该ID的节点作为目标；否则把第一个旧节点改名为新ID。
+        其余旧节点的出入关系按类型迁移到目标节点（MERGE，避免产生平行边；
+        被合并的边与节点的所有者列表 memory_ids 取并集），frequency 累加后删除旧节点。每批在一个托管写事务中完成。
+
+        Args:
+            id_mapping: 旧ID -> 新ID
+            batch_size: 每批处理的旧ID数
+
+        Returns:
+            Dict: {"renamed": 改名的节点数, "merged": 合并删除的节点数, "relationships": 迁移的关系数}
+        """
+        report = {"renamed": 0, "merged": 0, "relationships": 0}
+        mapping = {old: new for old, new in id_mapping.items() if old != new}
+        if not mapping:
+            return report
+
+        with self.driver.session(database=self.database) as session:
+            relationship_types = [record["type"] for record in session.run(
+                "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType AS type"
+            )]
+            existing = set()
+            targets = sorted(set(mapping.values()))
+            for start in range(0, len(targets), 1000):
+                existing.update(record["id"] for record in session.run(
+                    "MATCH (e:Entity) WHERE e.id IN $ids RETURN e.id AS id",
+                    ids=targets[start:start + 1000]
+                ))
+
+            # 无目标节点的新ID：第一个旧节点改名，其余合并进去
+            renames: List[Dict[str, str]] = []
+            merges: List[Dict[str, str]] = []
+            for old, new in sorted(mapping.items()):
+                if new in existing:
+                    merges.append({"dup": old, "canon": new})
+                else:
+                    renames.append({"old": old, "new": new})
+                    existing.add(new)
+
+            for start in range(0, len(renames), batch_size):
+                report["renamed"] += session.execute_write(
+                    self._write_rows,
+                    """
+                    UNWIND $rows AS row
+                    MATCH (e:Entity {id: row.old})
+                    SET e.id = row.new
+                    RETURN count(e) AS written
+                    """,
+                    [{"old": r["old"], "new": r["new"]} for r in renames[start:start + batch_size]]
+                )
+
+            for start in range(0, len(merges), batch_size):
+                rows = merges[start:start + batch_size]
+                moved, merged = session.execute_write(self._merge_entities_tx, rows, relationship_types)
+                report["relationships"] += moved
+                report["merged"] += merged
+
+        logger.info(f"✅ 实体ID迁移完成: {report}")
+        return report
+
+    @staticmethod
+    def _merge_entities_tx(tx, rows: List[Dict[str, str]], relationship_types: List[str]) -> Tuple[int, int]:
+        moved = 0
+        for relationship_type in relationship_types:
+            quoted = relationship_type.replace("`", "``")
+            # 出边（自环落到目标节点自身）
+            moved += tx.run(
+                f"""
+                UNWIND $rows AS row
+                MATCH (d:Entity {{id: row.dup}})-[r:`{quoted}`]->(o:Entity)
+                MATCH (c:Entity {{id: row.canon}})
+                WITH r, c, CASE WHEN o = d THEN c ELSE o END AS target
+                MERGE (c)-[nr:`{quoted}`]->(target)
+                WITH r, nr, {_owners("nr")} AS owners, {_owners("r")} AS incoming
+                SET nr += properties(r),
+                    nr.memory_ids = owners + [m IN incoming WHERE NOT m IN owners]
+                DELETE r
+                RETURN count(nr) AS moved
+                """,
+                rows=rows
+            ).single()["moved"]
+            # 入边
+            moved += tx.run(
+                f"""
+                UNWIND $rows AS row
+                MATCH (o:Entity)-[r:`{quoted}`]->(d:Entity {{id: row.dup}})
+                MATCH (c:Entity {{id: row.canon}})
+                MERGE (o)-[nr:`{quoted}`]->(c)
+                WITH r, nr, {_owners("nr")} AS owners, {_owners("r")} AS incoming
+                SET nr += properties(r),
+                    nr.memory_ids = owners + [m IN incoming WHERE NOT m IN owners]
+                DELETE r
+                RETURN count(nr) AS moved
+                """,
+                rows=rows
+            ).single()["moved"]
+        merged = tx.run(
+            f"""
+            UNWIND $rows AS row
+            MATCH (d:Entity {{id: row.dup}})
+            MATCH (c:Entity {{id: row.canon}})
+            WITH d, c, {_owners("c")} AS owners, {_owners("d")} AS incoming
+            SET c.frequency = coalesce(c.frequency, 1) + coalesce(d.frequency, 1),
+                c.memory_ids = owners + [m IN incoming WHERE NOT m IN owners]
+            DETACH DELETE d
+            RETURN count(*) AS merged
+            """,
+            rows=rows
+        ).single()["merged"]
+        return moved, merged
+
     def clear_all(self) -> bool:
         """
         清空所有数据
@@ -222,7 +222,9 @@ class QdrantVectorStore:
             self,
             vectors: List[List[float]],
             metadata: List[Dict[str, Any]],
-            ids: Optional[List[str]] = None
+            ids: Optional[List[str]] = None,
+            batch_size: Optional[int] = None,
+            wait: bool = True
     ) -> bool:
         """
         添加向量到Qdrant
@@ -231,6 +233,8 @@ class QdrantVectorStore:
             vectors: 向量列表
             metadata: 元数据列表
             ids: 可选的ID列表
+            batch_size: 分批upsert的批大小（None表示一次写入）
+            wait: 是否等待写入完成；分批时只等待最后一批（同一集合的更新按顺序应用）
 
         Returns:
             bool: 是否成功
@@ -261,7 +265,8 @@ class QdrantVectorStore:
 
                 # 添加时间戳到元数据
                 meta_with_timestamp = meta.copy()
-                meta_with_timestamp["timestamp"] = int(datetime.now().timestamp())
+                # 调用方提供的记忆时间戳优先（快照导入时需保留原始时间）
+                meta_with_timestamp.setdefault("timestamp", int(datetime.now().timestamp()))
                 meta_with_timestamp["added_at"] = int(datetime.now().timestamp())
                 if "external" in meta_with_timestamp and not isinstance(meta_with_timestamp.get("external"), bool):
                     # normalize to bool
@@ -292,12 +297,15 @@ class QdrantVectorStore:
                 return False
 
             # 批量插入
-            logger.info(f"[Qdrant] upsert begin: points={len(points)}")
-            operation_info = self.client.upsert(
-                collection_name=self.collection_name,
-                points=points,
-                wait=True
-            )
+            size = batch_size or len(points)
+            logger.info(f"[Qdrant] upsert begin: points={len(points)} batch_size={size}")
+            for start in range(0, len(points), size):
+                is_last = start + size >= len(points)
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points[start:start + size],
+                    wait=wait if is_last else False
+                )
             logger.info("[Qdrant] upsert done")
 
             logger.info(f"✅ 成功添加 {len(points)} 个向量到Qdrant")
@@ -382,6 +390,110 @@ class QdrantVectorStore:
             logger.error(f"❌ 向量搜索失败: {e}")
             return []
 
+    def scroll_vectors(
+            self,
+            where: Optional[Dict[str, Any]] = None,
+            batch_size: int = 256,
+            with_vectors: bool = True
+    ):
+        """
+        按过滤条件分页遍历点（生成器）
+
+        Args:
+            where: 过滤条件（字段等值匹配）
+            batch_size: 每页点数
+            with_vectors: 是否返回向量
+
+        Yields:
+            Dict: {"id", "vector", "metadata"}
+        """
+        query_filter = None
+        if where:
+            conditions = [
+                FieldCondition(key=key, match=MatchValue(value=value))
+                for key, value in where.items()
+                if isinstance(value, (str, int, float, bool))
+            ]
+            if conditions:
+                query_filter = Filter(must=conditions)
+
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=query_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors
+            )
+            for point in points:
+                yield {
+                    "id": point.id,
+                    "vector": point.vector if with_vectors else None,
+                    "metadata": point.payload or {}
+                }
+            if offset is None:
+                break
+
+    def get_vectors(self, memory_ids: List[str], batch_size: int = 256) -> Dict[str, List[float]]:
+        """
+        按 payload 中的 memory_id 批量取回向量（每批一个 MatchAny 条件）
+
+        Args:
+            memory_ids: 记忆ID列表
+            batch_size: 每次请求携带的ID数
+
+        Returns:
+            Dict: memory_id -> 向量（不存在的ID不出现在结果中）
+        """
+        vectors: Dict[str, List[float]] = {}
+        ids = list(dict.fromkeys(memory_ids))
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            query_filter = Filter(must=[
+                FieldCondition(key="memory_id", match=models.MatchAny(any=chunk))
+            ])
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=query_filter,
+                    limit=len(chunk),
+                    offset=offset,
+                    with_payload=["memory_id"],
+                    with_vectors=True
+                )
+                for point in points:
+                    memory_id = (point.payload or {}).get("memory_id")
+                    if memory_id is not None and point.vector is not None:
+                        vectors[memory_id] = point.vector
+                if offset is None:
+                    break
+        return vectors
+
+    def set_payloads(self, payloads: Dict[str, Dict[str, Any]]):
+        """
+        按 memory_id 批量合并更新payload（单次 batch_update_points 请求）
+
+        Args:
+            payloads: memory_id -> 需要写入的payload字段
+        """
+        if not payloads:
+            return
+        operations = [
+            models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload=payload,
+                filter=Filter(must=[FieldCondition(key="memory_id", match=MatchValue(value=memory_id))])
+            ))
+            for memory_id, payload in payloads.items()
+        ]
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=operations,
+            wait=False
+        )
+
     def delete_vectors(self, ids: List[str]) -> bool:
         """
         删除向量
@@ -430,28 +542,29 @@ class QdrantVectorStore:
             logger.error(f"❌ 清空集合失败: {e}")
             return False
 
-    def delete_memories(self, memory_ids: List[str]):
+    def delete_memories(self, memory_ids: List[str], batch_size: int = 1000):
         """
         删除指定记忆（通过payload中的 memory_id 过滤删除）
 
         注意：由于写入时可能将非UUID的点ID转换为UUID，这里不再依赖点ID，
         而是通过payload中的memory_id来匹配删除，确保一致性。
+        每批ID合并为一个 MatchAny 条件（命中 memory_id 的keyword索引），一次请求删除。
         """
         try:
             if not memory_ids:
                 return
-            # 构建 should 过滤条件：memory_id 等于任一给定值
-            conditions = [
-                FieldCondition(key="memory_id", match=MatchValue(value=mid))
-                for mid in memory_ids
-            ]
-            query_filter = Filter(should=conditions)
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=models.FilterSelector(filter=query_filter),
-                wait=True,
-            )
-            logger.info(f"✅ 成功按memory_id删除 {len(memory_ids)} 个Qdrant向量")
+            ids = list(dict.fromkeys(memory_ids))
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                query_filter = Filter(must=[
+                    FieldCondition(key="memory_id", match=models.MatchAny(any=chunk))
+                ])
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=models.FilterSelector(filter=query_filter),
+                    wait=True,
+                )
+            logger.info(f"✅ 成功按memory_id删除 {len(ids)} 个Qdrant向量")
         except Exception as e:
             logger.error(f"❌ 删除记忆失败: {e}")
             raise
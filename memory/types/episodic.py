@@ -7,18 +7,21 @@
 - 模式识别能力
 """
 
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
 import os
 import math
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
+from ..forgetting import select_victims, to_columns
 from ..storage import SQLiteDocumentStore
-from ..embedding import get_text_embedder, get_dimension
+from ..embedding import get_text_embedder, get_dimension, fill_embeddings
 
 class Episode:
     """情景记忆中的单个情景"""
@@ -43,6 +46,83 @@ class Episode:
         self.outcome = outcome
         self.importance = importance
 
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "Episode":
+        """由SQLite记录构建情景"""
+        properties = doc.get("properties") or {}
+        return cls(
+            episode_id=doc["memory_id"],
+            user_id=doc["user_id"],
+            session_id=properties.get("session_id", "default_session"),
+            timestamp=datetime.fromtimestamp(doc["timestamp"]),
+            content=doc["content"],
+            context=properties.get("context", {}),
+            outcome=properties.get("outcome"),
+            importance=doc.get("importance", 0.5)
+        )
+
+def encode_cursor(timestamp: int, episode_id: str) -> str:
+    """时间线游标：时间戳 + 情景ID（同一秒内按ID定序）"""
+    return f"{int(timestamp)}:{episode_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    timestamp, _, episode_id = cursor.partition(":")
+    return int(timestamp), episode_id
+
+
+class EpisodeCache:
+    """有界 LRU 情景缓存（episode_id -> Episode），增量维护常驻内容字节数"""
+
+    def __init__(self, capacity: int = 2000):
+        self.capacity = max(0, capacity)
+        self._episodes: "OrderedDict[str, Episode]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.content_bytes = 0  # 缓存内容字节数（UTF-8），供管理器池估算常驻量
+        self._lock = threading.Lock()
+
+    def get(self, episode_id: str) -> Optional[Episode]:
+        with self._lock:
+            episode = self._episodes.get(episode_id)
+            if episode is not None:
+                self._episodes.move_to_end(episode_id)
+            return episode
+
+    def put(self, episode: Episode):
+        """放入或刷新情景（内容被修改后再次 put 以更新字节数）"""
+        if not self.capacity:
+            return
+        with self._lock:
+            size = len(episode.content.encode("utf-8"))
+            self.content_bytes += size - self._sizes.get(episode.episode_id, 0)
+            self._sizes[episode.episode_id] = size
+            self._episodes[episode.episode_id] = episode
+            self._episodes.move_to_end(episode.episode_id)
+            while len(self._episodes) > self.capacity:
+                evicted, _ = self._episodes.popitem(last=False)
+                self.content_bytes -= self._sizes.pop(evicted, 0)
+
+    def pop(self, episode_id: str) -> Optional[Episode]:
+        with self._lock:
+            self.content_bytes -= self._sizes.pop(episode_id, 0)
+            return self._episodes.pop(episode_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._episodes.clear()
+            self._sizes.clear()
+            self.content_bytes = 0
+
+    def values(self) -> List[Episode]:
+        with self._lock:
+            return list(self._episodes.values())
+
+    def __contains__(self, episode_id: str) -> bool:
+        return episode_id in self._episodes
+
+    def __len__(self) -> int:
+        return len(self._episodes)
+
 class EpisodicMemory(BaseMemory):
     """情景记忆实现
 
@@ -56,13 +136,9 @@ class EpisodicMemory(BaseMemory):
     def __init__(self, config: MemoryConfig, storage_backend=None):
         super().__init__(config, storage_backend)
 
-        # 本地缓存（内存）
-        self.episodes: List[Episode] = []
-        self.sessions: Dict[str, List[str]] = {}  # session_id -> episode_ids
-
-        # 模式识别缓存
-        self.patterns_cache = {}
-        self.last_pattern_analysis = None
+        # 本地缓存（有界LRU，按需从SQLite加载；SQLite为权威存储）
+        self.cache = EpisodeCache(self.config.episodic_cache_size)
+        self.page_size = max(1, self.config.episodic_page_size)
 
         # 权威文档存储（SQLite）
         db_dir = self.config.storage_path if hasattr(self.config, 'storage_path') else "./memory_data"
@@ -70,6 +146,10 @@ class EpisodicMemory(BaseMemory):
         db_path = os.path.join(db_dir, "memory.db")
         self.doc_store = SQLiteDocumentStore(db_path=db_path)
 
+        # 旧库首次启用模式聚合时一次性回填
+        if not self.doc_store.has_pattern_stats() and self.doc_store.summarize_memories(memory_type="episodic")["count"]:
+            self.rebuild_pattern_stats()
+
         # 统一嵌入模型（多语言，默认384维）
         self.embedder = get_text_embedder()
 
@@ -105,13 +185,9 @@ class EpisodicMemory(BaseMemory):
             outcome=outcome,
             importance=memory_item.importance
         )
-        self.episodes.append(episode)
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        self.sessions[session_id].append(episode.episode_id)
-
         # 1) 权威存储（SQLite）
         ts_int = int(memory_item.timestamp.timestamp())
+        previous = self.doc_store.get_memory(memory_item.id)
         self.doc_store.add_memory(
             memory_id=memory_item.id,
             user_id=memory_item.user_id,
@@ -127,6 +203,8 @@ class EpisodicMemory(BaseMemory):
                 "tags": tags
             }
         )
+        self.cache.put(episode)
+        self._record_patterns(added=[episode], removed=[Episode.from_doc(previous)] if previous else [])
 
         # 2) 向量索引（Qdrant）
         try:
@@ -151,6 +229,90 @@ class EpisodicMemory(BaseMemory):
 
         return memory_item.id
 
+    def add_batch(
+        self,
+        memory_items: List[MemoryItem],
+        embeddings: Optional[List[Any]] = None
+    ) -> List[Optional[str]]:
+        """批量添加情景记忆
+
+        SQLite 单事务写入；嵌入按提供商批大小分批计算（embeddings 中携带的向量直接使用，
+        如快照导入、记忆整合，缺失项为 None 时只补算这些）；Qdrant 分批 upsert。
+        向量入库失败与单条添加一致，不影响权威存储。
+        """
+        if not memory_items:
+            return []
+
+        records = []
+        episodes = []
+        for memory_item in memory_items:
+            session_id = memory_item.metadata.get("session_id", "default_session")
+            context = memory_item.metadata.get("context", {})
+            outcome = memory_item.metadata.get("outcome")
+            episodes.append(Episode(
+                episode_id=memory_item.id,
+                user_id=memory_item.user_id,
+                session_id=session_id,
+                timestamp=memory_item.timestamp,
+                content=memory_item.content,
+                context=context,
+                outcome=outcome,
+                importance=memory_item.importance
+            ))
+            records.append({
+                "memory_id": memory_item.id,
+                "user_id": memory_item.user_id,
+                "content": memory_item.content,
+                "memory_type": "episodic",
+                "timestamp": int(memory_item.timestamp.timestamp()),
+                "importance": memory_item.importance,
+                "properties": {
+                    "session_id": session_id,
+                    "context": context,
+                    "outcome": outcome,
+                    "participants": memory_item.metadata.get("participants", []),
+                    "tags": memory_item.metadata.get("tags", [])
+                }
+            })
+
+        # 1) 权威存储（SQLite，单事务）
+        try:
+            previous = self.doc_store.get_memories([m.id for m in memory_items])
+            self.doc_store.add_memories(records)
+        except Exception as e:
+            logger.error(f"❌ 批量写入情景记忆失败: {e}")
+            return [str(e)] * len(memory_items)
+
+        for episode in episodes:
+            self.cache.put(episode)
+        self._record_patterns(added=episodes, removed=[Episode.from_doc(doc) for doc in previous.values()])
+
+        # 2) 向量索引（Qdrant）
+        try:
+            embeddings = fill_embeddings(
+                [m.content for m in memory_items],
+                embeddings,
+                model=self.embedder,
+                batch_size=self.config.embedding_batch_size
+            )
+            self.vector_store.add_vectors(
+                vectors=[e.tolist() if hasattr(e, "tolist") else list(e) for e in embeddings],
+                metadata=[{
+                    "memory_id": m.id,
+                    "user_id": m.user_id,
+                    "memory_type": "episodic",
+                    "importance": m.importance,
+                    "session_id": episode.session_id,
+                    "content": m.content
+                } for m, episode in zip(memory_items, episodes)],
+                ids=[m.id for m in memory_items],
+                batch_size=self.config.vector_upsert_batch_size
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 批量向量入库失败: {e}")
+
+        return [None] * len(memory_items)
+
     def retrieve(self, query: str, limit: int = 5, **kwargs) -> List[MemoryItem]:
         """检索情景记忆（结构化过滤 + 语义向量检索）"""
         user_id = kwargs.get("user_id")
@@ -158,20 +320,8 @@ class EpisodicMemory(BaseMemory):
         time_range: Optional[Tuple[datetime, datetime]] = kwargs.get("time_range")
         importance_threshold: Optional[float] = kwargs.get("importance_threshold")
 
-        # 结构化过滤候选（来自权威库）
-        candidate_ids: Optional[set] = None
-        if time_range is not None or importance_threshold is not None:
-            start_ts = int(time_range[0].timestamp()) if time_range else None
-            end_ts = int(time_range[1].timestamp()) if time_range else None
-            docs = self.doc_store.search_memories(
-                user_id=user_id,
-                memory_type="episodic",
-                start_time=start_ts,
-                end_time=end_ts,
-                importance_threshold=importance_threshold,
-                limit=1000
-            )
-            candidate_ids = {d["memory_id"] for d in docs}
+        start_ts = int(time_range[0].timestamp()) if time_range else None
+        end_ts = int(time_range[1].timestamp()) if time_range else None
 
         # 向量检索（Qdrant）
         try:
@@ -189,33 +339,47 @@ class EpisodicMemory(BaseMemory):
         except Exception:
             hits = []
 
-        # 过滤与重排
-        now_ts = int(datetime.now().timestamp())
-        results: List[Tuple[float, MemoryItem]] = []
+        # 先用payload与内存索引做廉价过滤，再一次性从权威库批量读取完整记录
+        candidates: List[Tuple[str, float]] = []
         seen = set()
         for hit in hits:
             meta = hit.get("metadata", {})
             mem_id = meta.get("memory_id")
             if not mem_id or mem_id in seen:
                 continue
+            seen.add(mem_id)
 
-            # 检查是否已遗忘
-            episode = next((e for e in self.episodes if e.episode_id == mem_id), None)
+            # 检查是否已遗忘（缓存命中时提前过滤，未命中的在读取记录后过滤）
+            episode = self.cache.get(mem_id)
             if episode and episode.context.get("forgotten", False):
                 continue  # 跳过已遗忘的记忆
-
-            if candidate_ids is not None and mem_id not in candidate_ids:
-                continue
             if session_id and meta.get("session_id") != session_id:
                 continue
+            candidates.append((mem_id, float(hit.get("score", 0.0))))
+
+        docs = self.doc_store.get_memories([mem_id for mem_id, _ in candidates]) if candidates else {}
 
-            # 从权威库读取完整记录
-            doc = self.doc_store.get_memory(mem_id)
+        # 过滤与重排
+        now_ts = int(datetime.now().timestamp())
+        results: List[Tuple[float, MemoryItem]] = []
+        for mem_id, vec_score in candidates:
+            doc = docs.get(mem_id)
             if not doc:
                 continue
+            if (doc.get("properties") or {}).get("context", {}).get("forgotten", False):
+                continue
+            if mem_id not in self.cache:
+                self.cache.put(Episode.from_doc(doc))
+
+            # 结构化过滤（时间范围、重要性阈值）
+            if start_ts is not None and int(doc["timestamp"]) < start_ts:
+                continue
+            if end_ts is not None and int(doc["timestamp"]) > end_ts:
+                continue
+            if importance_threshold and float(doc.get("importance", 0.5)) < importance_threshold:
+                continue
 
             # 计算综合分数：向量0.6 + 近因0.2 + 重要性0.2
-            vec_score = float(hit.get("score", 0.0))
             age_days = max(0.0, (now_ts - int(doc["timestamp"])) / 86400.0)
             recency_score = 1.0 / (1.0 + age_days)
             imp = float(doc.get("importance", 0.5))
@@ -245,13 +409,12 @@ class EpisodicMemory(BaseMemory):
                 }
             )
             results.append((combined, item))
-            seen.add(mem_id)
 
         # 若向量检索无结果，回退到简单关键词匹配（内存缓存）
         if not results:
             fallback = super()._generate_id  # 占位以避免未使用警告
             query_lower = query.lower()
-            for ep in self._filter_episodes(user_id, session_id, time_range):
+            for ep in self._filter_episodes(user_id, session_id, time_range, content_like=query):
                 if query_lower in ep.content.lower():
                     recency_score = 1.0 / (1.0 + max(0.0, (now_ts - int(ep.timestamp.timestamp())) / 86400.0))
                     # 回退匹配：新评分算法
@@ -287,26 +450,30 @@ class EpisodicMemory(BaseMemory):
     ) -> bool:
         """更新情景记忆（SQLite为权威，Qdrant按需重嵌入）"""
         updated = False
-        for episode in self.episodes:
-            if episode.episode_id == memory_id:
-                if content is not None:
-                    episode.content = content
-                if importance is not None:
-                    episode.importance = importance
-                if metadata is not None:
-                    episode.context.update(metadata.get("context", {}))
-                    if "outcome" in metadata:
-                        episode.outcome = metadata["outcome"]
-                updated = True
-                break
+        episode = self.cache.get(memory_id)
+        if episode is not None:
+            if content is not None:
+                episode.content = content
+                self.cache.put(episode)
+            if importance is not None:
+                episode.importance = importance
+            if metadata is not None:
+                episode.context.update(metadata.get("context", {}))
+                if "outcome" in metadata:
+                    episode.outcome = metadata["outcome"]
+            updated = True
 
         # 更新SQLite
+        previous = self.doc_store.get_memory(memory_id)
         doc_updated = self.doc_store.update_memory(
             memory_id=memory_id,
             content=content,
             importance=importance,
             properties=metadata
         )
+        if doc_updated and previous:
+            current = self.doc_store.get_memory(memory_id)
+            self._record_patterns(added=[Episode.from_doc(current)], removed=[Episode.from_doc(previous)])
 
         # 如内容变更，重嵌入并upsert到Qdrant
         if content is not None:
@@ -336,45 +503,72 @@ class EpisodicMemory(BaseMemory):
     
     def remove(self, memory_id: str) -> bool:
         """删除情景记忆（SQLite + Qdrant）"""
-        removed = False
-        for i, episode in enumerate(self.episodes):
-            if episode.episode_id == memory_id:
-                removed_episode = self.episodes.pop(i)
-                session_id = removed_episode.session_id
-                if session_id in self.sessions:
-                    self.sessions[session_id].remove(memory_id)
-                    if not self.sessions[session_id]:
-                        del self.sessions[session_id]
-                removed = True
-                break
+        removed = self.cache.pop(memory_id) is not None
 
         # 权威库删除
+        previous = self.doc_store.get_memory(memory_id)
         doc_deleted = self.doc_store.delete_memory(memory_id)
+        if doc_deleted and previous and previous["memory_type"] == "episodic":
+            self._record_patterns(removed=[Episode.from_doc(previous)])
         
         # 向量库删除
         try:
             self.vector_store.delete_memories([memory_id])
         except Exception:
             pass
-        
+
+        if removed or doc_deleted:
+            self._notify_removed(memory_id)
         return removed or doc_deleted
     
+    def get_embeddings(self, memory_ids: List[str]) -> Dict[str, Any]:
+        """从Qdrant批量取回已有向量（整合到其他记忆类型时复用，避免重新嵌入）"""
+        try:
+            return self.vector_store.get_vectors(memory_ids)
+        except Exception as e:
+            logger.warning(f"⚠️ 批量读取情景向量失败: {e}")
+            return {}
+
+    def remove_batch(self, memory_ids: List[str]) -> List[str]:
+        """批量删除情景记忆：SQLite 一次 DELETE ... IN、Qdrant 一次过滤删除、模式聚合一次增量"""
+        ids = list(dict.fromkeys(memory_ids))
+        if not ids:
+            return []
+        cached = {memory_id for memory_id in ids if self.cache.pop(memory_id) is not None}
+
+        # 权威库删除（先批量读出原记录用于扣减模式聚合）
+        previous = self.doc_store.get_memories(ids)
+        episodic_docs = {mid: doc for mid, doc in previous.items() if doc["memory_type"] == "episodic"}
+        if episodic_docs:
+            self.doc_store.delete_memories(list(episodic_docs))
+            self._record_patterns(removed=[Episode.from_doc(doc) for doc in episodic_docs.values()])
+
+        # 向量库删除
+        try:
+            self.vector_store.delete_memories(ids)
+        except Exception:
+            pass
+
+        removed = [memory_id for memory_id in ids if memory_id in cached or memory_id in episodic_docs]
+        self._notify_removed_batch(removed)
+        return removed
+
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在"""
-        return any(episode.episode_id == memory_id for episode in self.episodes)
+        if memory_id in self.cache:
+            return True
+        doc = self.doc_store.get_memory(memory_id)
+        return doc is not None and doc["memory_type"] == "episodic"
     
     def clear(self):
         """清空所有情景记忆（仅清理episodic，不影响其他类型）"""
         # 内存缓存
-        self.episodes.clear()
-        self.sessions.clear()
-        self.patterns_cache.clear()
+        self.cache.clear()
+        self.doc_store.clear_pattern_stats()
 
         # SQLite内的episodic全部删除
-        docs = self.doc_store.search_memories(memory_type="episodic", limit=10000)
-        ids = [d["memory_id"] for d in docs]
-        for mid in ids:
-            self.doc_store.delete_memory(mid)
+        ids = [row[0] for row in self.doc_store.memory_columns(memory_type="episodic")]
+        self.doc_store.delete_memories(ids)
 
         # Qdrant按ID删除对应向量
         try:
@@ -383,48 +577,49 @@ class EpisodicMemory(BaseMemory):
         except Exception:
             pass
 
-    def forget(self, strategy: str = "importance_based", threshold: float = 0.1, max_age_days: int = 30) -> int:
-        """情景记忆遗忘机制（硬删除）"""
-        forgotten_count = 0
-        current_time = datetime.now()
-        
-        to_remove = []  # 收集要删除的记忆ID
-        
-        for episode in self.episodes:
-            should_forget = False
-            
-            if strategy == "importance_based":
-                # 基于重要性遗忘
-                if episode.importance < threshold:
-                    should_forget = True
-            elif strategy == "time_based":
-                # 基于时间遗忘
-                cutoff_time = current_time - timedelta(days=max_age_days)
-                if episode.timestamp < cutoff_time:
-                    should_forget = True
-            elif strategy == "capacity_based":
-                # 基于容量遗忘（保留最重要的）
-                if len(self.episodes) > self.config.max_capacity:
-                    sorted_episodes = sorted(self.episodes, key=lambda e: e.importance)
-                    excess_count = len(self.episodes) - self.config.max_capacity
-                    if episode in sorted_episodes[:excess_count]:
-                        should_forget = True
-            
-            if should_forget:
-                to_remove.append(episode.episode_id)
-        
-        # 执行硬删除
-        for episode_id in to_remove:
-            if self.remove(episode_id):
-                forgotten_count += 1
-                logger.info(f"情景记忆硬删除: {episode_id[:8]}... (策略: {strategy})")
-        
-        return forgotten_count
+    def forget(
+            self,
+            strategy: str = "importance_based",
+            threshold: float = 0.1,
+            max_age_days: int = 30,
+            user_id: Optional[str] = None
+    ) -> int:
+        """情景记忆遗忘机制（硬删除）
+
+        只从SQLite读取 (ID, 重要性, 时间戳) 三列，向量化选出全部待删除记忆后一次批量删除。
+        memory.db 由多个用户共享：指定 user_id 时只筛选该用户的情景；
+        未指定时按用户分组筛选，容量上限按用户分别计算。
+        """
+        groups: Dict[str, List[Tuple[str, float, int]]] = {}
+        for memory_id, importance, timestamp, owner in self.doc_store.memory_columns(
+                user_id=user_id, memory_type="episodic", with_user=True):
+            groups.setdefault(owner, []).append((memory_id, importance, timestamp))
+
+        to_remove: List[str] = []
+        now = datetime.now()
+        for rows in groups.values():
+            ids, importance, timestamps = to_columns(rows)
+            victims = select_victims(
+                importance,
+                timestamps,
+                strategy=strategy,
+                threshold=threshold,
+                max_age_days=max_age_days,
+                capacity=self.config.max_capacity,
+                now=now
+            )
+            to_remove.extend(ids[i] for i in victims)
+        if not to_remove:
+            return 0
+
+        removed = self.remove_batch(to_remove)
+        logger.info(f"情景记忆硬删除: {len(removed)} 条 (策略: {strategy})")
+        return len(removed)
 
     def get_all(self) -> List[MemoryItem]:
         """获取所有情景记忆（转换为MemoryItem格式）"""
         memory_items = []
-        for episode in self.episodes:
+        for episode in self._iter_episodes():
             memory_item = MemoryItem(
                 id=episode.episode_id,
                 content=episode.content,
@@ -432,7 +627,11 @@ class EpisodicMemory(BaseMemory):
                 user_id=episode.user_id,
                 timestamp=episode.timestamp,
                 importance=episode.importance,
-                metadata=episode.metadata
+                metadata={
+                    "session_id": episode.session_id,
+                    "context": episode.context,
+                    "outcome": episode.outcome
+                }
             )
             memory_items.append(memory_item)
         return memory_items
@@ -440,7 +639,7 @@ class EpisodicMemory(BaseMemory):
     def get_stats(self) -> Dict[str, Any]:
         """获取情景记忆统计信息（合并SQLite与Qdrant）"""
         # 硬删除模式：所有episodes都是活跃的
-        active_episodes = self.episodes
+        summary = self.doc_store.summarize_memories(memory_type="episodic")
         
         db_stats = self.doc_store.get_database_stats()
         try:
@@ -448,132 +647,299 @@ class EpisodicMemory(BaseMemory):
         except Exception:
             vs_stats = {"store_type": "qdrant"}
         return {
-            "count": len(active_episodes),  # 活跃记忆数量
+            "count": summary["count"],  # 活跃记忆数量
             "forgotten_count": 0,  # 硬删除模式下已遗忘的记忆会被直接删除
-            "total_count": len(self.episodes),  # 总记忆数量
-            "sessions_count": len(self.sessions),
-            "avg_importance": sum(e.importance for e in active_episodes) / len(active_episodes) if active_episodes else 0.0,
-            "time_span_days": self._calculate_time_span(),
+            "total_count": summary["count"],  # 总记忆数量
+            "sessions_count": summary["sessions"],
+            "cached_count": len(self.cache),
+            "avg_importance": summary["avg_importance"],
+            "time_span_days": self._calculate_time_span(summary),
             "memory_type": "episodic",
             "vector_store": vs_stats,
             "document_store": {k: v for k, v in db_stats.items() if k.endswith("_count") or k in ["store_type", "db_path"]}
         }
     
-    def get_session_episodes(self, session_id: str) -> List[Episode]:
-        """获取指定会话的所有情景"""
-        if session_id not in self.sessions:
-            return []
-        
-        episode_ids = self.sessions[session_id]
-        return [e for e in self.episodes if e.episode_id in episode_ids]
-    
-    def find_patterns(self, user_id: str = None, min_frequency: int = 2) -> List[Dict[str, Any]]:
-        """发现用户行为模式"""
-        # 检查缓存
-        cache_key = f"{user_id}_{min_frequency}"
-        if (cache_key in self.patterns_cache and 
-            self.last_pattern_analysis and 
-            (datetime.now() - self.last_pattern_analysis).hours < 1):
-            return self.patterns_cache[cache_key]
-        
-        # 过滤情景
-        episodes = [e for e in self.episodes if user_id is None or e.user_id == user_id]
-        
-        # 简单的模式识别：基于内容关键词
-        keyword_patterns = {}
-        context_patterns = {}
-        
-        for episode in episodes:
-            # 提取关键词
-            words = episode.content.lower().split()
-            for word in words:
-                if len(word) > 3:  # 忽略短词
-                    keyword_patterns[word] = keyword_patterns.get(word, 0) + 1
-            
-            # 提取上下文模式
-            for key, value in episode.context.items():
-                pattern_key = f"{key}:{value}"
-                context_patterns[pattern_key] = context_patterns.get(pattern_key, 0) + 1
-        
-        # 筛选频繁模式
-        patterns = []
-        
-        for keyword, frequency in keyword_patterns.items():
-            if frequency >= min_frequency:
-                patterns.append({
-                    "type": "keyword",
-                    "pattern": keyword,
-                    "frequency": frequency,
-                    "confidence": frequency / len(episodes)
-                })
-        
-        for context_pattern, frequency in context_patterns.items():
-            if frequency >= min_frequency:
-                patterns.append({
-                    "type": "context",
-                    "pattern": context_pattern,
-                    "frequency": frequency,
-                    "confidence": frequency / len(episodes)
-                })
-        
-        # 按频率排序
-        patterns.sort(key=lambda x: x["frequency"], reverse=True)
-        
-        # 缓存结果
-        self.patterns_cache[cache_key] = patterns
-        self.last_pattern_analysis = datetime.now()
-        
-        return patterns
+    def get_session_episodes(
+        self,
+        session_id: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Episode]:
+        """获取指定会话的情景（按时间正序）
+
+        Args:
+            session_id: 会话ID
+            after: 游标，只返回该位置之后的情景（用于续读）
+            limit: 最多返回条数（None 表示全部）
+        """
+        if limit is None:
+            return list(self._iter_episodes(session_id=session_id, order="oldest", after=after))
+        docs = self.doc_store.list_memories(
+            memory_type="episodic",
+            session_id=session_id,
+            after=decode_cursor(after) if after else None,
+            order="oldest",
+            limit=limit
+        )
+        return [Episode.from_doc(doc) for doc in docs]
     
-    def get_timeline(self, user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """获取时间线视图"""
-        episodes = [e for e in self.episodes if user_id is None or e.user_id == user_id]
-        episodes.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        timeline = []
-        for episode in episodes[:limit]:
-            timeline.append({
-                "episode_id": episode.episode_id,
-                "timestamp": episode.timestamp.isoformat(),
-                "content": episode.content[:100] + "..." if len(episode.content) > 100 else episode.content,
-                "session_id": episode.session_id,
-                "importance": episode.importance,
-                "outcome": episode.outcome
+    def find_patterns(
+        self,
+        user_id: str = None,
+        min_frequency: int = 2,
+        time_range: Optional[Tuple[datetime, datetime]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """发现用户行为模式（读取增量维护的聚合，时间窗口按天粒度）"""
+        start_day, end_day = self._day_range(time_range)
+        totals = self.doc_store.query_patterns(["episode"], user_id=user_id, start_day=start_day, end_day=end_day)
+        episode_count = totals[0]["frequency"] if totals else 0
+        if not episode_count:
+            return []
+
+        rows = self.doc_store.query_patterns(
+            ["keyword", "context"],
+            user_id=user_id,
+            start_day=start_day,
+            end_day=end_day,
+            min_count=min_frequency,
+            limit=limit
+        )
+        return [{
+            "type": row["kind"],
+            "pattern": row["pattern"],
+            "frequency": row["frequency"],
+            "confidence": row["frequency"] / episode_count
+        } for row in rows]
+
+    def get_activity_histogram(
+        self,
+        user_id: str = None,
+        time_range: Optional[Tuple[datetime, datetime]] = None
+    ) -> List[int]:
+        """按小时（0-23）统计的情景数量"""
+        start_day, end_day = self._day_range(time_range)
+        histogram = [0] * 24
+        for row in self.doc_store.query_patterns(["hour"], user_id=user_id, start_day=start_day, end_day=end_day):
+            histogram[int(row["pattern"])] = row["frequency"]
+        return histogram
+
+    def get_session_stats(self, user_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """会话统计（情景数、平均重要性、起止时间），按最近活动降序
+
+        起止时间只随写入扩展，删除情景后不回缩（需要精确值时调用 rebuild_pattern_stats）。
+        """
+        stats = []
+        for row in self.doc_store.get_session_stats(user_id=user_id, limit=limit):
+            stats.append({
+                "user_id": row["user_id"],
+                "session_id": row["session_id"],
+                "episode_count": row["episode_count"],
+                "avg_importance": row["importance_sum"] / row["episode_count"],
+                "first_time": datetime.fromtimestamp(row["first_ts"]).isoformat() if row["first_ts"] else None,
+                "last_time": datetime.fromtimestamp(row["last_ts"]).isoformat() if row["last_ts"] else None
             })
-        
-        return timeline
+        return stats
+
+    def rebuild_pattern_stats(self) -> int:
+        """从SQLite全量重建模式聚合（旧库迁移或修复用），返回处理的情景数"""
+        self.doc_store.clear_pattern_stats()
+        batch: List[Episode] = []
+        total = 0
+        for episode in self._iter_episodes(order="oldest"):
+            batch.append(episode)
+            if len(batch) >= self.page_size:
+                self._record_patterns(added=batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._record_patterns(added=batch)
+            total += len(batch)
+        logger.info(f"情景模式聚合已重建: {total} 条")
+        return total
+
+    @staticmethod
+    def _day_range(time_range: Optional[Tuple[datetime, datetime]]) -> Tuple[Optional[int], Optional[int]]:
+        if not time_range:
+            return None, None
+        return int(time_range[0].timestamp()) // 86400, int(time_range[1].timestamp()) // 86400
+
+    @staticmethod
+    def _pattern_counts(episode: Episode) -> Counter:
+        counts: Counter = Counter()
+        counts[("episode", "")] += 1
+        counts[("hour", str(episode.timestamp.hour))] += 1
+        # 关键词（忽略短词）
+        for word in episode.content.lower().split():
+            if len(word) > 3:
+                counts[("keyword", word)] += 1
+        # 上下文模式
+        for key, value in episode.context.items():
+            counts[("context", f"{key}:{value}")] += 1
+        return counts
+
+    def _record_patterns(self, added: List[Episode] = (), removed: List[Episode] = ()):
+        """把情景增删折算为模式聚合与会话统计的增量（聚合为派生数据，失败只记录警告）"""
+        deltas: Counter = Counter()
+        session_rows = []
+        for sign, episodes in ((1, added), (-1, removed)):
+            for episode in episodes:
+                ts = int(episode.timestamp.timestamp())
+                day = ts // 86400
+                for (kind, pattern), count in self._pattern_counts(episode).items():
+                    deltas[(episode.user_id, day, kind, pattern)] += sign * count
+                session_rows.append((
+                    episode.user_id, episode.session_id, sign, sign * episode.importance,
+                    ts if sign > 0 else None, ts if sign > 0 else None
+                ))
+        pattern_rows = [(*key, delta) for key, delta in deltas.items() if delta]
+        try:
+            self.doc_store.apply_pattern_deltas(pattern_rows, session_rows)
+        except Exception as e:
+            logger.warning(f"⚠️ 更新情景模式聚合失败: {e}")
+
+    def get_timeline(
+        self,
+        user_id: str = None,
+        limit: int = 50,
+        before: Union[str, datetime, None] = None,
+        after: Union[str, datetime, None] = None
+    ) -> List[Dict[str, Any]]:
+        """获取时间线视图（新到旧）"""
+        return self.get_timeline_page(user_id=user_id, before=before, after=after, page_size=limit)["items"]
+
+    def get_timeline_page(
+        self,
+        user_id: str = None,
+        session_id: str = None,
+        before: Union[str, datetime, None] = None,
+        after: Union[str, datetime, None] = None,
+        page_size: int = 50
+    ) -> Dict[str, Any]:
+        """时间线游标分页（新到旧），由 (memory_type, user_id/session_id, timestamp, id) 复合索引支撑
+
+        Args:
+            user_id: 用户过滤
+            session_id: 会话过滤
+            before: 游标或时间点，返回更早的一页（向后翻页传上一页的 next_cursor）
+            after: 游标或时间点，返回更新的一页（向前翻页传上一页的 prev_cursor）
+            page_size: 每页条数
+
+        Returns:
+            {"items": [...], "next_cursor": 更早一页的游标或None, "prev_cursor": 更新一页的游标或None}
+        """
+        query: Dict[str, Any] = {"user_id": user_id, "memory_type": "episodic", "session_id": session_id}
+        if isinstance(before, datetime):
+            query["end_time"] = math.ceil(before.timestamp()) - 1
+        elif before:
+            query["before"] = decode_cursor(before)
+        if isinstance(after, datetime):
+            query["start_time"] = int(after.timestamp()) + 1
+        elif after:
+            query["after"] = decode_cursor(after)
+
+        # 只给了 after 时取紧邻游标的一页（正序取再翻转），多取一条判断是否还有下一页
+        forward = after is not None and before is None
+        docs = self.doc_store.list_memories(order="oldest" if forward else "recent", limit=page_size + 1, **query)
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+        if forward:
+            docs.reverse()
+
+        items = [self._timeline_entry(Episode.from_doc(doc)) for doc in docs]
+        cursors = [encode_cursor(doc["timestamp"], doc["memory_id"]) for doc in docs]
+        if forward:
+            # 向前翻页：游标之前必有更早的记录；多取到的一条说明还有更新的记录
+            older, newer = True, has_more
+        else:
+            older, newer = has_more, before is not None
+        return {
+            "items": items,
+            "next_cursor": cursors[-1] if cursors and older else None,
+            "prev_cursor": cursors[0] if cursors and newer else None
+        }
+
+    @staticmethod
+    def _timeline_entry(episode: Episode) -> Dict[str, Any]:
+        return {
+            "episode_id": episode.episode_id,
+            "timestamp": episode.timestamp.isoformat(),
+            "content": episode.content[:100] + "..." if len(episode.content) > 100 else episode.content,
+            "session_id": episode.session_id,
+            "importance": episode.importance,
+            "outcome": episode.outcome
+        }
     
+    def _iter_episodes(
+        self,
+        user_id: str = None,
+        session_id: str = None,
+        content_like: str = None,
+        order: str = "recent",
+        after: Optional[str] = None
+    ) -> Iterator[Episode]:
+        """按页从SQLite遍历情景（键集游标分页；不写入缓存，避免全量遍历冲掉热数据）
+
+        order 为 recent（新到旧）或 oldest（旧到新）；after 仅用于 oldest 续读。
+        """
+        cursor = decode_cursor(after) if after else None
+        while True:
+            docs = self.doc_store.list_memories(
+                user_id=user_id,
+                memory_type="episodic",
+                session_id=session_id,
+                content_like=content_like,
+                order=order,
+                limit=self.page_size,
+                **({"before": cursor} if order == "recent" else {"after": cursor})
+            )
+            for doc in docs:
+                yield Episode.from_doc(doc)
+            if len(docs) < self.page_size:
+                return
+            cursor = (docs[-1]["timestamp"], docs[-1]["memory_id"])
+
+    def compact_sessions(self, user_id: str = None, **kwargs) -> Dict[str, Any]:
+        """把已结束会话中的低重要性情景压缩为摘要情景（参数见 memory.compaction.compact_sessions）"""
+        from ..compaction import compact_sessions
+        return compact_sessions(self, user_id=user_id, **kwargs)
+
+    def prefetch_sessions(self, user_id: str = None, limit: int = None) -> int:
+        """预加载最近若干会话的情景到缓存，返回加载条数"""
+        limit = self.config.episodic_prefetch_sessions if limit is None else limit
+        if limit <= 0:
+            return 0
+        loaded = 0
+        for session in self.doc_store.list_sessions(user_id=user_id, memory_type="episodic", limit=limit):
+            for episode in self._iter_episodes(user_id=user_id, session_id=session["session_id"], order="oldest"):
+                self.cache.put(episode)
+                loaded += 1
+        logger.info(f"情景记忆预加载 {loaded} 条")
+        return loaded
+
     def _filter_episodes(
         self,
         user_id: str = None,
         session_id: str = None,
-        time_range: Tuple[datetime, datetime] = None
+        time_range: Tuple[datetime, datetime] = None,
+        content_like: str = None
     ) -> List[Episode]:
         """过滤情景"""
-        filtered = self.episodes
-        
-        if user_id:
-            filtered = [e for e in filtered if e.user_id == user_id]
-        
-        if session_id:
-            filtered = [e for e in filtered if e.session_id == session_id]
+        filtered = self._iter_episodes(user_id=user_id, session_id=session_id, content_like=content_like)
         
         if time_range:
             start_time, end_time = time_range
-            filtered = [e for e in filtered if start_time <= e.timestamp <= end_time]
+            return [e for e in filtered if start_time <= e.timestamp <= end_time]
         
-        return filtered
+        return list(filtered)
     
-    def _calculate_time_span(self) -> float:
+    def _calculate_time_span(self, summary: Dict[str, Any] = None) -> float:
         """计算记忆时间跨度（天）"""
-        if not self.episodes:
+        summary = summary or self.doc_store.summarize_memories(memory_type="episodic")
+        if not summary["count"]:
             return 0.0
         
-        timestamps = [e.timestamp for e in self.episodes]
-        min_time = min(timestamps)
-        max_time = max(timestamps)
-        
-        return (max_time - min_time).days
+        return (summary["max_timestamp"] - summary["min_timestamp"]) // 86400
     
     def _persist_episode(self, episode: Episode):
         """持久化情景到存储后端"""
@@ -9,19 +9,50 @@
 
 from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta
+import hashlib
 import json
 import logging
 import math
+import re
+import threading
+import unicodedata
 import numpy as np
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
-from ..embedding import get_text_embedder, get_dimension
+from ..embedding import get_text_embedder, get_dimension, fill_embeddings
+from ..forgetting import select_victims, to_columns
+from ..enrichment import GraphEnrichmentQueue
 from core.database_config import get_database_config
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# spaCy 管道在进程内共享（加载耗时且占用大量内存）
+_spacy_models: Dict[str, Any] = {}
+_spacy_lock = threading.Lock()
+
+
+def _load_spacy_model(spacy_module, model_name: str):
+    """加载并缓存spaCy模型；加载失败抛出 OSError"""
+    with _spacy_lock:
+        if model_name not in _spacy_models:
+            _spacy_models[model_name] = spacy_module.load(model_name)
+        return _spacy_models[model_name]
+
+
+def stable_node_id(kind: str, text: str, label: str = "", language: str = "") -> str:
+    """内容寻址的图节点ID
+
+    对规范化文本（NFKC、大小写折叠、空白合并）、标签与语言做 blake2b 摘要，
+    跨进程、跨重启保持不变，使同一实体/词元始终 MERGE 到同一节点。
+    （Python 内置 hash() 对字符串按进程加盐，不能用于持久化ID。）
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+    key = "\x1f".join((kind, normalized, label or "", language or ""))
+    return f"{kind}_{hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()}"
+
+
 class Entity:
     """实体类"""
     
@@ -118,6 +149,20 @@ class SemanticMemory(BaseMemory):
         # 记忆存储
         self.semantic_memories: List[MemoryItem] = []
         self.memory_embeddings: Dict[str, np.ndarray] = {}
+        self.resident_bytes = 0  # 内容与向量的字节数，在写入路径上增量维护，供管理器池估算常驻量
+        
+        # 图谱异步增强（可选）：写入只做嵌入与向量入库，实体/关系抽取与图写入由后台分批完成
+        self._graph_lock = threading.RLock()  # 串行化增强结果落库与删除，避免为已删除记忆写图
+        self.enrichment: Optional[GraphEnrichmentQueue] = None
+        if self.config.semantic_async_enrichment:
+            self.enrichment = GraphEnrichmentQueue(
+                enrich_batch=self._enrich_batch,
+                batch_size=self.config.semantic_enrichment_batch_size,
+                flush_interval=self.config.semantic_enrichment_flush_interval,
+                max_attempts=self.config.semantic_enrichment_max_attempts,
+                on_give_up=lambda item, error: item.metadata.__setitem__("graph_status", "failed")
+            )
+            self.enrichment.start()
         
         logger.info("增强语义记忆初始化完成（使用Qdrant+Neo4j专业数据库）")
     
@@ -149,10 +194,10 @@ class SemanticMemory(BaseMemory):
             self.vector_store = QdrantConnectionManager.get_instance(**qdrant_config)
             logger.info("✅ Qdrant向量数据库初始化完成")
             
-            # 初始化Neo4j图数据库
-            from ..storage.neo4j_store import Neo4jGraphStore
+            # 初始化Neo4j图数据库（使用连接管理器，多用户共享驱动）
+            from ..storage.neo4j_store import Neo4jConnectionManager
             neo4j_config = db_config.get_neo4j_config()
-            self.graph_store = Neo4jGraphStore(**neo4j_config)
+            self.graph_store = Neo4jConnectionManager.get_instance(**neo4j_config)
             logger.info("✅ Neo4j图数据库初始化完成")
             
             # 验证连接
@@ -187,7 +232,7 @@ class SemanticMemory(BaseMemory):
             loaded_models = []
             for model_name, lang_name in models_to_try:
                 try:
-                    nlp = spacy.load(model_name)
+                    nlp = _load_spacy_model(spacy, model_name)
                     self.nlp_models[model_name] = nlp
                     loaded_models.append(lang_name)
                     logger.info(f"✅ 加载{lang_name}spaCy模型: {model_name}")
@@ -214,7 +259,12 @@ class SemanticMemory(BaseMemory):
             self.nlp_models = {}
     
     def add(self, memory_item: MemoryItem) -> str:
-        """添加语义记忆"""
+        """添加语义记忆（启用异步增强时走批量快速路径，图数据由后台补齐）"""
+        if self.enrichment is not None:
+            error = self.add_batch([memory_item])[0]
+            if error is not None:
+                raise RuntimeError(error)
+            return memory_item.id
         try:
             # 1. 生成文本嵌入
             embedding = self.embedding_model.encode(memory_item.content)
@@ -261,6 +311,7 @@ class SemanticMemory(BaseMemory):
             
             # 6. 存储记忆
             self.semantic_memories.append(memory_item)
+            self.resident_bytes += self._resident_bytes(memory_item)
             
             logger.info(f"✅ 添加语义记忆: {len(entities)}个实体, {len(relations)}个关系")
             return memory_item.id
@@ -268,7 +319,262 @@ class SemanticMemory(BaseMemory):
         except Exception as e:
             logger.error(f"❌ 添加语义记忆失败: {e}")
             raise
+
+    def add_batch(
+        self,
+        memory_items: List[MemoryItem],
+        embeddings: Optional[List[Any]] = None,
+        extract_graph: bool = True
+    ) -> List[Optional[str]]:
+        """批量添加语义记忆
+
+        嵌入按提供商批大小分批计算；实体与关系汇总后用 UNWIND 批量写入Neo4j；
+        向量分批 upsert 到Qdrant。单条实体抽取失败只影响该条记忆。
+        启用异步增强时只写向量，实体与关系由后台队列补齐（graph_status 为 pending）。
+
+        Args:
+            memory_items: 记忆项列表
+            embeddings: 预先计算的向量（如快照导入、记忆整合），为 None 的项才调用嵌入模型
+            extract_graph: 是否抽取实体关系；为 False 时沿用元数据中的 entities（图数据由调用方写入）
+        """
+        if not memory_items:
+            return []
+        errors: List[Optional[str]] = [None] * len(memory_items)
+
+        # 1. 批量生成文本嵌入（携带的向量直接复用，只补算缺失项）
+        try:
+            embeddings = fill_embeddings(
+                [m.content for m in memory_items],
+                embeddings,
+                model=self.embedding_model,
+                batch_size=self.config.embedding_batch_size
+            )
+        except Exception as e:
+            logger.error(f"❌ 批量生成嵌入失败: {e}")
+            return [str(e)] * len(memory_items)
+
+        # 2. 提取实体和关系，汇总图写入
+        defer_graph = extract_graph and self.enrichment is not None
+        extracted: Dict[int, Tuple[List[Entity], List[Relation]]] = {}
+        entity_rows: List[Dict[str, Any]] = []
+        relation_rows: List[Dict[str, Any]] = []
+        linguistic: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]] = ([], [])  # 词法分析节点与关系
+        for index, memory_item in enumerate(memory_items):
+            if defer_graph:
+                extracted[index] = ([], [])
+                continue
+            if not extract_graph:
+                entities = [
+                    Entity(entity_id=entity_id, name="", entity_type="")
+                    for entity_id in memory_item.metadata.get("entities", [])
+                ]
+                extracted[index] = (entities, [])
+                continue
+            try:
+                entities = self._extract_entities(memory_item.content, linguistic_sink=linguistic)
+                relations = self._extract_relations(memory_item.content, entities)
+            except Exception as e:
+                errors[index] = str(e)
+                continue
+            extracted[index] = (entities, relations)
+            rows = self._graph_rows(memory_item, entities, relations)
+            entity_rows.extend(rows[0])
+            relation_rows.extend(rows[1])
+
+        # 3. 存储到Neo4j图数据库（实体先于关系写入，整批一次）
+        if self.graph_store and (entity_rows or linguistic[0]):
+            self.graph_store.add_entities_batch(linguistic[0] + entity_rows)
+            self.graph_store.add_relationships_batch(linguistic[1] + relation_rows)
+            for entities, relations in extracted.values():
+                for entity in entities:
+                    self._add_or_update_entity(entity)
+                self.relations.extend(relations)
+
+        # 4. 分批存储到Qdrant向量数据库
+        vectors, metadata, ids = [], [], []
+        for index, (entities, relations) in extracted.items():
+            memory_item = memory_items[index]
+            vectors.append(embeddings[index].tolist())
+            metadata.append({
+                "memory_id": memory_item.id,
+                "user_id": memory_item.user_id,
+                "content": memory_item.content,
+                "memory_type": memory_item.memory_type,
+                "timestamp": int(memory_item.timestamp.timestamp()),
+                "importance": memory_item.importance,
+                "entities": [e.entity_id for e in entities],
+                "entity_count": len(entities),
+                "relation_count": len(relations) if extract_graph
+                else memory_item.metadata.get("relation_count", len(memory_item.metadata.get("relations", []))),
+                "graph_status": "pending" if defer_graph else "enriched"
+            })
+            ids.append(memory_item.id)
+        if vectors:
+            success = self.vector_store.add_vectors(
+                vectors=vectors,
+                metadata=metadata,
+                ids=ids,
+                batch_size=self.config.vector_upsert_batch_size
+            )
+            if not success:
+                logger.warning("⚠️ 批量向量存储失败，但记忆已添加到图数据库")
+
+        # 5. 更新元数据并存储记忆
+        for index, (entities, relations) in extracted.items():
+            memory_item = memory_items[index]
+            memory_item.metadata["entities"] = [e.entity_id for e in entities]
+            if extract_graph:
+                memory_item.metadata["relations"] = [
+                    f"{r.from_entity}-{r.relation_type}-{r.to_entity}" for r in relations
+                ]
+            memory_item.metadata["graph_status"] = "pending" if defer_graph else "enriched"
+            self.memory_embeddings[memory_item.id] = embeddings[index]
+            self.semantic_memories.append(memory_item)
+            self.resident_bytes += self._resident_bytes(memory_item)
+
+        if defer_graph:
+            self.enrichment.submit([memory_items[index] for index in extracted])
+
+        logger.info(f"✅ 批量添加语义记忆: {len(extracted)}/{len(memory_items)} 条, "
+                    f"{len(entity_rows)}个实体, {len(relation_rows)}个关系")
+        return errors
     
+    def _graph_rows(
+        self,
+        memory_item: MemoryItem,
+        entities: List[Entity],
+        relations: List[Relation]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """把一条记忆的实体与关系转换为批量写图的行"""
+        entity_rows = [{
+            "id": entity.entity_id,
+            "name": entity.name,
+            "type": entity.entity_type,
+            "properties": {
+                "name": entity.name,
+                "description": entity.description,
+                "frequency": entity.frequency,
+                "memory_id": memory_item.id,
+                "user_id": memory_item.user_id,
+                "importance": memory_item.importance,
+                **entity.properties
+            }
+        } for entity in entities]
+        relation_rows = [{
+            "from_id": relation.from_entity,
+            "to_id": relation.to_entity,
+            "type": relation.relation_type,
+            "properties": {
+                "strength": relation.strength,
+                "memory_id": memory_item.id,
+                "user_id": memory_item.user_id,
+                "importance": memory_item.importance,
+                "evidence": relation.evidence
+            }
+        } for relation in relations]
+        return entity_rows, relation_rows
+
+    def _enrich_batch(self, memory_items: List[MemoryItem]) -> List[Optional[str]]:
+        """后台图谱增强：nlp.pipe 批量分析，UNWIND 批量写图，回填实体元数据与向量payload
+
+        Returns:
+            与输入对齐的错误列表（已被删除的记忆视为完成）
+        """
+        errors: List[Optional[str]] = [None] * len(memory_items)
+        live_ids = {m.id for m in self.semantic_memories}
+        targets = [(i, m) for i, m in enumerate(memory_items) if m.id in live_ids]
+        if not targets:
+            return errors
+
+        # 1. 批量语言分析（不持锁，耗时主要在这里）
+        analyzed: Dict[int, Tuple[List[Entity], List[Relation], Any]] = {}
+        docs = self._pipe_docs([m.content for _, m in targets])
+        for (index, memory_item), doc in zip(targets, docs):
+            try:
+                entities = self._entities_from_doc(doc) if doc is not None else []
+                relations = self._extract_relations(memory_item.content, entities)
+            except Exception as e:
+                errors[index] = str(e)
+                continue
+            analyzed[index] = (entities, relations, doc)
+
+        # 2. 落库（持锁：期间删除的记忆不再写图）
+        with self._graph_lock:
+            live_ids = {m.id for m in self.semantic_memories}
+            analyzed = {i: v for i, v in analyzed.items() if memory_items[i].id in live_ids}
+            if not analyzed:
+                return errors
+            entity_rows: List[Dict[str, Any]] = []
+            relation_rows: List[Dict[str, Any]] = []
+            linguistic: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]] = ([], [])
+            for index, (entities, relations, doc) in analyzed.items():
+                memory_item = memory_items[index]
+                if doc is not None:
+                    self._store_linguistic_analysis(doc, memory_item.content, sink=linguistic)
+                rows = self._graph_rows(memory_item, entities, relations)
+                entity_rows.extend(rows[0])
+                relation_rows.extend(rows[1])
+
+            if self.graph_store and (entity_rows or linguistic[0]):
+                written = self.graph_store.add_entities_batch(linguistic[0] + entity_rows)
+                if not written:
+                    # 批量写入接口内部记录异常并返回0：整批交给队列重试
+                    return [error or "图数据库写入失败" for error in errors]
+                self.graph_store.add_relationships_batch(linguistic[1] + relation_rows)
+
+            payloads = {}
+            for index, (entities, relations, _) in analyzed.items():
+                memory_item = memory_items[index]
+                for entity in entities:
+                    self._add_or_update_entity(entity)
+                self.relations.extend(relations)
+                memory_item.metadata["entities"] = [e.entity_id for e in entities]
+                memory_item.metadata["relations"] = [
+                    f"{r.from_entity}-{r.relation_type}-{r.to_entity}" for r in relations
+                ]
+                memory_item.metadata["graph_status"] = "enriched"
+                payloads[memory_item.id] = {
+                    "entities": memory_item.metadata["entities"],
+                    "entity_count": len(entities),
+                    "relation_count": len(relations),
+                    "graph_status": "enriched"
+                }
+
+        # 3. 回填向量payload（派生数据，失败只记录）
+        try:
+            self.vector_store.set_payloads(payloads)
+        except Exception as e:
+            logger.warning(f"⚠️ 回填语义向量payload失败: {e}")
+
+        logger.debug(f"🕸️ 图谱增强完成: {len(analyzed)} 条")
+        return errors
+
+    def _pipe_docs(self, texts: List[str]) -> List[Any]:
+        """按语言选择spaCy模型，用 nlp.pipe 批量分析；无可用模型的文本返回 None"""
+        docs: List[Any] = [None] * len(texts)
+        groups: Dict[int, Tuple[Any, List[int]]] = {}
+        for index, text in enumerate(texts):
+            nlp = self._select_nlp(text)
+            if nlp is not None:
+                groups.setdefault(id(nlp), (nlp, []))[1].append(index)
+        for nlp, indexes in groups.values():
+            for index, doc in zip(indexes, nlp.pipe([texts[i] for i in indexes],
+                                                    batch_size=self.config.semantic_enrichment_batch_size)):
+                docs[index] = doc
+        return docs
+
+    def get_enrichment_status(self, memory_id: str) -> Optional[str]:
+        """记忆的图谱增强状态：pending / enriched / failed（记忆不存在时为 None）"""
+        if self.enrichment is not None and self.enrichment.is_pending(memory_id):
+            return "pending"
+        memory = self._find_memory_by_id(memory_id)
+        if memory is None:
+            return None
+        return memory.metadata.get("graph_status", "enriched")
+
+    def _graph_pending(self, memory_id: str) -> bool:
+        return self.enrichment is not None and self.enrichment.is_pending(memory_id)
+
     def retrieve(self, query: str, limit: int = 5, **kwargs) -> List[MemoryItem]:
         """检索语义记忆"""
         try:
@@ -531,8 +837,12 @@ class SemanticMemory(BaseMemory):
             importance = result.get("importance", 0.5)
             
             # 新评分算法：向量检索纯基于相似度，重要性作为加权因子
-            # 基础相似度得分（不受重要性影响）
-            base_relevance = vector_score * 0.7 + graph_score * 0.3
+            # 基础相似度得分（不受重要性影响）；图数据尚未增强的记忆没有图分数，
+            # 图权重并入向量分数，避免在增强完成前被系统性压低
+            if self._graph_pending(memory_id):
+                base_relevance = vector_score
+            else:
+                base_relevance = vector_score * 0.7 + graph_score * 0.3
             
             # 重要性作为乘法加权因子，范围 [0.8, 1.2]
             # importance in [0,1] -> weight in [0.8,1.2]
@@ -586,24 +896,17 @@ class SemanticMemory(BaseMemory):
         chinese_ratio = chinese_chars / total_chars
         return "zh" if chinese_ratio > 0.3 else "en"
     
-    def _extract_entities(self, text: str) -> List[Entity]:
-        """智能多语言实体提取"""
+    def _node_id(self, kind: str, text: str, label: str = "") -> str:
+        """图节点ID：语言按节点自身文本检测，迁移时可仅凭节点属性重算"""
+        return stable_node_id(kind, text, label, self._detect_language(text))
+
+    def _extract_entities(self, text: str, linguistic_sink: Optional[Tuple[List, List]] = None) -> List[Entity]:
+        """智能多语言实体提取（linguistic_sink 用于批量写入时收集词法分析的图数据）"""
         entities = []
         
-        # 检测文本语言
-        lang = self._detect_language(text)
-        
-        # 选择合适的spaCy模型
-        selected_nlp = None
-        if lang == "zh" and "zh_core_web_sm" in self.nlp_models:
-            selected_nlp = self.nlp_models["zh_core_web_sm"]
-        elif lang == "en" and "en_core_web_sm" in self.nlp_models:
-            selected_nlp = self.nlp_models["en_core_web_sm"]
-        else:
-            # 使用默认模型
-            selected_nlp = self.nlp
+        selected_nlp = self._select_nlp(text)
         
-        logger.debug(f"🌐 检测语言: {lang}, 使用模型: {selected_nlp.meta['name'] if selected_nlp else 'None'}")
+        logger.debug(f"🌐 使用模型: {selected_nlp.meta['name'] if selected_nlp else 'None'}")
         
         # 使用spaCy进行实体识别和词法分析
         if selected_nlp:
@@ -612,7 +915,7 @@ class SemanticMemory(BaseMemory):
                 logger.debug(f"📝 spaCy处理文本: '{text}' -> {len(doc.ents)} 个实体")
                 
                 # 存储词法分析结果，供Neo4j使用
-                self._store_linguistic_analysis(doc, text)
+                self._store_linguistic_analysis(doc, text, sink=linguistic_sink)
                 
                 if not doc.ents:
                     # 如果没有实体，记录详细的词元信息
@@ -620,23 +923,7 @@ class SemanticMemory(BaseMemory):
                     for token in doc[:5]:  # 只显示前5个词元
                         logger.debug(f"   '{token.text}' -> POS: {token.pos_}, TAG: {token.tag_}, ENT_IOB: {token.ent_iob_}")
                 
-                for ent in doc.ents:
-                    entity = Entity(
-                        entity_id=f"entity_{hash(ent.text)}",
-                        name=ent.text,
-                        entity_type=ent.label_,
-                        description=f"从文本中识别的{ent.label_}实体"
-                    )
-                    entities.append(entity)
-                    # 安全获取置信度信息
-                    confidence = "N/A"
-                    try:
-                        if hasattr(ent._, 'confidence'):
-                            confidence = getattr(ent._, 'confidence', 'N/A')
-                    except:
-                        confidence = "N/A"
-                    
-                    logger.debug(f"🏷️ spaCy识别实体: '{ent.text}' -> {ent.label_} (置信度: {confidence})")
+                entities.extend(self._entities_from_doc(doc))
                 
             except Exception as e:
                 logger.warning(f"⚠️ spaCy实体识别失败: {e}")
@@ -647,83 +934,118 @@ class SemanticMemory(BaseMemory):
         
         return entities
     
-    def _store_linguistic_analysis(self, doc, text: str):
-        """存储spaCy词法分析结果到Neo4j"""
+    def _select_nlp(self, text: str):
+        """按检测到的语言选择spaCy模型"""
+        lang = self._detect_language(text)
+        if lang == "zh" and "zh_core_web_sm" in self.nlp_models:
+            return self.nlp_models["zh_core_web_sm"]
+        if lang == "en" and "en_core_web_sm" in self.nlp_models:
+            return self.nlp_models["en_core_web_sm"]
+        # 使用默认模型
+        return self.nlp
+
+    def _entities_from_doc(self, doc) -> List[Entity]:
+        """从spaCy文档中取出命名实体"""
+        entities = []
+        for ent in doc.ents:
+            entities.append(Entity(
+                entity_id=self._node_id("entity", ent.text, ent.label_),
+                name=ent.text,
+                entity_type=ent.label_,
+                description=f"从文本中识别的{ent.label_}实体"
+            ))
+            logger.debug(f"🏷️ spaCy识别实体: '{ent.text}' -> {ent.label_}")
+        return entities
+
+    def _store_linguistic_analysis(self, doc, text: str, sink: Optional[Tuple[List, List]] = None):
+        """存储spaCy词法分析结果到Neo4j
+
+        Args:
+            doc: spaCy 文档
+            text: 原文
+            sink: (实体行, 关系行) 收集器；提供时只追加行，由调用方与其他图数据一起批量写入
+        """
         if not self.graph_store:
             return
-            
+
         try:
-            # 为每个词元创建节点
-            for token in doc:
-                # 跳过标点符号和空格
-                if token.is_punct or token.is_space:
-                    continue
-                    
-                token_id = f"token_{hash(token.text + token.pos_)}"
-                
-                # 添加词元节点到Neo4j
-                self.graph_store.add_entity(
-                    entity_id=token_id,
-                    name=token.text,
-                    entity_type="TOKEN",
-                    properties={
-                        "pos": token.pos_,        # 词性（NOUN, VERB等）
-                        "tag": token.tag_,        # 细粒度标签
-                        "lemma": token.lemma_,    # 词元原形
-                        "is_alpha": token.is_alpha,
-                        "is_stop": token.is_stop,
-                        "source_text": text[:50],  # 来源文本片段
-                        "language": self._detect_language(text)
-                    }
-                )
-                
-                # 如果是名词，可能是潜在的概念
-                if token.pos_ in ["NOUN", "PROPN"]:
-                    concept_id = f"concept_{hash(token.text)}"
-                    self.graph_store.add_entity(
-                        entity_id=concept_id,
-                        name=token.text,
-                        entity_type="CONCEPT",
-                        properties={
-                            "category": token.pos_,
-                            "frequency": 1,  # 可以后续累计
-                            "source_text": text[:50]
-                        }
-                    )
-                    
-                    # 建立词元到概念的关系
-                    self.graph_store.add_relationship(
-                        from_entity_id=token_id,
-                        to_entity_id=concept_id,
-                        relationship_type="REPRESENTS",
-                        properties={"confidence": 1.0}
-                    )
-            
-            # 建立词元之间的依存关系
-            for token in doc:
-                if token.is_punct or token.is_space or token.head == token:
-                    continue
-                    
-                from_id = f"token_{hash(token.text + token.pos_)}"
-                to_id = f"token_{hash(token.head.text + token.head.pos_)}"
-                
-                # Neo4j不允许关系类型包含冒号，需要清理
-                relation_type = token.dep_.upper().replace(":", "_")
-                
-                self.graph_store.add_relationship(
-                    from_entity_id=from_id,
-                    to_entity_id=to_id,
-                    relationship_type=relation_type,  # 清理后的依存关系类型
-                    properties={
-                        "dependency": token.dep_,  # 保留原始依存关系
-                        "source_text": text[:50]
-                    }
-                )
-            
-            logger.debug(f"🔗 已将词法分析结果存储到Neo4j: {len([t for t in doc if not t.is_punct and not t.is_space])} 个词元")
-            
+            entity_rows, relation_rows = self._linguistic_rows(doc, text)
+            if sink is not None:
+                sink[0].extend(entity_rows)
+                sink[1].extend(relation_rows)
+            else:
+                self.graph_store.add_entities_batch(entity_rows)
+                self.graph_store.add_relationships_batch(relation_rows)
+            logger.debug(f"🔗 已将词法分析结果存储到Neo4j: {len(entity_rows)} 个节点, {len(relation_rows)} 个关系")
+
         except Exception as e:
             logger.warning(f"⚠️ 存储词法分析失败: {e}")
+
+    def _linguistic_rows(self, doc, text: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """把词法分析结果转换为批量写入的实体行与关系行"""
+        entity_rows: List[Dict[str, Any]] = []
+        relation_rows: List[Dict[str, Any]] = []
+        source_text = text[:50]  # 来源文本片段
+        language = self._detect_language(text)
+
+        # 为每个词元创建节点
+        for token in doc:
+            # 跳过标点符号和空格
+            if token.is_punct or token.is_space:
+                continue
+
+            token_id = self._node_id("token", token.text, token.pos_)
+            entity_rows.append({
+                "id": token_id,
+                "name": token.text,
+                "type": "TOKEN",
+                "properties": {
+                    "pos": token.pos_,        # 词性（NOUN, VERB等）
+                    "tag": token.tag_,        # 细粒度标签
+                    "lemma": token.lemma_,    # 词元原形
+                    "is_alpha": token.is_alpha,
+                    "is_stop": token.is_stop,
+                    "source_text": source_text,
+                    "language": language
+                }
+            })
+
+            # 如果是名词，可能是潜在的概念
+            if token.pos_ in ["NOUN", "PROPN"]:
+                concept_id = self._node_id("concept", token.text)
+                entity_rows.append({
+                    "id": concept_id,
+                    "name": token.text,
+                    "type": "CONCEPT",
+                    "properties": {
+                        "category": token.pos_,
+                        "frequency": 1,  # 可以后续累计
+                        "source_text": source_text
+                    }
+                })
+                # 建立词元到概念的关系
+                relation_rows.append({
+                    "from_id": token_id,
+                    "to_id": concept_id,
+                    "type": "REPRESENTS",
+                    "properties": {"confidence": 1.0}
+                })
+
+        # 建立词元之间的依存关系（关系类型由图存储规范化）
+        for token in doc:
+            if token.is_punct or token.is_space or token.head == token:
+                continue
+            relation_rows.append({
+                "from_id": self._node_id("token", token.text, token.pos_),
+                "to_id": self._node_id("token", token.head.text, token.head.pos_),
+                "type": token.dep_,
+                "properties": {
+                    "dependency": token.dep_,  # 保留原始依存关系
+                    "source_text": source_text
+                }
+            })
+
+        return entity_rows, relation_rows
     
     def _extract_relations(self, text: str, entities: List[Entity]) -> List[Relation]:
         """提取关系"""
@@ -888,125 +1210,178 @@ class SemanticMemory(BaseMemory):
         importance: float = None,
         metadata: Dict[str, Any] = None
     ) -> bool:
-        """更新语义记忆"""
+        """更新语义记忆
+
+        内容变化时：移除本记忆在旧实体与关系上的所有权，按 add 的方式重新抽取并批量写图，
+        再以新向量与payload覆盖Qdrant中的点；只改重要性/元数据时合并更新payload。
+        """
         memory = self._find_memory_by_id(memory_id)
         if not memory:
             return False
         
         try:
             if content is not None:
-                # 重新生成嵌入和提取实体
+                if self.enrichment is not None:
+                    self.enrichment.cancel([memory_id])
+                # 重新生成嵌入
                 embedding = self.embedding_model.encode(content)
+                old_bytes = self._resident_bytes(memory)
+
+                with self._graph_lock:
+                    # 清理旧的实体关系（共享的实体与关系只移除本记忆的所有权）
+                    self._cleanup_entities_and_relations({memory_id: memory.metadata.get("entities") or []})
+
+                    # 提取新的实体和关系
+                    memory.content = content
+                    linguistic: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]] = ([], [])
+                    entities = self._extract_entities(content, linguistic_sink=linguistic)
+                    relations = self._extract_relations(content, entities)
+
+                    # 更新知识图谱
+                    entity_rows, relation_rows = self._graph_rows(memory, entities, relations)
+                    if self.graph_store and (entity_rows or linguistic[0]):
+                        self.graph_store.add_entities_batch(linguistic[0] + entity_rows)
+                        self.graph_store.add_relationships_batch(linguistic[1] + relation_rows)
+                    for entity in entities:
+                        self._add_or_update_entity(entity)
+                    self.relations.extend(relations)
+
+                    # 更新元数据
+                    memory.metadata["entities"] = [e.entity_id for e in entities]
+                    memory.metadata["relations"] = [
+                        f"{r.from_entity}-{r.relation_type}-{r.to_entity}" for r in relations
+                    ]
+                    memory.metadata["graph_status"] = "enriched"
                 self.memory_embeddings[memory_id] = embedding
-                
-                # 清理旧的实体关系
-                old_entities = memory.metadata.get("entities", [])
-                self._cleanup_entities_and_relations(old_entities)
-                
-                # 提取新的实体和关系
-                memory.content = content
-                entities = self._extract_entities(content)
-                relations = self._extract_relations(content, entities)
-                
-                # 更新知识图谱
-                for entity in entities:
-                    self._add_or_update_entity(entity)
-                for relation in relations:
-                    self._add_or_update_relation(relation)
-                
-                # 更新元数据
-                memory.metadata["entities"] = [e.entity_id for e in entities]
-                memory.metadata["relations"] = [
-                    f"{r.from_entity}-{r.relation_type}-{r.to_entity}" for r in relations
-                ]
+                self.resident_bytes += self._resident_bytes(memory) - old_bytes
                 
             if importance is not None:
                 memory.importance = importance
             
             if metadata is not None:
                 memory.metadata.update(metadata)
-                
-                return True
-            
+
+            # 同步Qdrant中的点
+            if content is not None:
+                success = self.vector_store.add_vectors(
+                    vectors=[self.memory_embeddings[memory_id].tolist()],
+                    metadata=[{
+                        "memory_id": memory.id,
+                        "user_id": memory.user_id,
+                        "content": memory.content,
+                        "memory_type": memory.memory_type,
+                        "timestamp": int(memory.timestamp.timestamp()),
+                        "importance": memory.importance,
+                        "entities": memory.metadata["entities"],
+                        "entity_count": len(memory.metadata["entities"]),
+                        "relation_count": len(memory.metadata["relations"]),
+                        "graph_status": "enriched"
+                    }],
+                    ids=[memory.id]
+                )
+                if not success:
+                    logger.warning("⚠️ 更新向量存储失败")
+            elif importance is not None:
+                self.vector_store.set_payloads({memory_id: {"importance": memory.importance}})
+
+            return True
+
         except Exception as e:
             logger.error(f"❌ 更新记忆失败: {e}")
         return False
     
+    def _resident_bytes(self, memory_item: MemoryItem) -> int:
+        embedding = self.memory_embeddings.get(memory_item.id)
+        return len(memory_item.content.encode("utf-8")) + getattr(embedding, "nbytes", 0)
+
+    def get_embeddings(self, memory_ids: List[str]) -> Dict[str, Any]:
+        """返回本地缓存中已有的向量"""
+        return {mid: self.memory_embeddings[mid] for mid in memory_ids if mid in self.memory_embeddings}
+
     def remove(self, memory_id: str) -> bool:
         """删除语义记忆"""
-        memory = self._find_memory_by_id(memory_id)
-        if not memory:
-            return False
-        
-        try:
-            # 删除向量
-            self.vector_store.delete_memories([memory_id])
-            
-            # 清理实体和关系
-            entities = memory.metadata.get("entities", [])
-            self._cleanup_entities_and_relations(entities)
-            
+        return bool(self.remove_batch([memory_id]))
+
+    def remove_batch(self, memory_ids: List[str]) -> List[str]:
+        """批量删除语义记忆：Qdrant 一次过滤删除、Neo4j 一次子图删除，本地列表只重建一次"""
+        targets = set(memory_ids)
+        if self.enrichment is not None:
+            self.enrichment.cancel(list(targets))
+        with self._graph_lock:
+            memory_entities = {
+                memory.id: memory.metadata.get("entities") or []
+                for memory in self.semantic_memories if memory.id in targets
+            }
+            existing = list(memory_entities)
+            if not existing:
+                return []
+
+            try:
+                # 删除向量
+                self.vector_store.delete_memories(existing)
+
+                # 清理实体和关系
+                self._cleanup_entities_and_relations(memory_entities)
+            except Exception as e:
+                logger.error(f"❌ 删除记忆失败: {e}")
+                return []
+
             # 删除记忆
-            self.semantic_memories.remove(memory)
-            if memory_id in self.memory_embeddings:
-                del self.memory_embeddings[memory_id]
-                
-                return True
-            
-        except Exception as e:
-            logger.error(f"❌ 删除记忆失败: {e}")
-        return False
+            removed = set(existing)
+            self.resident_bytes -= sum(
+                self._resident_bytes(m) for m in self.semantic_memories if m.id in removed
+            )
+            self.semantic_memories[:] = [m for m in self.semantic_memories if m.id not in removed]
+            for memory_id in existing:
+                self.memory_embeddings.pop(memory_id, None)
+
+        self._notify_removed_batch(existing)
+        return existing
     
-    def _cleanup_entities_and_relations(self, entity_ids: List[str]):
-        """清理实体和关系"""
-        # 这里可以实现更智能的清理逻辑
-        # 例如，如果实体不再被任何记忆引用，则删除它
-        pass
+    def _cleanup_entities_and_relations(self, memory_entities: Dict[str, List[str]]):
+        """清理记忆写入的关系，以及不再被任何关系引用的实体
+
+        Args:
+            memory_entities: 记忆ID -> 该记忆元数据中记录的实体ID列表
+        """
+        if self.graph_store:
+            self.graph_store.delete_memory_subgraph(memory_entities)
     
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在"""
         return self._find_memory_by_id(memory_id) is not None
     
-    def forget(self, strategy: str = "importance_based", threshold: float = 0.1, max_age_days: int = 30) -> int:
-        """语义记忆遗忘机制（硬删除）"""
-        forgotten_count = 0
-        current_time = datetime.now()
-        
-        to_remove = []  # 收集要删除的记忆ID
-        
-        for memory in self.semantic_memories:
-            should_forget = False
-            
-            if strategy == "importance_based":
-                # 基于重要性遗忘
-                if memory.importance < threshold:
-                    should_forget = True
-            elif strategy == "time_based":
-                # 基于时间遗忘
-                cutoff_time = current_time - timedelta(days=max_age_days)
-                if memory.timestamp < cutoff_time:
-                    should_forget = True
-            elif strategy == "capacity_based":
-                # 基于容量遗忘（保留最重要的）
-                if len(self.semantic_memories) > self.config.max_capacity:
-                    sorted_memories = sorted(self.semantic_memories, key=lambda m: m.importance)
-                    excess_count = len(self.semantic_memories) - self.config.max_capacity
-                    if memory in sorted_memories[:excess_count]:
-                        should_forget = True
-            
-            if should_forget:
-                to_remove.append(memory.id)
-        
-        # 执行硬删除
-        for memory_id in to_remove:
-            if self.remove(memory_id):
-                forgotten_count += 1
-                logger.info(f"语义记忆硬删除: {memory_id[:8]}... (策略: {strategy})")
-        
-        return forgotten_count
+    def forget(
+            self,
+            strategy: str = "importance_based",
+            threshold: float = 0.1,
+            max_age_days: int = 30,
+            user_id: Optional[str] = None
+    ) -> int:
+        """语义记忆遗忘机制（硬删除，向量化筛选后一次批量删除；指定 user_id 时只筛选该用户的记忆）"""
+        ids, importance, timestamps = to_columns(
+            (m.id, m.importance, m.timestamp.timestamp()) for m in self.semantic_memories
+            if user_id is None or m.user_id == user_id
+        )
+        victims = select_victims(
+            importance,
+            timestamps,
+            strategy=strategy,
+            threshold=threshold,
+            max_age_days=max_age_days,
+            capacity=self.config.max_capacity
+        )
+        if not victims.size:
+            return 0
+
+        removed = self.remove_batch([ids[i] for i in victims])
+        logger.info(f"语义记忆硬删除: {len(removed)} 条 (策略: {strategy})")
+        return len(removed)
 
     def clear(self):
         """清空所有语义记忆 - 包括专业数据库"""
+        if self.enrichment is not None:
+            self.enrichment.clear()
         try:
             # 清空Qdrant向量数据库
             if self.vector_store:
@@ -1027,6 +1402,7 @@ class SemanticMemory(BaseMemory):
             # 清空本地缓存
             self.semantic_memories.clear()
             self.memory_embeddings.clear()
+            self.resident_bytes = 0
             self.entities.clear()
             self.relations.clear()
             
@@ -1037,6 +1413,7 @@ class SemanticMemory(BaseMemory):
             # 即使数据库清空失败，也要清空本地缓存
         self.semantic_memories.clear()
         self.memory_embeddings.clear()
+        self.resident_bytes = 0
         self.entities.clear()
         self.relations.clear()
 
@@ -1065,7 +1442,8 @@ class SemanticMemory(BaseMemory):
             "graph_nodes": graph_stats.get("total_nodes", 0),
             "graph_edges": graph_stats.get("total_relationships", 0),
             "avg_importance": sum(m.importance for m in active_memories) / len(active_memories) if active_memories else 0.0,
-            "memory_type": "enhanced_semantic"
+            "memory_type": "enhanced_semantic",
+            **({"enrichment": self.enrichment.get_stats()} if self.enrichment is not None else {})
         }
     
     def get_entity(self, entity_id: str) -> Optional[Entity]:
@@ -1179,3 +1557,79 @@ class SemanticMemory(BaseMemory):
                 "relations": [],
                 "graph_stats": {"error": str(e)}
             }
+
+    # 旧版节点ID由 hash() 生成：前缀 + 十进制整数（可能为负）
+    _LEGACY_NODE_ID_RE = re.compile(r"\b(?:entity|token|concept)_-?\d+\b")
+
+    def migrate_graph_ids(self, dry_run: bool = False) -> Dict[str, Any]:
+        """一次性迁移：把旧版 hash() 节点ID重算为内容寻址ID，并合并因此重复的节点
+
+        ID 只依赖节点自身属性（名称、类型/词性、按名称检测的语言），可直接从图中重算；
+        同时更新本地实体/关系缓存、记忆元数据与向量payload中的实体ID。
+
+        Args:
+            dry_run: 只统计不修改
+
+        Returns:
+            报告：扫描节点数、需迁移节点数、迁移后的目标节点数，以及图合并结果
+        """
+        report: Dict[str, Any] = {"scanned": 0, "remapped": 0, "targets": 0, "dry_run": dry_run}
+        if not self.graph_store:
+            return report
+
+        mapping: Dict[str, str] = {}
+        for props in self.graph_store.scan_entities():
+            report["scanned"] += 1
+            old_id = props.get("id") or ""
+            kind = old_id.split("_", 1)[0]
+            name = props.get("name") or ""
+            if kind == "entity":
+                new_id = self._node_id("entity", name, props.get("type") or "")
+            elif kind == "token":
+                new_id = self._node_id("token", name, props.get("pos") or "")
+            elif kind == "concept":
+                new_id = self._node_id("concept", name)
+            else:
+                continue
+            if new_id != old_id:
+                mapping[old_id] = new_id
+        report["remapped"] = len(mapping)
+        report["targets"] = len(set(mapping.values()))
+        if dry_run or not mapping:
+            return report
+
+        report.update(self.graph_store.merge_entities(mapping))
+
+        # 本地缓存
+        remapped_entities: Dict[str, Entity] = {}
+        for entity_id, entity in self.entities.items():
+            entity.entity_id = mapping.get(entity_id, entity_id)
+            if entity.entity_id in remapped_entities:
+                remapped_entities[entity.entity_id].frequency += entity.frequency
+            else:
+                remapped_entities[entity.entity_id] = entity
+        self.entities = remapped_entities
+        for relation in self.relations:
+            relation.from_entity = mapping.get(relation.from_entity, relation.from_entity)
+            relation.to_entity = mapping.get(relation.to_entity, relation.to_entity)
+
+        # 记忆元数据与向量payload
+        payloads = {}
+        for memory in self.semantic_memories:
+            entities = memory.metadata.get("entities") or []
+            remapped = list(dict.fromkeys(mapping.get(e, e) for e in entities))
+            if remapped != entities:
+                memory.metadata["entities"] = remapped
+                payloads[memory.id] = {"entities": remapped}
+            if memory.metadata.get("relations"):
+                memory.metadata["relations"] = [
+                    self._LEGACY_NODE_ID_RE.sub(lambda m: mapping.get(m.group(0), m.group(0)), relation)
+                    for relation in memory.metadata["relations"]
+                ]
+        try:
+            self.vector_store.set_payloads(payloads)
+        except Exception as e:
+            logger.warning(f"⚠️ 回填语义向量payload失败: {e}")
+
+        logger.info(f"✅ 图节点ID迁移完成: {report}")
+        return report
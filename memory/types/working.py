@@ -7,11 +7,17 @@
 - 自动清理机制
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import heapq
+import itertools
+import math
+
+import numpy as np
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
+from ..indexes import ColumnStore, top_k
+from ..forgetting import select_victims
 
 class WorkingMemory(BaseMemory):
     """工作记忆实现
@@ -32,121 +38,80 @@ class WorkingMemory(BaseMemory):
         # 纯内存TTL（分钟），可通过在 MemoryConfig 上挂载 working_memory_ttl_minutes 覆盖
         self.max_age_minutes = getattr(self.config, 'working_memory_ttl_minutes', 120)
         self.current_tokens = 0
+        self.content_bytes = 0  # 内容字节数（UTF-8），供管理器池估算常驻量
         self.session_start = datetime.now()
         
-        # 内存存储（工作记忆不需要持久化）
-        self.memories: List[MemoryItem] = []
+        # 内存存储（工作记忆不需要持久化），按插入顺序保存
+        self._by_id: Dict[str, MemoryItem] = {}
+        
+        # 列式存储：时间戳/重要性/token数/用户等列 + BM25倒排词项矩阵，随增删改增量维护，
+        # 检索与遗忘筛选在这些列上一次向量化完成
+        self.columns = ColumnStore()
         
-        # 使用优先级队列管理记忆
-        self.memory_heap = []  # (priority, timestamp, memory_item)
+        # 带墓碑的索引优先级堆（最小堆，堆顶为优先级最低的记忆）：
+        # 条目为 (优先级键, 序号, 记忆ID, 代数)，代数与 _heap_generation 不一致的条目视为已删除
+        self.memory_heap: List[tuple] = []
+        self._heap_generation: Dict[str, int] = {}
+        self._heap_stale = 0
+        # 按时间戳排序的过期队列：(时间戳, 序号, 记忆ID)
+        self._expiry_queue: List[tuple] = []
+        self._counter = itertools.count()
+    
+    @property
+    def memories(self) -> List[MemoryItem]:
+        """当前全部工作记忆（按插入顺序，返回副本；只需条数时用 count()）"""
+        return list(self._by_id.values())
+
+    def count(self) -> int:
+        """当前工作记忆条数（O(1)，不复制列表）"""
+        return len(self.columns)
     
     def add(self, memory_item: MemoryItem) -> str:
         """添加工作记忆"""
         # 过期清理
         self._expire_old_memories()
-        # 计算优先级（重要性 + 时间衰减）
-        priority = self._calculate_priority(memory_item)
-        
-        # 添加到堆中
-        heapq.heappush(self.memory_heap, (-priority, memory_item.timestamp, memory_item))
-        self.memories.append(memory_item)
-        
-        # 更新token计数
-        self.current_tokens += len(memory_item.content.split())
+        self._insert(memory_item)
         
         # 检查容量限制
         self._enforce_capacity_limits()
         
         return memory_item.id
+
+    def add_batch(
+            self,
+            memory_items: List[MemoryItem],
+            embeddings: Optional[List[Any]] = None
+    ) -> List[Optional[str]]:
+        """批量添加工作记忆（过期清理与容量检查只执行一次；工作记忆不使用向量，忽略 embeddings）"""
+        self._expire_old_memories()
+        for memory_item in memory_items:
+            self._insert(memory_item)
+        self._enforce_capacity_limits()
+        return [None] * len(memory_items)
     
     def retrieve(self, query: str, limit: int = 5, user_id: str = None, **kwargs) -> List[MemoryItem]:
-        """检索工作记忆 - 混合语义向量检索和关键词匹配"""
+        """检索工作记忆 - BM25倒排索引召回候选，再叠加时间衰减与重要性权重"""
         # 过期清理
         self._expire_old_memories()
-        if not self.memories:
-            return []
-
-        # 过滤已遗忘的记忆
-        active_memories = [m for m in self.memories if not m.metadata.get("forgotten", False)]
-        
-        # 按用户ID过滤（如果提供）
-        filtered_memories = active_memories
-        if user_id:
-            filtered_memories = [m for m in active_memories if m.user_id == user_id]
-
-        if not filtered_memories:
+        if not self._by_id:
             return []
 
-        # 尝试语义向量检索（如果有嵌入模型）
-        vector_scores = {}
-        try:
-            # 简单的语义相似度计算（使用TF-IDF或其他轻量级方法）
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            from sklearn.metrics.pairwise import cosine_similarity
-            import numpy as np
-
-            # 准备文档
-            documents = [query] + [m.content for m in filtered_memories]
-
-            # TF-IDF向量化
-            vectorizer = TfidfVectorizer(stop_words=None, lowercase=True)
-            tfidf_matrix = vectorizer.fit_transform(documents)
-
-            # 计算相似度
-            query_vector = tfidf_matrix[0:1]
-            doc_vectors = tfidf_matrix[1:]
-            similarities = cosine_similarity(query_vector, doc_vectors).flatten()
-
-            # 存储向量分数
-            for i, memory in enumerate(filtered_memories):
-                vector_scores[memory.id] = similarities[i]
-
-        except Exception as e:
-            # 如果向量检索失败，回退到关键词匹配
-            vector_scores = {}
-
-        # 计算最终分数
-        query_lower = query.lower()
-        scored_memories = []
-        
-        for memory in filtered_memories:
-            content_lower = memory.content.lower()
-            
-            # 获取向量分数（如果有）
-            vector_score = vector_scores.get(memory.id, 0.0)
-
-            # 关键词匹配分数
-            keyword_score = 0.0
-            if query_lower in content_lower:
-                keyword_score = len(query_lower) / len(content_lower)
-            else:
-                # 分词匹配
-                query_words = set(query_lower.split())
-                content_words = set(content_lower.split())
-                intersection = query_words.intersection(content_words)
-                if intersection:
-                    keyword_score = len(intersection) / len(query_words.union(content_words)) * 0.8
+        # BM25分数（无上界，归一化到 [0, 1)）
+        relevance = self.columns.bm25(query)
+        relevance /= relevance + 1.0
 
-            # 混合分数：向量检索 + 关键词匹配
-            if vector_score > 0:
-                base_relevance = vector_score * 0.7 + keyword_score * 0.3
-            else:
-                base_relevance = keyword_score
-            
-            # 时间衰减
-            time_decay = self._calculate_time_decay(memory.timestamp)
-            base_relevance *= time_decay
-            
-            # 重要性权重
-            importance_weight = 0.8 + (memory.importance * 0.4)
-            final_score = base_relevance * importance_weight
-            
-            if final_score > 0:
-                scored_memories.append((final_score, memory))
+        # 时间衰减与重要性权重
+        scores = relevance * self._time_decay_array() * (0.8 + self.columns.importance[:self.columns.size] * 0.4)
+        scores[~self.columns.mask(user_id)] = 0.0
 
-        # 按分数排序并返回
-        scored_memories.sort(key=lambda x: x[0], reverse=True)
-        return [memory for _, memory in scored_memories[:limit]]
+        # 按分数排序并返回（返回副本并附带分数，供跨类型合并使用）
+        results = []
+        for slot in top_k(scores, limit):
+            memory = self._by_id[self.columns.ids[slot]]
+            results.append(memory.model_copy(
+                update={"metadata": {**memory.metadata, "relevance_score": float(scores[slot])}}
+            ))
+        return results
     
     def update(
         self,
@@ -156,54 +121,82 @@ class WorkingMemory(BaseMemory):
         metadata: Dict[str, Any] = None
     ) -> bool:
         """更新工作记忆"""
-        for memory in self.memories:
-            if memory.id == memory_id:
-                old_tokens = len(memory.content.split())
-                
-                if content is not None:
-                    memory.content = content
-                    # 更新token计数
-                    new_tokens = len(content.split())
-                    self.current_tokens = self.current_tokens - old_tokens + new_tokens
-                
-                if importance is not None:
-                    memory.importance = importance
-                
-                if metadata is not None:
-                    memory.metadata.update(metadata)
-                
-                # 重新计算优先级并更新堆
-                self._update_heap_priority(memory)
-                
-                return True
-        return False
+        memory = self._by_id.get(memory_id)
+        if memory is None:
+            return False
+        old_content = memory.content
+        old_tokens = len(old_content.split())
+        
+        if content is not None:
+            memory.content = content
+            # 更新token计数
+            new_tokens = len(content.split())
+            self.current_tokens = self.current_tokens - old_tokens + new_tokens
+            self.content_bytes += len(content.encode("utf-8")) - len(old_content.encode("utf-8"))
+        
+        if importance is not None:
+            memory.importance = importance
+        
+        if metadata is not None:
+            memory.metadata.update(metadata)
+        
+        self.columns.update(
+            memory_id,
+            content=content,
+            importance=importance,
+            tokens=len(content.split()) if content is not None else None,
+            forgotten=bool(memory.metadata.get("forgotten", False))
+        )
+        
+        # 重新计算优先级并更新堆
+        if importance is not None:
+            self._update_heap_priority(memory)
+        
+        return True
     
     def remove(self, memory_id: str) -> bool:
         """删除工作记忆"""
-        for i, memory in enumerate(self.memories):
-            if memory.id == memory_id:
-                # 从列表中删除
-                removed_memory = self.memories.pop(i)
-                
-                # 从堆中删除（标记删除）
-                self._mark_deleted_in_heap(memory_id)
-                
-                # 更新token计数
-                self.current_tokens -= len(removed_memory.content.split())
-                self.current_tokens = max(0, self.current_tokens)
-                
-                return True
-        return False
+        if not self._detach(memory_id):
+            return False
+        self._notify_removed(memory_id)
+        return True
+
+    def remove_batch(self, memory_ids: List[str]) -> List[str]:
+        """批量删除工作记忆（删除回调只触发一次）"""
+        removed = [memory_id for memory_id in dict.fromkeys(memory_ids) if self._detach(memory_id)]
+        self._notify_removed_batch(removed)
+        return removed
+
+    def _detach(self, memory_id: str) -> bool:
+        """从内存结构中移除记忆（不通知监听方）"""
+        removed_memory = self._by_id.pop(memory_id, None)
+        if removed_memory is None:
+            return False
+        self.columns.remove(memory_id)
+        
+        # 从堆中删除（标记删除）
+        self._mark_deleted_in_heap(memory_id)
+        
+        # 更新token计数
+        self.current_tokens -= len(removed_memory.content.split())
+        self.current_tokens = max(0, self.current_tokens)
+        self.content_bytes = max(0, self.content_bytes - len(removed_memory.content.encode("utf-8")))
+        return True
     
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在"""
-        return any(memory.id == memory_id for memory in self.memories)
+        return memory_id in self._by_id
     
     def clear(self):
         """清空所有工作记忆"""
-        self.memories.clear()
+        self._by_id.clear()
+        self.columns.clear()
         self.memory_heap.clear()
+        self._heap_generation.clear()
+        self._heap_stale = 0
+        self._expiry_queue.clear()
         self.current_tokens = 0
+        self.content_bytes = 0
     
     def get_stats(self) -> Dict[str, Any]:
         """获取工作记忆统计信息"""
@@ -211,12 +204,12 @@ class WorkingMemory(BaseMemory):
         self._expire_old_memories()
         
         # 工作记忆中的记忆都是活跃的（已遗忘的记忆会被直接删除）
-        active_memories = self.memories
+        active_memories = list(self._by_id.values())
         
         return {
             "count": len(active_memories),  # 活跃记忆数量
             "forgotten_count": 0,  # 工作记忆中已遗忘的记忆会被直接删除
-            "total_count": len(self.memories),  # 总记忆数量
+            "total_count": len(self._by_id),  # 总记忆数量
             "current_tokens": self.current_tokens,
             "max_capacity": self.max_capacity,
             "max_tokens": self.max_tokens,
@@ -248,11 +241,11 @@ class WorkingMemory(BaseMemory):
 
     def get_all(self) -> List[MemoryItem]:
         """获取所有记忆"""
-        return self.memories.copy()
+        return list(self._by_id.values())
     
     def get_context_summary(self, max_length: int = 500) -> str:
         """获取上下文摘要"""
-        if not self.memories:
+        if not self._by_id:
             return "No working memories available."
         
         # 按重要性和时间排序
@@ -279,48 +272,41 @@ class WorkingMemory(BaseMemory):
         
         return "Working Memory Context:\n" + "\n".join(summary_parts)
     
-    def forget(self, strategy: str = "importance_based", threshold: float = 0.1, max_age_days: int = 1) -> int:
-        """工作记忆遗忘机制"""
-        forgotten_count = 0
+    def forget(
+            self,
+            strategy: str = "importance_based",
+            threshold: float = 0.1,
+            max_age_days: int = 1,
+            user_id: Optional[str] = None
+    ) -> int:
+        """工作记忆遗忘机制（工作记忆只属于所在的管理器，user_id 仅为接口一致而保留）"""
         current_time = datetime.now()
-        
-        to_remove = []
+        columns = self.columns
+        timestamps = columns.timestamps[:columns.size]
         
         # 始终先执行TTL过期（分钟级）
-        cutoff_ttl = current_time - timedelta(minutes=self.max_age_minutes)
-        for memory in self.memories:
-            if memory.timestamp < cutoff_ttl:
-                to_remove.append(memory.id)
-        
-        if strategy == "importance_based":
-            # 删除低重要性记忆
-            for memory in self.memories:
-                if memory.importance < threshold:
-                    to_remove.append(memory.id)
+        victims = timestamps < current_time.timestamp() - self.max_age_minutes * 60
         
-        elif strategy == "time_based":
-            # 删除过期记忆（工作记忆通常以小时计算）
-            cutoff_time = current_time - timedelta(hours=max_age_days * 24)
-            for memory in self.memories:
-                if memory.timestamp < cutoff_time:
-                    to_remove.append(memory.id)
-        
-        elif strategy == "capacity_based":
-            # 删除超出容量的记忆
-            if len(self.memories) > self.max_capacity:
-                # 按优先级排序，删除最低的
-                sorted_memories = sorted(
-                    self.memories,
-                    key=lambda m: self._calculate_priority(m)
-                )
-                excess_count = len(self.memories) - self.max_capacity
-                for memory in sorted_memories[:excess_count]:
-                    to_remove.append(memory.id)
+        if strategy in ("importance_based", "time_based"):
+            # 删除低重要性 / 过期记忆（工作记忆通常以小时计算）
+            victims[select_victims(
+                columns.importance[:columns.size],
+                timestamps,
+                strategy=strategy,
+                threshold=threshold,
+                max_age_days=max_age_days,
+                now=current_time
+            )] = True
         
         # 执行删除
-        for memory_id in to_remove:
-            if self.remove(memory_id):
-                forgotten_count += 1
+        victims &= columns.alive[:columns.size]
+        forgotten_count = len(self.remove_batch(columns.ids_at(np.flatnonzero(victims))))
+        
+        if strategy == "capacity_based":
+            # 从优先级堆顶一次取出超出容量的记忆
+            excess = len(self._by_id) - self.max_capacity
+            if excess > 0:
+                forgotten_count += len(self.remove_batch(self._pop_lowest_priority_ids(excess)))
         
         return forgotten_count
     
@@ -335,77 +321,121 @@ class WorkingMemory(BaseMemory):
         
         return priority
     
-    def _calculate_time_decay(self, timestamp: datetime) -> float:
-        """计算时间衰减因子"""
-        time_diff = datetime.now() - timestamp
+    def _calculate_time_decay(self, timestamp: datetime, now: Optional[datetime] = None) -> float:
+        """计算时间衰减因子（批量计算时传入同一个 now）"""
+        time_diff = (now or datetime.now()) - timestamp
         hours_passed = time_diff.total_seconds() / 3600
         
         # 指数衰减（工作记忆衰减更快）
         decay_factor = self.config.decay_factor ** (hours_passed / 6)  # 每6小时衰减
         return max(0.1, decay_factor)  # 最小保持10%的权重
+
+    def _time_decay_array(self, now: Optional[datetime] = None) -> np.ndarray:
+        """按槽位排列的时间衰减因子（与 _calculate_time_decay 一致）"""
+        now_ts = (now or datetime.now()).timestamp()
+        hours_passed = (now_ts - self.columns.timestamps[:self.columns.size]) / 3600
+        return np.maximum(0.1, self.config.decay_factor ** (hours_passed / 6))
     
     def _enforce_capacity_limits(self):
         """强制执行容量限制"""
         # 检查记忆数量限制
-        while len(self.memories) > self.max_capacity:
+        while len(self._by_id) > self.max_capacity:
             self._remove_lowest_priority_memory()
         
         # 检查token限制
-        while self.current_tokens > self.max_tokens:
+        while self.current_tokens > self.max_tokens and self._by_id:
             self._remove_lowest_priority_memory()
 
-    def _expire_old_memories(self):
-        """按TTL清理过期记忆，并同步更新堆与token计数"""
-        if not self.memories:
-            return
+    def _insert(self, memory_item: MemoryItem):
+        """写入记忆并登记到索引、优先级堆与过期队列"""
+        # 同ID重复写入视为替换
+        self._detach(memory_item.id)
+        self._by_id[memory_item.id] = memory_item
+        self.columns.add(
+            memory_item.id,
+            memory_item.content,
+            memory_item.timestamp.timestamp(),
+            memory_item.importance,
+            memory_item.user_id,
+            len(memory_item.content.split()),
+            forgotten=bool(memory_item.metadata.get("forgotten", False))
+        )
+        self._push_heap(memory_item)
+        heapq.heappush(self._expiry_queue, (memory_item.timestamp, next(self._counter), memory_item.id))
+        self.current_tokens += len(memory_item.content.split())
+        self.content_bytes += len(memory_item.content.encode("utf-8"))
+
+    def _priority_key(self, memory: MemoryItem) -> float:
+        """与时间无关的优先级排序键
+
+        priority = importance * decay^((now - ts) / 6h)，其中 now 对所有记忆相同，
+        取对数后 ln(importance) - ln(decay) * ts / 6h 的大小顺序与 priority 一致，
+        因此堆中的键无需随时间重算。
+        """
+        if memory.importance <= 0:
+            return float('-inf')
+        hours = (memory.timestamp - self.session_start).total_seconds() / 3600
+        decay = min(max(self.config.decay_factor, 1e-9), 1.0)
+        return math.log(memory.importance) - math.log(decay) * hours / 6
+
+    def _push_heap(self, memory: MemoryItem):
+        generation = self._heap_generation.get(memory.id, 0) + 1
+        if memory.id in self._heap_generation:
+            self._heap_stale += 1
+        self._heap_generation[memory.id] = generation
+        heapq.heappush(self.memory_heap, (self._priority_key(memory), next(self._counter), memory.id, generation))
+        self._maybe_compact_heap()
+
+    def _maybe_compact_heap(self):
+        """墓碑过多时重建堆（均摊 O(log n)）"""
+        if self._heap_stale > 64 and self._heap_stale > len(self._heap_generation):
+            self.memory_heap = [
+                entry for entry in self.memory_heap
+                if self._heap_generation.get(entry[2]) == entry[3]
+            ]
+            heapq.heapify(self.memory_heap)
+            self._heap_stale = 0
+
+    def expire(self) -> int:
+        """按TTL清理过期记忆，返回清理条数"""
+        return self._expire_old_memories()
+
+    def _expire_old_memories(self) -> int:
+        """按TTL清理过期记忆：从过期队列头部弹出，只触及已过期的记忆"""
         cutoff_time = datetime.now() - timedelta(minutes=self.max_age_minutes)
-        # 过滤保留的记忆
-        kept: List[MemoryItem] = []
-        removed_token_sum = 0
-        for m in self.memories:
-            if m.timestamp >= cutoff_time:
-                kept.append(m)
-            else:
-                removed_token_sum += len(m.content.split())
-        if len(kept) == len(self.memories):
-            return
-        # 覆盖列表与token
-        self.memories = kept
-        self.current_tokens = max(0, self.current_tokens - removed_token_sum)
-        # 重建堆
-        self.memory_heap = []
-        for mem in self.memories:
-            priority = self._calculate_priority(mem)
-            heapq.heappush(self.memory_heap, (-priority, mem.timestamp, mem))
+        expired = 0
+        while self._expiry_queue and self._expiry_queue[0][0] < cutoff_time:
+            timestamp, _, memory_id = heapq.heappop(self._expiry_queue)
+            memory = self._by_id.get(memory_id)
+            # 已删除或时间戳已变化的条目是过期队列里的墓碑
+            if memory is not None and memory.timestamp == timestamp and self.remove(memory_id):
+                expired += 1
+        return expired
     
     def _remove_lowest_priority_memory(self):
-        """删除优先级最低的记忆"""
-        if not self.memories:
-            return
-        
-        # 找到优先级最低的记忆
-        lowest_priority = float('inf')
-        lowest_memory = None
-        
-        for memory in self.memories:
-            priority = self._calculate_priority(memory)
-            if priority < lowest_priority:
-                lowest_priority = priority
-                lowest_memory = memory
-        
-        if lowest_memory:
-            self.remove(lowest_memory.id)
+        """删除优先级最低的记忆（堆顶，跳过墓碑）"""
+        for memory_id in self._pop_lowest_priority_ids(1):
+            self.remove(memory_id)
+
+    def _pop_lowest_priority_ids(self, count: int) -> List[str]:
+        """从堆顶弹出优先级最低的 count 个有效记忆ID（跳过墓碑，不删除记忆本身）"""
+        memory_ids: List[str] = []
+        while self.memory_heap and len(memory_ids) < count:
+            _, _, memory_id, generation = heapq.heappop(self.memory_heap)
+            if self._heap_generation.get(memory_id) == generation:
+                # 条目已出堆，删除时无需再记为墓碑
+                del self._heap_generation[memory_id]
+                memory_ids.append(memory_id)
+            else:
+                self._heap_stale = max(0, self._heap_stale - 1)
+        return memory_ids
     
     def _update_heap_priority(self, memory: MemoryItem):
-        """更新堆中记忆的优先级"""
-        # 简单实现：重建堆
-        self.memory_heap = []
-        for mem in self.memories:
-            priority = self._calculate_priority(mem)
-            heapq.heappush(self.memory_heap, (-priority, mem.timestamp, mem))
+        """更新堆中记忆的优先级：压入新代数的条目，旧条目成为墓碑"""
+        self._push_heap(memory)
     
     def _mark_deleted_in_heap(self, memory_id: str):
-        """在堆中标记删除的记忆"""
-        # 由于heapq不支持直接删除，我们标记为已删除
-        # 在后续操作中会被清理
-        pass
+        """在堆中标记删除的记忆（堆条目在弹出或重建时清理）"""
+        if self._heap_generation.pop(memory_id, None) is not None:
+            self._heap_stale += 1
+            self._maybe_compact_heap()
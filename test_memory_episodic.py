@@ -0,0 +1,116 @@
+# test_memory_episodic.py
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from memory.storage.document_store import SQLiteDocumentStore
+from memory.types.episodic import Episode, EpisodeCache, EpisodicMemory, encode_cursor, decode_cursor
+
+
+def _episode(episode_id, content="内容", timestamp=0):
+    return Episode(episode_id, "u1", "s1", datetime.fromtimestamp(timestamp), content, {})
+
+
+def test_episode_cache_lru():
+    """测试情景缓存按最近使用淘汰"""
+    cache = EpisodeCache(capacity=2)
+    cache.put(_episode("a"))
+    cache.put(_episode("b"))
+    assert cache.get("a") is not None  # a 变为最近使用
+    cache.put(_episode("c"))
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert [e.episode_id for e in cache.values()] == ["a", "c"]
+
+
+def test_episode_cache_content_bytes():
+    """测试常驻字节数在写入、刷新、淘汰、移除时增量维护"""
+    cache = EpisodeCache(capacity=2)
+    cache.put(_episode("a", "abc"))
+    cache.put(_episode("b", "记忆"))
+    assert cache.content_bytes == 3 + 6
+    cache.put(_episode("a", "abcdef"))
+    assert cache.content_bytes == 6 + 6
+    cache.put(_episode("c", "x"))  # 淘汰 b
+    assert cache.content_bytes == 6 + 1
+    assert cache.pop("a") is not None
+    assert cache.pop("a") is None
+    assert cache.content_bytes == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.content_bytes == 0
+
+
+def test_episode_cache_zero_capacity():
+    """测试容量为0时不缓存"""
+    cache = EpisodeCache(capacity=0)
+    cache.put(_episode("a"))
+    assert len(cache) == 0 and cache.content_bytes == 0
+
+
+def test_cursor_roundtrip():
+    """测试游标编码含冒号的ID也能还原"""
+    assert decode_cursor(encode_cursor(1700000000, "ep:1")) == (1700000000, "ep:1")
+
+
+def _timeline(tmp):
+    store = SQLiteDocumentStore(os.path.join(tmp, "paging.db"))
+    # 同一秒内多条记录，按 (timestamp, id) 定序
+    store.add_memories([
+        {"memory_id": f"e{i}", "user_id": "u1", "content": f"情景{i}", "memory_type": "episodic",
+         "timestamp": 1000 + i // 2, "importance": 0.5, "properties": {"session_id": "s1"}}
+        for i in range(7)
+    ])
+    memory = EpisodicMemory.__new__(EpisodicMemory)
+    memory.doc_store = store
+    return memory
+
+
+def test_timeline_cursor_paging():
+    """测试时间线游标分页向后翻到底、再向前翻回，不重不漏"""
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = _timeline(tmp)
+
+        pages = []
+        page = memory.get_timeline_page(user_id="u1", page_size=3)
+        assert page["prev_cursor"] is None
+        while True:
+            pages.append([item["episode_id"] for item in page["items"]])
+            if page["next_cursor"] is None:
+                break
+            page = memory.get_timeline_page(user_id="u1", before=page["next_cursor"], page_size=3)
+        assert pages == [["e6", "e5", "e4"], ["e3", "e2", "e1"], ["e0"]]
+
+        # 从最后一页向前翻
+        back = memory.get_timeline_page(user_id="u1", after=page["prev_cursor"], page_size=3)
+        assert [item["episode_id"] for item in back["items"]] == ["e3", "e2", "e1"]
+        assert back["next_cursor"] is not None and back["prev_cursor"] is not None
+        first = memory.get_timeline_page(user_id="u1", after=back["prev_cursor"], page_size=3)
+        assert [item["episode_id"] for item in first["items"]] == ["e6", "e5", "e4"]
+        assert first["prev_cursor"] is None
+
+
+def test_list_memories_keyset_after():
+    """测试正序键集分页跨越同一时间戳"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _timeline(tmp).doc_store
+        seen = []
+        cursor = None
+        while True:
+            docs = store.list_memories(memory_type="episodic", order="oldest", limit=2, after=cursor)
+            seen.extend(doc["memory_id"] for doc in docs)
+            if len(docs) < 2:
+                break
+            cursor = (docs[-1]["timestamp"], docs[-1]["memory_id"])
+        assert seen == [f"e{i}" for i in range(7)]
+
+
+if __name__ == "__main__":
+    test_episode_cache_lru()
+    test_episode_cache_content_bytes()
+    test_episode_cache_zero_capacity()
+    test_cursor_roundtrip()
+    test_timeline_cursor_paging()
+    test_list_memories_keyset_after()
+    print("✅ 全部通过")
@@ -0,0 +1,131 @@
+# test_memory_indexes.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from memory.forgetting import to_columns, select_victims
+from memory.indexes import BM25Index, ColumnStore, tokenize, top_k
+
+
+def test_tokenize():
+    """测试检索分词：拉丁文按词，中文按单字与二元组"""
+    assert tokenize("Hello World_1") == ["hello", "world_1"]
+    assert tokenize("记忆") == ["记", "忆", "记忆"]
+    assert tokenize(None) == []
+
+
+def test_select_victims_capacity_tie_breaking():
+    """测试按容量遗忘：保留最重要的，同重要性先删较旧的"""
+    ids, importance, timestamps = to_columns([
+        ("a", 0.5, 300.0),
+        ("b", 0.2, 500.0),
+        ("c", 0.5, 100.0),
+        ("d", 0.9, 50.0),
+        ("e", 0.5, 200.0),
+    ])
+    victims = select_victims(importance, timestamps, strategy="capacity_based", capacity=3)
+    # b 重要性最低；a/c/e 同为 0.5，删掉最旧的 c
+    assert [ids[i] for i in victims] == ["b", "c"]
+
+    victims = select_victims(importance, timestamps, strategy="capacity_based", capacity=2)
+    assert [ids[i] for i in victims] == ["b", "c", "e"]
+
+
+def test_select_victims_capacity_bounds():
+    """测试容量边界：未超出不删，容量为0全删"""
+    importance = np.array([0.1, 0.2])
+    timestamps = np.array([1.0, 2.0])
+    assert select_victims(importance, timestamps, strategy="capacity_based", capacity=5).size == 0
+    assert list(select_victims(importance, timestamps, strategy="capacity_based", capacity=0)) == [0, 1]
+    assert select_victims(np.zeros(0), np.zeros(0), strategy="capacity_based", capacity=0).size == 0
+
+
+def test_bm25_add_update_remove():
+    """测试BM25增量增删改后倒排表与长度统计一致"""
+    index = BM25Index()
+    index.add("d1", "apple banana")
+    index.add("d2", "banana cherry cherry")
+    assert len(index) == 2
+    assert index.total_length == 5
+    assert set(index.search("banana")) == {"d1", "d2"}
+    assert set(index.search("banana", allowed=["d2"])) == {"d2"}
+
+    index.update("d1", "durian")
+    assert "apple" not in index.postings
+    assert index.doc_lengths["d1"] == 1
+    assert index.total_length == 4
+    assert set(index.search("banana")) == {"d2"}
+    assert set(index.search("durian")) == {"d1"}
+
+    assert index.remove("d2")
+    assert not index.remove("d2")
+    assert "cherry" not in index.postings
+    assert "banana" not in index.postings
+    assert index.total_length == 1
+    assert index.search("cherry") == {}
+
+
+def test_bm25_score_prefers_higher_term_frequency():
+    """测试词频越高得分越高"""
+    index = BM25Index()
+    index.add("d1", "cherry pie")
+    index.add("d2", "cherry cherry pie")
+    index.add("d3", "lemon tart")
+    scores = index.search("cherry")
+    assert scores["d2"] > scores["d1"] > 0
+
+
+def test_column_store_add_update_remove():
+    """测试列式存储增删改与槽位复用"""
+    store = ColumnStore(initial_capacity=1)
+    slot_a = store.add("a", "apple banana", 10.0, 0.5, "u1", 3)
+    slot_b = store.add("b", "banana cherry", 20.0, 0.7, "u2", 4)
+    assert (slot_a, slot_b) == (0, 1)
+    assert len(store) == 2 and store.size == 2
+    assert list(store.mask()) == [True, True]
+    assert list(store.mask(user_id="u2")) == [False, True]
+    assert not store.mask(user_id="missing").any()
+
+    scores = store.bm25("apple")
+    assert scores[0] > 0 and scores[1] == 0
+
+    assert store.update("a", content="cherry", importance=0.9, forgotten=True)
+    assert store.importance[0] == 0.9
+    assert store.doc_lengths[0] == 1
+    assert store.bm25("apple")[0] == 0
+    assert list(store.mask()) == [False, True]
+    assert list(store.mask(include_forgotten=True)) == [True, True]
+    assert not store.update("missing", importance=0.1)
+
+    assert store.remove("a")
+    assert not store.remove("a")
+    assert "a" not in store
+    assert list(store.mask(include_forgotten=True)) == [False, True]
+
+    # 删除的槽位被复用
+    slot_c = store.add("c", "durian", 30.0, 0.1, "u1", 1)
+    assert slot_c == slot_a
+    assert store.size == 2
+    assert store.ids_at([0, 1]) == ["c", "b"]
+    assert not store.forgotten[slot_c]
+
+
+def test_top_k():
+    """测试 top_k 只返回正分且按分数降序"""
+    scores = np.array([0.0, 0.3, 0.9, 0.1, 0.5])
+    assert list(top_k(scores, 2)) == [2, 4]
+    assert list(top_k(scores, 10)) == [2, 4, 1, 3]
+    assert top_k(scores, 0).size == 0
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_select_victims_capacity_tie_breaking()
+    test_select_victims_capacity_bounds()
+    test_bm25_add_update_remove()
+    test_bm25_score_prefers_higher_term_frequency()
+    test_column_store_add_update_remove()
+    test_top_k()
+    print("✅ 全部通过")
@@ -0,0 +1,204 @@
+# test_memory_queues.py
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from types import SimpleNamespace
+
+from memory.journal import WriteBehindJournal
+from memory.enrichment import GraphEnrichmentQueue
+from memory.maintenance import TokenBucket
+
+
+def _journal(path, apply_batch=None, **kwargs):
+    return WriteBehindJournal(path, apply_batch or (lambda batch: [None] * len(batch)), fsync=False, **kwargs)
+
+
+def _take(journal, n):
+    """模拟后台线程取出一批条目"""
+    batch = [journal._pending.popitem(last=False)[1] for _ in range(n)]
+    for record in batch:
+        journal._inflight[record["id"]] = record
+    return batch
+
+
+def test_journal_replay_pending_and_cancel():
+    """测试未写入的条目在重启后重放，已取消的不重放"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.log")
+        journal = _journal(path)
+        journal.append_many([{"id": "m1", "content": "a"}, {"id": "m2", "content": "b"}])
+        journal.append({"id": "m3", "content": "c"})
+        assert journal.cancel("m2")
+        assert not journal.cancel("m2")
+        journal._file.close()
+
+        replayed = _journal(path)
+        assert [e["id"] for e in replayed.pending_entries()] == ["m1", "m3"]
+        assert replayed.get_stats()["replayed"] == 2
+        assert replayed.get_stats()["seq"] == 4
+        replayed._file.close()
+
+
+def test_journal_checkpoint_and_out_of_order_ack():
+    """测试检查点只推进到最早未完成条目之前，检查点之后已完成的条目不再重放"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.log")
+        journal = _journal(path, max_attempts=3)
+        journal.append_many([{"id": f"m{i}"} for i in range(1, 4)])
+
+        # m1 失败重试、m2 成功：检查点不能越过 m1
+        failed = journal._settle(_take(journal, 2), ["down", None])
+        assert failed == 1
+        assert journal.get_stats()["checkpoint"] == 0
+        assert [e["id"] for e in journal.pending_entries()] == ["m1", "m3"]
+        journal._file.close()
+
+        replayed = _journal(path)
+        assert [e["id"] for e in replayed.pending_entries()] == ["m1", "m3"]
+
+        # 全部写入后检查点推进到最新序号
+        replayed._settle(_take(replayed, 2), [None, None])
+        assert replayed.get_stats()["checkpoint"] == replayed.get_stats()["seq"]
+        replayed._file.close()
+
+        assert _journal(path).pending_entries() == []
+
+
+def test_journal_rewrite_after_ack_is_replayed():
+    """测试同一ID确认后又追加的新写入仍会重放"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.log")
+        journal = _journal(path)
+        journal.append_many([{"id": "m1"}, {"id": "m2", "content": "old"}])
+        journal._settle(_take(journal, 2)[1:], [None])
+        journal.append({"id": "m2", "content": "new"})
+        journal._file.close()
+
+        replayed = _journal(path)
+        entries = {e["id"]: e for e in replayed.pending_entries()}
+        assert set(entries) == {"m1", "m2"}
+        assert entries["m2"]["content"] == "new"
+        replayed._file.close()
+
+
+def test_journal_dead_letter_after_max_attempts():
+    """测试超过最大尝试次数的条目移入死信文件并推进检查点"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.log")
+        journal = _journal(path, max_attempts=2)
+        journal.append({"id": "m1"})
+        journal._settle(_take(journal, 1), ["boom"])
+        assert journal.is_pending("m1")
+        journal._settle(_take(journal, 1), ["boom"])
+        assert not journal.is_pending("m1")
+        assert journal.get_stats()["dead_lettered"] == 1
+        assert journal.get_stats()["checkpoint"] == 1
+        assert os.path.exists(journal.dead_letter_path)
+        journal._file.close()
+
+
+def test_journal_background_flush():
+    """测试后台线程写入并在 flush 后清空"""
+    with tempfile.TemporaryDirectory() as tmp:
+        applied = []
+        journal = _journal(os.path.join(tmp, "journal.log"),
+                           apply_batch=lambda batch: applied.extend(batch) or [None] * len(batch),
+                           flush_interval=0.01)
+        journal.start()
+        journal.append_many([{"id": "m1", "content": "a"}, {"id": "m2", "content": "b"}])
+        assert journal.flush(timeout=5)
+        journal.stop()
+        # 回调拿到的条目不含日志内部字段
+        assert applied == [{"id": "m1", "content": "a"}, {"id": "m2", "content": "b"}]
+
+
+def _item(memory_id):
+    return SimpleNamespace(id=memory_id)
+
+
+def test_enrichment_retry_requeues_at_head():
+    """测试失败条目放回队首重试，超过次数后放弃"""
+    given_up = []
+    queue = GraphEnrichmentQueue(lambda batch: [None] * len(batch), max_attempts=2,
+                                 on_give_up=lambda item, error: given_up.append((item.id, error)))
+    queue.submit([_item("a"), _item("b"), _item("c")])
+    batch = [queue._pending.popitem(last=False)[1] for _ in range(2)]
+    assert queue._settle(batch, ["timeout", None]) == 1
+    assert list(queue._pending) == ["a", "c"]
+
+    batch = [queue._pending.popitem(last=False)[1]]
+    assert queue._settle(batch, ["timeout"]) == 1
+    assert given_up == [("a", "timeout")]
+    assert list(queue._pending) == ["c"]
+    stats = queue.get_stats()
+    assert stats["enriched"] == 1 and stats["failed"] == 1
+
+
+def test_enrichment_resubmit_during_processing_wins():
+    """测试处理期间重新提交的条目以新提交为准"""
+    queue = GraphEnrichmentQueue(lambda batch: [None] * len(batch))
+    queue.submit([_item("a")])
+    batch = [queue._pending.popitem(last=False)[1]]
+    fresh = _item("a")
+    queue.submit([fresh])
+    queue._settle(batch, ["timeout"])
+    assert queue._pending["a"] is fresh
+    assert "a" not in queue._attempts
+
+
+def test_enrichment_cancel():
+    """测试撤销未处理的任务"""
+    processed = []
+    queue = GraphEnrichmentQueue(lambda batch: processed.extend(i.id for i in batch) or [None] * len(batch),
+                                 flush_interval=0.01)
+    queue.submit([_item("a"), _item("b"), _item("c")])
+    assert queue.cancel(["b", "missing"]) == 1
+    assert not queue.is_pending("b")
+    queue.start()
+    assert queue.flush(timeout=5)
+    queue.stop()
+    assert processed == ["a", "c"]
+
+
+def test_token_bucket_consume_and_refill():
+    """测试令牌桶透支后按速率回填"""
+    bucket = TokenBucket(rate=100.0, capacity=10.0)
+    assert bucket.tokens == 10.0
+    bucket.consume(15.0)
+    assert bucket.tokens < 0
+    start = time.monotonic()
+    assert bucket.acquire(1.0)
+    # 偿还约 6 个令牌，按 100/s 约需 60ms
+    assert time.monotonic() - start >= 0.04
+    time.sleep(0.2)
+    bucket.consume(0)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_token_bucket_acquire_stops_on_event():
+    """测试 stop_event 置位时 acquire 放弃等待"""
+    bucket = TokenBucket(rate=0.001, capacity=1.0)
+    bucket.consume(1.0)
+    stop_event = threading.Event()
+    threading.Timer(0.05, stop_event.set).start()
+    start = time.monotonic()
+    assert not bucket.acquire(1.0, stop_event=stop_event)
+    assert time.monotonic() - start < 5
+
+
+if __name__ == "__main__":
+    test_journal_replay_pending_and_cancel()
+    test_journal_checkpoint_and_out_of_order_ack()
+    test_journal_rewrite_after_ack_is_replayed()
+    test_journal_dead_letter_after_max_attempts()
+    test_journal_background_flush()
+    test_enrichment_retry_requeues_at_head()
+    test_enrichment_resubmit_during_processing_wins()
+    test_enrichment_cancel()
+    test_token_bucket_consume_and_refill()
+    test_token_bucket_acquire_stops_on_event()
+    print("✅ 全部通过")
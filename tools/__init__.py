@@ -2,6 +2,7 @@
 
 from .base import Tool, ToolParameter
 from .registry import ToolRegistry, global_registry
+from .metrics import ToolMetrics
 from .builtin.search_tool import SearchTool
 from .builtin.memory_tool import MemoryTool
 from .builtin.rag_tool import RAGTool
@@ -12,6 +13,7 @@ __all__ = [
     "ToolParameter",
     "ToolRegistry",
     "global_registry",
+    "ToolMetrics",
 
     # 内置工具
     "SearchTool",
@@ -27,7 +27,8 @@ class MemoryTool(Tool):
             user_id: str = "default_user",
             memory_config: MemoryConfig = None,
             memory_types: List[str] = None,
-            expandable: bool = False
+            expandable: bool = False,
+            write_behind: Optional[bool] = None
     ):
         super().__init__(
             name="memory",
@@ -37,6 +38,9 @@ class MemoryTool(Tool):
 
         # 初始化记忆管理器
         self.memory_config = memory_config or MemoryConfig()
+        if write_behind is not None:
+            # 写后模式：情景/语义记忆先落本地日志，不阻塞Agent回合
+            self.memory_config = self.memory_config.model_copy(update={"write_behind_enabled": write_behind})
         self.memory_types = memory_types or ["working", "episodic", "semantic"]
 
         self.memory_manager = MemoryManager(
@@ -185,6 +189,9 @@ class MemoryTool(Tool):
                 auto_classify=False  # 禁用自动分类，使用明确指定的类型
             )
 
+            journal = self.memory_manager.journal
+            if journal is not None and journal.is_pending(memory_id):
+                return f"✅ 记忆已排队写入 (ID: {memory_id[:8]}...)"
             return f"✅ 记忆已添加 (ID: {memory_id[:8]}...)"
 
         except Exception as e:
@@ -481,6 +488,27 @@ class MemoryTool(Tool):
             importance=importance
         )
 
+    def import_memories(self, items: List[Any], memory_type: str = "working") -> List[Dict[str, Any]]:
+        """批量导入记忆（如聊天记录、知识库导出）
+
+        便捷方法，为每条记忆附加当前会话信息后调用 MemoryManager.add_memories，
+        返回与输入对齐的逐条结果。
+        """
+        if self.current_session_id is None:
+            self.current_session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        specs = []
+        for item in items:
+            spec = {"content": item} if isinstance(item, str) else dict(item)
+            spec.setdefault("memory_type", memory_type)
+            metadata = dict(spec.get("metadata") or {})
+            metadata.setdefault("session_id", self.current_session_id)
+            metadata.setdefault("timestamp", datetime.now().isoformat())
+            spec["metadata"] = metadata
+            specs.append(spec)
+
+        return self.memory_manager.add_memories(specs, auto_classify=False)
+
     def get_context_for_query(self, query: str, limit: int = 3) -> str:
         """为查询获取相关上下文
 
@@ -501,6 +529,10 @@ class MemoryTool(Tool):
 
         return "\n".join(context_parts)
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待写后日志中的记忆全部写入存储"""
+        return self.memory_manager.flush_writes(timeout=timeout)
+
     def clear_session(self):
         """清除当前会话"""
         self.current_session_id = None
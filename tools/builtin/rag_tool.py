@@ -21,12 +21,18 @@ answer = rag.run({"action": "ask", "question": "什么是机器学习？"})
 
 from typing import Dict, Any, List, Optional
 import os
+import threading
 import time
 
 from ..base import Tool, ToolParameter, tool_action
 from memory.rag.pipline import create_rag_pipeline
+from memory.rag.page_index import PageIngestIndex, page_content_hash
 from core.llm import MyAgentsLLM
 
+# 网页入库默认配置
+DEFAULT_WEB_NAMESPACE = "web"
+DEFAULT_WEB_PAGE_TTL = 24 * 3600  # 秒
+
 
 class RAGTool(Tool):
     """RAG工具
@@ -59,6 +65,8 @@ class RAGTool(Tool):
         self.collection_name = collection_name
         self.rag_namespace = rag_namespace
         self._pipelines: Dict[str, Dict[str, Any]] = {}
+        self._page_index: Optional[PageIngestIndex] = None
+        self._web_ingest_lock = threading.Lock()
 
         # 确保知识库目录存在
         os.makedirs(knowledge_base_path, exist_ok=True)
@@ -828,6 +836,88 @@ class RAGTool(Tool):
         except Exception as e:
             return f"❌ 清空所有命名空间失败: {str(e)}"
 
+    # ========================================
+    # 网页流式入库（供 SearchTool 使用）
+    # ========================================
+
+    @property
+    def page_index(self) -> PageIngestIndex:
+        if self._page_index is None:
+            self._page_index = PageIngestIndex(os.path.join(self.knowledge_base_path, "web_pages.db"))
+        return self._page_index
+
+    def ingest_web_page(
+            self,
+            url: str,
+            content: str,
+            namespace: str = DEFAULT_WEB_NAMESPACE,
+            title: Optional[str] = None,
+            ttl: Optional[float] = DEFAULT_WEB_PAGE_TTL,
+            chunk_size: int = 800,
+            chunk_overlap: int = 100
+    ) -> Dict[str, Any]:
+        """将抓取到的网页直接分块、嵌入并写入知识库（不落临时文件）
+
+        同一 URL 内容未变化且未过期时跳过；内容变化时替换旧分块。
+
+        Args:
+            url: 页面 URL
+            content: 页面正文（markdown/纯文本）
+            namespace: 知识库命名空间
+            title: 页面标题
+            ttl: 过期时间（秒），None 表示不过期
+            chunk_size: 分块大小
+            chunk_overlap: 分块重叠大小
+
+        Returns:
+            {"url", "status": added/updated/refreshed/skipped/empty, "chunks"}
+        """
+        if not content or not content.strip():
+            return {"url": url, "status": "empty", "chunks": 0}
+
+        digest = page_content_hash(content)
+        with self._web_ingest_lock:
+            if self.page_index.is_current(namespace, url, digest):
+                return {"url": url, "status": "skipped", "chunks": 0}
+
+            previous = self.page_index.get(namespace, url)
+            if previous and previous["content_hash"] == digest:
+                # 内容未变化但已过期：分块仍在，只需续期
+                self.page_index.upsert(namespace, url, digest, previous["chunk_ids"], title=title, ttl=ttl)
+                return {"url": url, "status": "refreshed", "chunks": 0}
+
+            pipeline = self._get_pipeline(namespace)
+            if previous and previous["chunk_ids"]:
+                pipeline["delete_chunks"](previous["chunk_ids"])
+
+            chunk_ids = pipeline["add_text"](
+                content,
+                source=url,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                metadata={"url": url, "title": title or url, "page_hash": digest},
+                source_label="web"
+            )
+            self.page_index.upsert(namespace, url, digest, chunk_ids, title=title, ttl=ttl)
+
+        return {"url": url, "status": "updated" if previous else "added", "chunks": len(chunk_ids)}
+
+    def expire_web_pages(self, namespace: str = DEFAULT_WEB_NAMESPACE, grace: float = 0.0) -> int:
+        """删除过期超过 grace 秒的网页分块，返回清理的页面数
+
+        作为独立的维护步骤调用：过期但尚未清理的页面再次入库时若内容未变化，只续期不重新嵌入。
+        分块删除成功后才删除索引记录，删除失败时记录保留，下次维护重试。
+        """
+        with self._web_ingest_lock:
+            expired = self.page_index.list_expired(namespace, grace=grace)
+            if not expired:
+                return 0
+            pipeline = self._get_pipeline(namespace)
+            chunk_ids = [cid for record in expired for cid in record["chunk_ids"]]
+            pipeline["delete_chunks"](chunk_ids)
+            self.page_index.delete(namespace, [record["url"] for record in expired])
+        return len(expired)
+
     # ========================================
     # 便捷接口方法（简化用户调用）
     # ========================================
@@ -0,0 +1,395 @@
+"""搜索后端 - 可插拔的搜索引擎接口与并发路由。
+
+- ``SearchBackend``：统一的后端接口，返回标准化的结构化结果
+- ``SearchRouter``：按历史延迟/错误率排序后端，支持三种策略
+    - ``route``：按排序依次尝试，直到结果通过质量检查
+    - ``race``：并发请求所有后端，返回第一个通过质量检查的结果；只能取消尚未开始的请求，
+      已在运行的请求会继续执行到结束（结果被丢弃，但计入统计）
+    - ``merge``：并发请求，在截止时间内合并结果并按 URL 去重
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse, urlunparse
+
+try:
+    from ddgs import DDGS  # type: ignore
+except Exception:  # pragma: no cover - 可选依赖
+    DDGS = None  # type: ignore
+
+try:
+    from serpapi import GoogleSearch  # type: ignore
+except Exception:  # pragma: no cover - 可选依赖
+    GoogleSearch = None  # type: ignore
+
+try:
+    from tavily import TavilyClient  # type: ignore
+except Exception:  # pragma: no cover - 可选依赖
+    TavilyClient = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_STRATEGIES = {"route", "race", "merge"}
+DEFAULT_BACKEND_TIMEOUT = 8.0
+EWMA_ALPHA = 0.2
+ERROR_PENALTY_SECONDS = 5.0  # 错误率折算为延迟惩罚（秒），快速失败的后端不会被优先
+
+
+class SearchBackend(ABC):
+    """搜索后端基类
+
+    子类实现 ``search``，返回形如
+    ``{"results": [{"title", "url", "content"}], "answer": str | None}`` 的字典。
+    """
+
+    name: str = "base"
+
+    def is_available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def search(self, query: str, *, max_results: int) -> Dict[str, Any]:
+        """执行搜索"""
+
+
+class SerpApiBackend(SearchBackend):
+    """SerpApi (Google) 后端"""
+
+    name = "serpapi"
+
+    def __init__(self, api_key: str | None, *, gl: str = "cn", hl: str = "zh-cn") -> None:
+        self.api_key = api_key
+        self.gl = gl
+        self.hl = hl
+
+    def is_available(self) -> bool:
+        return bool(self.api_key) and GoogleSearch is not None
+
+    def search(self, query: str, *, max_results: int) -> Dict[str, Any]:
+        params = {
+            "engine": "google",
+            "q": query,
+            "api_key": self.api_key,
+            "gl": self.gl,
+            "hl": self.hl,
+            "num": max_results,
+        }
+        response = GoogleSearch(params).get_dict()
+        if response.get("error"):
+            raise RuntimeError(f"SerpApi 错误: {response['error']}")
+
+        answer_box = response.get("answer_box") or {}
+        results = [
+            {
+                "title": item.get("title") or item.get("link", ""),
+                "url": item.get("link", ""),
+                "content": item.get("snippet") or "",
+            }
+            for item in response.get("organic_results", [])[:max_results]
+        ]
+        return {"results": results, "answer": answer_box.get("answer") or answer_box.get("snippet")}
+
+
+class DuckDuckGoBackend(SearchBackend):
+    """DuckDuckGo 后端（无需 API Key）"""
+
+    name = "duckduckgo"
+
+    def is_available(self) -> bool:
+        return DDGS is not None
+
+    def search(self, query: str, *, max_results: int) -> Dict[str, Any]:
+        items = DDGS().text(query, max_results=max_results) or []
+        results = [
+            {
+                "title": item.get("title") or item.get("href", ""),
+                "url": item.get("href", ""),
+                "content": item.get("body") or "",
+            }
+            for item in items[:max_results]
+        ]
+        return {"results": results, "answer": None}
+
+
+class TavilyBackend(SearchBackend):
+    """Tavily 后端"""
+
+    name = "tavily"
+
+    def __init__(self, api_key: str | None) -> None:
+        self.api_key = api_key
+        self.client = TavilyClient(api_key=api_key) if api_key and TavilyClient is not None else None
+
+    def is_available(self) -> bool:
+        return self.client is not None
+
+    def search(self, query: str, *, max_results: int) -> Dict[str, Any]:
+        response = self.client.search(query, max_results=max_results, include_answer=True)
+        results = [
+            {
+                "title": item.get("title") or item.get("url", ""),
+                "url": item.get("url", ""),
+                "content": item.get("content") or "",
+            }
+            for item in response.get("results", [])[:max_results]
+        ]
+        return {"results": results, "answer": response.get("answer")}
+
+
+class BackendStats:
+    """后端的指数加权延迟与错误率"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+
+    def record(self, latency: float, error: bool) -> None:
+        self.calls += 1
+        if error:
+            self.errors += 1
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+        self.ewma_error = EWMA_ALPHA * (1.0 if error else 0.0) + (1 - EWMA_ALPHA) * self.ewma_error
+
+    def score(self) -> Optional[float]:
+        """越小越优先；未使用过的后端返回 None，由路由按中性先验排序"""
+        if self.ewma_latency is None:
+            return None
+        return self.ewma_latency + ERROR_PENALTY_SECONDS * self.ewma_error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "ewma_latency": self.ewma_latency,
+            "ewma_error_rate": self.ewma_error,
+            "score": self.score(),
+        }
+
+
+def _normalize_url(url: str) -> str:
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse(("", netloc, path, "", parsed.query, ""))
+
+
+def merge_results(payloads: Iterable[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+    """按排名交错合并多个后端的结果，并按 URL 去重"""
+    ranked = [list(payload.get("results") or []) for payload in payloads]
+    merged: List[Dict[str, Any]] = []
+    seen: set[str] = set()
+    depth = max((len(items) for items in ranked), default=0)
+    for rank in range(depth):
+        for items in ranked:
+            if rank >= len(items):
+                continue
+            item = items[rank]
+            key = _normalize_url(item.get("url") or "")
+            if not item.get("url") or key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+            if len(merged) >= max_results:
+                return merged
+    return merged
+
+
+class SearchRouter:
+    """多后端搜索路由"""
+
+    def __init__(
+        self,
+        backends: Iterable[SearchBackend],
+        *,
+        timeout: float = DEFAULT_BACKEND_TIMEOUT,
+        min_results: int = 1,
+        max_workers: int | None = None,
+    ) -> None:
+        self.backends: Dict[str, SearchBackend] = {
+            backend.name: backend for backend in backends if backend.is_available()
+        }
+        self.timeout = timeout
+        self.min_results = min_results
+        self._stats: Dict[str, BackendStats] = {name: BackendStats() for name in self.backends}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(2, len(self.backends) * 2),
+            thread_name_prefix="search-backend",
+        )
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.backends)
+
+    def ordered(self, names: Iterable[str] | None = None) -> List[str]:
+        """按路由得分排序（延迟低、错误少的优先）
+
+        未使用过的后端取已知得分的均值作为中性先验，得分相同时保持配置顺序；
+        全部未使用时即为配置顺序，不会因为首个后端有了统计就被排到未试过的后端之后。
+        """
+        candidates = [n for n in (names or self.backends) if n in self.backends]
+        with self._lock:
+            scores = {n: self._stats[n].score() for n in candidates}
+        known = [score for score in scores.values() if score is not None]
+        prior = sum(known) / len(known) if known else 0.0
+        position = {n: i for i, n in enumerate(candidates)}
+        return sorted(
+            candidates,
+            key=lambda n: (prior if scores[n] is None else scores[n], position[n]),
+        )
+
+    def passes_quality(self, payload: Dict[str, Any] | None) -> bool:
+        if not payload:
+            return False
+        usable = [
+            item for item in payload.get("results") or []
+            if item.get("url") and (item.get("title") or item.get("content"))
+        ]
+        return len(usable) >= self.min_results or bool(payload.get("answer"))
+
+    def _call(self, name: str, query: str, max_results: int) -> Dict[str, Any]:
+        start = time.perf_counter()
+        error = False
+        try:
+            payload = self.backends[name].search(query, max_results=max_results)
+            payload["backend"] = name
+            return payload
+        except Exception:
+            error = True
+            raise
+        finally:
+            with self._lock:
+                self._stats[name].record(time.perf_counter() - start, error)
+
+    def search(
+        self,
+        query: str,
+        *,
+        max_results: int,
+        strategy: str = "route",
+        backends: Iterable[str] | None = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """执行搜索
+
+        Args:
+            query: 查询
+            max_results: 最大结果数
+            strategy: route / race / merge
+            backends: 限定使用的后端名称（默认全部可用后端）
+            timeout: 并发策略的整体截止时间（秒）
+
+        Returns:
+            结构化结果，包含 results / answer / notices / backend
+        """
+        order = self.ordered(backends)
+        if not order:
+            raise RuntimeError("没有可用的搜索后端")
+        if strategy not in SUPPORTED_STRATEGIES:
+            strategy = "route"
+
+        if strategy == "route" or len(order) == 1:
+            return self._route(order, query, max_results)
+        return self._fan_out(order, query, max_results, strategy, timeout or self.timeout)
+
+    def _route(self, order: List[str], query: str, max_results: int) -> Dict[str, Any]:
+        notices: List[str] = []
+        fallback: Dict[str, Any] | None = None
+        for name in order:
+            try:
+                payload = self._call(name, query, max_results)
+            except Exception as exc:
+                logger.warning("Search backend %s failed: %s", name, exc)
+                notices.append(f"{name} 搜索失败：{exc}")
+                continue
+            if self.passes_quality(payload):
+                payload["notices"] = notices + list(payload.get("notices") or [])
+                return payload
+            fallback = fallback or payload
+            notices.append(f"{name} 未返回有效结果")
+
+        if fallback is None:
+            raise RuntimeError("所有搜索后端均失败：" + "；".join(notices))
+        fallback["notices"] = notices
+        return fallback
+
+    def _fan_out(
+        self,
+        order: List[str],
+        query: str,
+        max_results: int,
+        strategy: str,
+        timeout: float,
+    ) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout
+        pending: Dict[Future, str] = {
+            self._executor.submit(self._call, name, query, max_results): name for name in order
+        }
+        collected: Dict[str, Dict[str, Any]] = {}
+        notices: List[str] = []
+        winner: Dict[str, Any] | None = None
+
+        while pending and winner is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    payload = future.result()
+                except Exception as exc:
+                    logger.warning("Search backend %s failed: %s", name, exc)
+                    notices.append(f"{name} 搜索失败：{exc}")
+                    continue
+                collected[name] = payload
+                if strategy == "race" and self.passes_quality(payload):
+                    winner = payload
+                    break
+
+        # 只能取消尚未开始的请求：已在运行的请求无法中断，会在后台执行完毕，结果被忽略但仍计入统计
+        for future, name in pending.items():
+            future.cancel()
+            if winner is None and strategy == "race":
+                notices.append(f"{name} 超时未返回")
+
+        if winner is not None:
+            winner["notices"] = notices + list(winner.get("notices") or [])
+            return winner
+
+        if not collected:
+            raise RuntimeError("所有搜索后端均失败或超时：" + "；".join(notices))
+
+        ranked = [collected[name] for name in order if name in collected]
+        if strategy == "race":
+            best = max(ranked, key=lambda p: len(p.get("results") or []))
+            best["notices"] = notices + list(best.get("notices") or [])
+            return best
+
+        answer = next((p.get("answer") for p in ranked if p.get("answer")), None)
+        return {
+            "results": merge_results(ranked, max_results),
+            "answer": answer,
+            "notices": notices,
+            "backend": "+".join(name for name in order if name in collected),
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,314 @@
+"""搜索结果缓存 - SQLite 持久化，支持 TTL 与 stale-while-revalidate。
+
+- 结果缓存：以规范化查询 + 参数的 SHA-256 为键
+- 过期策略：TTL 内直接命中；超过 TTL 但在 stale 窗口内先返回旧结果，再后台刷新
+- 页面正文：抓取到的完整正文按内容哈希去重存储，经 URL 映射在不同查询之间复用；
+  结果中截断后的 raw_content 直接保存在结果里，不进入正文表
+- 标记为 partial 的结果（如部分页面抓取失败）不写入缓存
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "./search_cache/search_cache.db"
+DEFAULT_RESULT_TTL = 6 * 3600  # 结果新鲜期（秒）
+DEFAULT_STALE_TTL = 24 * 3600  # 过期后仍可返回旧结果的窗口（秒）
+DEFAULT_PAGE_TTL = 7 * 24 * 3600  # 页面正文复用期（秒）
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：全角转半角、小写、合并空白、去掉首尾标点"""
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text.strip(" ?？!！。.,，;；")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """搜索结果与页面正文的 SQLite 缓存（线程安全）"""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_CACHE_PATH,
+        *,
+        ttl: float = DEFAULT_RESULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        page_ttl: float = DEFAULT_PAGE_TTL,
+        refresh_workers: int = 2,
+    ) -> None:
+        self.db_path = db_path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.page_ttl = page_ttl
+        self.local = threading.local()
+
+        self._inflight: set[str] = set()
+        self._inflight_lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(
+            max_workers=max(1, refresh_workers), thread_name_prefix="search-cache-refresh"
+        )
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "page_hits": 0}
+        self._stats_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._init_database()
+
+    # ------------------------------------------------------------------
+    # SQLite
+    # ------------------------------------------------------------------
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取线程本地连接"""
+        if not hasattr(self.local, "connection"):
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = conn
+        return self.local.connection
+
+    def _init_database(self) -> None:
+        conn = self._get_connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS search_results (
+                cache_key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                params TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS page_bodies (
+                content_hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS page_urls (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_search_results_created ON search_results (created_at);
+            CREATE INDEX IF NOT EXISTS idx_page_urls_hash ON page_urls (content_hash);
+        """)
+        conn.commit()
+
+    # ------------------------------------------------------------------
+    # 结果缓存
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(query: str, params: Dict[str, Any]) -> str:
+        material = json.dumps(
+            {"q": normalize_query(query), "params": params},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """读取缓存
+
+        Returns:
+            (payload, status)，status 为 "fresh" / "stale" / "miss"
+        """
+        row = self._get_connection().execute(
+            "SELECT payload, created_at FROM search_results WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, "miss"
+
+        age = time.time() - row["created_at"]
+        if age > self.ttl + self.stale_ttl:
+            return None, "miss"
+
+        return json.loads(row["payload"]), ("fresh" if age <= self.ttl else "stale")
+
+    def put(self, key: str, query: str, params: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        conn = self._get_connection()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO search_results (cache_key, query, params, payload, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                key,
+                query,
+                json.dumps(params, ensure_ascii=False, sort_keys=True, default=str),
+                json.dumps(payload, ensure_ascii=False, default=str),
+                time.time(),
+            ),
+        )
+        conn.commit()
+
+    def get_or_fetch(
+        self,
+        query: str,
+        params: Dict[str, Any],
+        fetch: Callable[[], Dict[str, Any]],
+        *,
+        refresh: Optional[Callable[[], Dict[str, Any]]] = None,
+    ) -> Tuple[Dict[str, Any], str]:
+        """命中则返回缓存，过期则返回旧结果并后台刷新，未命中则同步抓取
+
+        Args:
+            refresh: 后台刷新使用的抓取函数，默认与 fetch 相同
+
+        Returns:
+            (payload, status)，status 为 "fresh" / "stale" / "miss"
+        """
+        key = self.make_key(query, params)
+        try:
+            payload, status = self.get(key)
+        except Exception as exc:  # pragma: no cover - 缓存损坏时直接回源
+            logger.warning("Search cache read failed: %s", exc)
+            payload, status = None, "miss"
+
+        if payload is not None:
+            self._bump("hits" if status == "fresh" else "stale_hits")
+            if status == "stale":
+                self._schedule_refresh(key, query, params, refresh or fetch)
+            return payload, status
+
+        self._bump("misses")
+        payload = fetch()
+        self._safe_put(key, query, params, payload)
+        return payload, "miss"
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        query: str,
+        params: Dict[str, Any],
+        fetch: Callable[[], Dict[str, Any]],
+    ) -> None:
+        with self._inflight_lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+
+        def refresh() -> None:
+            try:
+                self._safe_put(key, query, params, fetch())
+                self._bump("refreshes")
+            except Exception as exc:  # pragma: no cover - 后台刷新失败保留旧结果
+                logger.debug("Background refresh failed for %r: %s", query, exc)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.discard(key)
+
+        self._refresh_pool.submit(refresh)
+
+    def _safe_put(self, key: str, query: str, params: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        if payload.get("partial"):
+            logger.debug("Skip caching partial result for %r", query)
+            return
+        try:
+            self.put(key, query, params, payload)
+        except Exception as exc:  # pragma: no cover - 缓存写入失败不影响搜索
+            logger.warning("Search cache write failed: %s", exc)
+
+    # ------------------------------------------------------------------
+    # 页面正文（内容寻址）
+    # ------------------------------------------------------------------
+    def _store_body(self, conn: sqlite3.Connection, content: str) -> str:
+        digest = content_hash(content)
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO page_bodies (content_hash, content, size, created_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            (digest, content, len(content), time.time()),
+        )
+        return digest
+
+    def get_page(self, url: str) -> Optional[str]:
+        """按 URL 读取页面正文（超过 page_ttl 视为未命中）"""
+        row = self._get_connection().execute(
+            """
+            SELECT b.content FROM page_urls u
+            JOIN page_bodies b ON b.content_hash = u.content_hash
+            WHERE u.url = ? AND u.fetched_at >= ?
+            """,
+            (url, time.time() - self.page_ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        self._bump("page_hits")
+        return row["content"]
+
+    def put_page(self, url: str, content: str) -> str:
+        """保存页面正文，返回内容哈希"""
+        conn = self._get_connection()
+        digest = self._store_body(conn, content)
+        conn.execute(
+            "INSERT OR REPLACE INTO page_urls (url, content_hash, fetched_at) VALUES (?, ?, ?)",
+            (url, digest, time.time()),
+        )
+        conn.commit()
+        return digest
+
+    # ------------------------------------------------------------------
+    # 维护
+    # ------------------------------------------------------------------
+    def purge_expired(self) -> Dict[str, int]:
+        """删除过期结果、过期 URL 映射以及不再被任何 URL 引用的页面正文（全部在 SQL 中完成）"""
+        now = time.time()
+        conn = self._get_connection()
+        results = conn.execute(
+            "DELETE FROM search_results WHERE created_at < ?",
+            (now - self.ttl - self.stale_ttl,),
+        ).rowcount
+        urls = conn.execute(
+            "DELETE FROM page_urls WHERE fetched_at < ?", (now - self.page_ttl,)
+        ).rowcount
+        bodies = conn.execute(
+            """
+            DELETE FROM page_bodies
+            WHERE NOT EXISTS (SELECT 1 FROM page_urls u WHERE u.content_hash = page_bodies.content_hash)
+            """
+        ).rowcount
+        conn.commit()
+        return {"results": results, "urls": urls, "bodies": bodies}
+
+    def clear(self) -> None:
+        conn = self._get_connection()
+        conn.executescript("DELETE FROM search_results; DELETE FROM page_urls; DELETE FROM page_bodies;")
+        conn.commit()
+
+    def _bump(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._get_connection()
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["cached_results"] = conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        stats["cached_pages"] = conn.execute("SELECT COUNT(*) FROM page_urls").fetchone()[0]
+        stats["page_bodies"] = conn.execute("SELECT COUNT(*) FROM page_bodies").fetchone()[0]
+        stats["db_path"] = self.db_path
+        return stats
+
+    def close(self) -> None:
+        self._refresh_pool.shutdown(wait=False, cancel_futures=True)
+        if hasattr(self.local, "connection"):
+            self.local.connection.close()
+            del self.local.connection
@@ -4,33 +4,65 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Dict, Iterable, List
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from ..base import Tool, ToolParameter
+from .search_backends import (
+    DEFAULT_BACKEND_TIMEOUT,
+    SUPPORTED_STRATEGIES,
+    DuckDuckGoBackend,
+    SearchBackend,
+    SearchRouter,
+    SerpApiBackend,
+    TavilyBackend,
+)
+from .search_cache import DEFAULT_CACHE_PATH, SearchCache
+
+if TYPE_CHECKING:  # pragma: no cover - 仅用于类型标注，避免导入 RAG 依赖
+    from .rag_tool import RAGTool
 
 try:  # 可选依赖，缺失时降级能力
     from markdownify import markdownify
 except Exception:  # pragma: no cover - 可选依赖
     markdownify = None  # type: ignore
 
-try:
-    from ddgs import DDGS  # type: ignore
-except Exception:  # pragma: no cover - 可选依赖
-    DDGS = None  # type: ignore
-
-try:
-    from serpapi import GoogleSearch  # type: ignore
-except Exception:  # pragma: no cover - 可选依赖
-    GoogleSearch = None  # type: ignore
-
 logger = logging.getLogger(__name__)
 
 CHARS_PER_TOKEN = 4
 DEFAULT_MAX_RESULTS = 5
+DEFAULT_GL = "cn"
+DEFAULT_HL = "zh-cn"
 SUPPORTED_RETURN_MODES = {"text", "structured", "json", "dict"}
 
+# 全文抓取配置
+DEFAULT_FULL_PAGE_TOP_N = 3
+DEFAULT_FETCH_TIMEOUT = 10.0  # 单页截止时间（秒），包含连接、下载与转换
+DEFAULT_FETCH_BUDGET = 30.0  # 一次批量抓取的总时间预算（秒），单页截止时间不超过该预算
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_CONVERT_WORKERS = 4
+DEFAULT_MAX_PAGE_BYTES = 2 * 1024 * 1024
+FETCH_CHUNK_SIZE = 16 * 1024
+FETCH_USER_AGENT = "Mozilla/5.0 (compatible; MyAgentsSearch/1.0)"
+FETCHABLE_CONTENT_TYPES = ("text/html", "text/plain", "application/xhtml+xml", "text/markdown")
+
+# 搜索结果入库（RAG）配置
+DEFAULT_RAG_NAMESPACE = "web"
+DEFAULT_RAG_TTL = 24 * 3600  # 秒
+DEFAULT_INGEST_WAIT = 0.0  # 搜索返回前等待入库的时间（秒），默认不等待，入库在后台完成
+MAX_TRACKED_INGESTS = 32  # 保留可查询入库进度的最近批次数
+DEFAULT_RAG_EXPIRE_INTERVAL = 3600.0  # 过期网页清理的最小间隔（秒）
+DEFAULT_RAG_EXPIRE_GRACE = 24 * 3600.0  # 过期超过该时长才清理，期间再次搜到的未变化页面只续期（秒）
+
 
 def _limit_text(text: str, token_limit: int) -> str:
     char_limit = token_limit * CHARS_PER_TOKEN
@@ -39,20 +71,288 @@ def _limit_text(text: str, token_limit: int) -> str:
     return text[:char_limit] + "... [truncated]"
 
 
-def _fetch_raw_content(url: str) -> str | None:
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-    except Exception as exc:  # pragma: no cover - 网络环境不稳定
-        logger.debug("Failed to fetch raw content for %s: %s", url, exc)
-        return None
-
+def _html_to_markdown(url: str, html: str) -> str:
     if markdownify is not None:
         try:
-            return markdownify(response.text)  # type: ignore[arg-type]
+            return markdownify(html)  # type: ignore[arg-type]
         except Exception as exc:  # pragma: no cover - 可选依赖失败
             logger.debug("markdownify failed for %s: %s", url, exc)
-    return response.text
+    return html
+
+
+class PageFetcher:
+    """并发网页抓取器。
+
+    - 共享 ``requests.Session`` 连接池，复用 TCP/TLS 连接
+    - 每个主机的并发请求数受限，避免对同一站点突发请求
+    - 每个请求从开始执行起有独立截止时间（受批量总预算约束），慢主机不会耗尽其它页面的时间；
+      流式下载并在超过大小上限时截断
+    - HTML → Markdown 转换在独立的工作线程池中执行，慢页面不会阻塞其它页面
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int = DEFAULT_FETCH_WORKERS,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        timeout: float = DEFAULT_FETCH_TIMEOUT,
+        total_timeout: float = DEFAULT_FETCH_BUDGET,
+        max_bytes: int = DEFAULT_MAX_PAGE_BYTES,
+        convert_workers: int = DEFAULT_CONVERT_WORKERS,
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.per_host_limit,
+            pool_block=False,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": FETCH_USER_AGENT})
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="search-fetch"
+        )
+        self._convert_pool = ThreadPoolExecutor(
+            max_workers=max(1, convert_workers), thread_name_prefix="search-convert"
+        )
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def fetch_html(self, url: str, deadline: float) -> str | None:
+        """在截止时间内流式下载页面，超过大小上限时截断。"""
+        slot = self._host_slot(url)
+        if not slot.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            logger.debug("Fetch slot timeout for %s", url)
+            return None
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self.session.get(url, timeout=(min(remaining, 5.0), remaining), stream=True) as response:
+                response.raise_for_status()
+                content_type = (response.headers.get("Content-Type") or "").lower()
+                if content_type and not content_type.startswith(FETCHABLE_CONTENT_TYPES):
+                    logger.debug("Skip non-text content for %s: %s", url, content_type)
+                    return None
+
+                declared = response.headers.get("Content-Length")
+                if declared and declared.isdigit() and int(declared) > self.max_bytes * 4:
+                    logger.debug("Skip oversized page %s (%s bytes)", url, declared)
+                    return None
+
+                chunks: List[bytes] = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        break
+                    if time.monotonic() >= deadline:
+                        logger.debug("Fetch deadline reached for %s after %d bytes", url, size)
+                        break
+
+                body = b"".join(chunks)[: self.max_bytes]
+                encoding = response.encoding or "utf-8"
+                return body.decode(encoding, errors="replace")
+        except Exception as exc:  # pragma: no cover - 网络环境不稳定
+            logger.debug("Failed to fetch raw content for %s: %s", url, exc)
+            return None
+        finally:
+            slot.release()
+
+    def _fetch_with_deadline(
+        self, url: str, timeout: float, budget_deadline: float, deadlines: Dict[str, float]
+    ) -> str | None:
+        """单页截止时间从该请求真正开始执行时计算，并且不超过批量总预算。"""
+        deadline = min(time.monotonic() + timeout, budget_deadline)
+        deadlines[url] = deadline
+        return self.fetch_html(url, deadline)
+
+    def fetch_many(
+        self,
+        urls: Iterable[str],
+        *,
+        timeout: float | None = None,
+        total_timeout: float | None = None,
+        on_page: Callable[[str, str], None] | None = None,
+    ) -> Dict[str, str]:
+        """并发抓取多个页面并转换为 Markdown。
+
+        Args:
+            urls: 页面 URL 列表（重复或空 URL 会被忽略）
+            timeout: 单页截止时间（秒，包含下载与转换），默认使用实例配置
+            total_timeout: 整批的总时间预算（秒），默认使用实例配置
+            on_page: 每个页面转换完成后立即回调 ``on_page(url, markdown)``
+
+        Returns:
+            url -> markdown，只包含在各自截止时间内成功完成的页面
+        """
+        unique_urls = list(dict.fromkeys(u for u in urls if u))
+        if not unique_urls:
+            return {}
+
+        page_timeout = timeout if timeout is not None else self.timeout
+        budget = total_timeout if total_timeout is not None else self.total_timeout
+        budget_deadline = time.monotonic() + max(budget, page_timeout)
+        deadlines: Dict[str, float] = {}
+        pending: Dict[Future, tuple[str, str]] = {
+            self._fetch_pool.submit(
+                self._fetch_with_deadline, url, page_timeout, budget_deadline, deadlines
+            ): ("fetch", url)
+            for url in unique_urls
+        }
+        pages: Dict[str, str] = {}
+
+        while pending:
+            now = time.monotonic()
+            # 转换阶段沿用所属页面的截止时间：超时的转换直接放弃
+            for future, (stage, url) in list(pending.items()):
+                if stage == "convert" and not future.done() and now >= deadlines.get(url, budget_deadline):
+                    future.cancel()
+                    pending.pop(future)
+            if not pending:
+                break
+            remaining = budget_deadline - now
+            if remaining <= 0:
+                break
+            converting = [deadlines.get(url, budget_deadline) for stage, url in pending.values() if stage == "convert"]
+            if converting:
+                remaining = min(remaining, max(0.0, min(converting) - now))
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, url = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:  # pragma: no cover - 防御性处理
+                    logger.debug("Page %s failed at %s stage: %s", url, stage, exc)
+                    continue
+                if not value:
+                    continue
+                if stage == "fetch":
+                    convert = self._convert_pool.submit(_html_to_markdown, url, value)
+                    pending[convert] = ("convert", url)
+                else:
+                    pages[url] = value
+                    if on_page is not None:
+                        try:
+                            on_page(url, value)
+                        except Exception as exc:  # pragma: no cover - 回调失败不影响抓取
+                            logger.debug("on_page callback failed for %s: %s", url, exc)
+
+        for future in pending:
+            future.cancel()
+        return pages
+
+    def close(self) -> None:
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._convert_pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_default_fetcher: PageFetcher | None = None
+_default_fetcher_lock = threading.Lock()
+
+
+def _get_default_fetcher() -> PageFetcher:
+    global _default_fetcher
+    if _default_fetcher is None:
+        with _default_fetcher_lock:
+            if _default_fetcher is None:
+                _default_fetcher = PageFetcher()
+    return _default_fetcher
+
+
+def _fetch_raw_content(url: str) -> str | None:
+    fetcher = _get_default_fetcher()
+    html = fetcher.fetch_html(url, time.monotonic() + fetcher.timeout)
+    if html is None:
+        return None
+    return _html_to_markdown(url, html)
+
+
+class _RagIngestBatch:
+    """一次搜索的网页入库批次：页面到达即提交，入库在后台线程串行执行"""
+
+    def __init__(
+        self,
+        rag_tool: "RAGTool",
+        pool: ThreadPoolExecutor,
+        *,
+        namespace: str,
+        ttl: float | None,
+    ) -> None:
+        self.rag_tool = rag_tool
+        self.pool = pool
+        self.namespace = namespace
+        self.ttl = ttl
+        self.batch_id = uuid.uuid4().hex
+        self.submitted: set[str] = set()
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def submit(self, url: str, title: str | None, content: str | None) -> None:
+        if not url or not content:
+            return
+        with self._lock:
+            if url in self.submitted:
+                return
+            self.submitted.add(url)
+            self._futures.append(
+                self.pool.submit(
+                    self.rag_tool.ingest_web_page,
+                    url,
+                    content,
+                    namespace=self.namespace,
+                    title=title,
+                    ttl=self.ttl,
+                )
+            )
+
+    def wait(self, timeout: float) -> Dict[str, Any]:
+        with self._lock:
+            futures = list(self._futures)
+        done, not_done = wait(futures, timeout=timeout)
+
+        summary: Dict[str, Any] = {"namespace": self.namespace, "pending": len(not_done), "failed": 0, "chunks": 0}
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as exc:
+                logger.warning("RAG ingestion failed: %s", exc)
+                summary["failed"] += 1
+                continue
+            if isinstance(result, dict):
+                status = result.get("status", "unknown")
+                summary[status] = summary.get(status, 0) + 1
+                summary["chunks"] += int(result.get("chunks", 0))
+        return summary
+
+
+def _as_bool(value: Any, default: bool) -> bool:
+    """解析布尔参数，兼容 "true" / "false" 等字符串"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
 
 
 def _normalized_result(
@@ -94,17 +394,52 @@ class SearchTool(Tool):
         tavily_key: str | None = None,
         serpapi_key: str | None = None,
         perplexity_key: str | None = None,
+        fetcher: PageFetcher | None = None,
+        cache: SearchCache | None = None,
+        use_cache: bool = False,
+        cache_path: str | None = None,
+        gl: str = DEFAULT_GL,
+        hl: str = DEFAULT_HL,
+        backends: List[SearchBackend] | None = None,
+        strategy: str = "route",
+        backend_timeout: float = DEFAULT_BACKEND_TIMEOUT,
+        rag_tool: "RAGTool | None" = None,
+        rag_namespace: str = DEFAULT_RAG_NAMESPACE,
+        rag_ttl: float | None = DEFAULT_RAG_TTL,
     ) -> None:
         super().__init__(
             name="search",
             description=(
-                "智能网页搜索引擎，支持 SerpApi，可返回结构化或文本化的搜索结果。"
+                "智能网页搜索引擎，支持 SerpApi / Tavily / DuckDuckGo 多后端，"
+                "可返回结构化或文本化的搜索结果。"
             ),
         )
         self.serpapi_key = serpapi_key or os.getenv("SERPAPI_API_KEY")
+        self.tavily_key = tavily_key or os.getenv("TAVILY_API_KEY")
 
         self.available_backends: list[str] = []
         self.tavily_client = None
+        self.strategy = strategy if strategy in SUPPORTED_STRATEGIES else "route"
+        self.backend_timeout = backend_timeout
+        self._custom_backends = backends
+        self.router: SearchRouter | None = None
+        self.rag_tool = rag_tool
+        self.rag_namespace = rag_namespace
+        self.rag_ttl = rag_ttl
+        self._ingest_pool: ThreadPoolExecutor | None = None
+        self._ingest_batches: "OrderedDict[str, _RagIngestBatch]" = OrderedDict()
+        self._ingest_lock = threading.Lock()
+        self._last_rag_expire: Dict[str, float] = {}
+        self._fetcher = fetcher
+        self.gl = gl
+        self.hl = hl
+        self.cache = cache
+        if self.cache is None and use_cache:
+            cache_path = cache_path or os.getenv("SEARCH_CACHE_PATH") or DEFAULT_CACHE_PATH
+            try:
+                self.cache = SearchCache(cache_path)
+            except Exception as exc:  # pragma: no cover - 缓存不可用时直接回源
+                logger.warning("搜索缓存初始化失败，已禁用缓存: %s", exc)
         self._setup_backends()
 
     # ------------------------------------------------------------------
@@ -123,10 +458,18 @@ class SearchTool(Tool):
         if mode not in SUPPORTED_RETURN_MODES:
             mode = "text"
 
-        fetch_full_page = bool(parameters.get("fetch_full_page", False))
+        ingest_to_rag = _as_bool(parameters.get("ingest_to_rag"), False)
+        fetch_full_page = _as_bool(parameters.get("fetch_full_page"), False) or ingest_to_rag
         max_results = int(parameters.get("max_results", DEFAULT_MAX_RESULTS))
         max_tokens = int(parameters.get("max_tokens_per_source", 2000))
         loop_count = int(parameters.get("loop_count", 0))
+        full_page_top_n = int(parameters.get("full_page_top_n", DEFAULT_FULL_PAGE_TOP_N))
+        fetch_timeout = float(parameters.get("fetch_timeout", DEFAULT_FETCH_TIMEOUT))
+        use_cache = _as_bool(parameters.get("use_cache"), True)
+        strategy = str(parameters.get("strategy") or self.strategy).lower()
+        backend = parameters.get("backend")
+        backends = [backend] if isinstance(backend, str) and backend else backend
+        ingest_wait = float(parameters.get("ingest_wait", DEFAULT_INGEST_WAIT))
 
         payload = self._structured_search(
             query=query,
@@ -134,6 +477,14 @@ class SearchTool(Tool):
             max_results=max_results,
             max_tokens=max_tokens,
             loop_count=loop_count,
+            full_page_top_n=full_page_top_n,
+            fetch_timeout=fetch_timeout,
+            use_cache=use_cache,
+            strategy=strategy,
+            backends=backends,
+            ingest_to_rag=ingest_to_rag,
+            rag_namespace=parameters.get("rag_namespace") or self.rag_namespace,
+            ingest_wait=ingest_wait,
         )
 
         if mode in {"structured", "json", "dict"}:
@@ -152,14 +503,34 @@ class SearchTool(Tool):
         ]
 
     def _setup_backends(self) -> None:
-        if self.serpapi_key:
-            if GoogleSearch is not None:
-                self.available_backends.append("serpapi")
-                print("✅ SerpApi 搜索引擎已初始化")
-            else:
+        if self._custom_backends is not None:
+            candidates = list(self._custom_backends)
+        else:
+            candidates = [
+                SerpApiBackend(self.serpapi_key, gl=self.gl, hl=self.hl),
+                TavilyBackend(self.tavily_key),
+                DuckDuckGoBackend(),
+            ]
+            if not self.serpapi_key:
+                print("⚠️ SERPAPI_API_KEY 未设置")
+            elif not candidates[0].is_available():
                 print("⚠️ 未安装 google-search-results，无法使用 SerpApi 搜索")
+            if self.tavily_key and not candidates[1].is_available():
+                print("⚠️ 未安装 tavily-python，无法使用 Tavily 搜索")
+
+        self.router = SearchRouter(candidates, timeout=self.backend_timeout)
+        self.available_backends = self.router.names
+        tavily = self.router.backends.get("tavily")
+        self.tavily_client = getattr(tavily, "client", None)
+
+        if self.available_backends:
+            print(f"✅ 搜索后端已初始化: {', '.join(self.available_backends)}")
         else:
-            print("⚠️ SERPAPI_API_KEY 未设置")
+            print("⚠️ 没有可用的搜索后端")
+
+    def get_backend_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各搜索后端的延迟与错误率统计"""
+        return self.router.get_stats() if self.router else {}
 
     def _structured_search(
         self,
@@ -169,63 +540,280 @@ class SearchTool(Tool):
         max_results: int,
         max_tokens: int,
         loop_count: int,
+        full_page_top_n: int = DEFAULT_FULL_PAGE_TOP_N,
+        fetch_timeout: float = DEFAULT_FETCH_TIMEOUT,
+        use_cache: bool = True,
+        strategy: str | None = None,
+        backends: List[str] | None = None,
+        ingest_to_rag: bool = False,
+        rag_namespace: str | None = None,
+        ingest_wait: float = DEFAULT_INGEST_WAIT,
     ) -> Dict[str, Any]:
-         return self._search_serpapi(
+        strategy = strategy or self.strategy
+        ingest = self._start_ingest(rag_namespace) if ingest_to_rag else None
+        on_page = ingest.submit if ingest is not None else None
+
+        def fetch(stream: Callable[[str, str | None, str], None] | None = None) -> Dict[str, Any]:
+            payload = self._search_backends(
                 query=query,
                 fetch_full_page=fetch_full_page,
                 max_results=max_results,
                 max_tokens=max_tokens,
+                strategy=strategy,
+                backends=backends,
             )
+            if fetch_full_page:
+                self._attach_full_pages(
+                    payload,
+                    top_n=full_page_top_n,
+                    max_tokens=max_tokens,
+                    timeout=fetch_timeout,
+                    on_page=stream,
+                )
+            return payload
 
-    def _search_serpapi(
+        if self.cache is None or not use_cache:
+            payload = fetch(on_page)
+        else:
+            # 后台刷新可能晚于本次入库批次结束，因此刷新时不回调 on_page
+            payload = self._cached_search(
+                query,
+                lambda: fetch(on_page),
+                refresh=fetch,
+                max_results=max_results,
+                fetch_full_page=fetch_full_page,
+                full_page_top_n=full_page_top_n,
+                max_tokens=max_tokens,
+                strategy=strategy,
+                backends=backends,
+            )
+
+        if ingest is not None:
+            self._finish_ingest(ingest, payload, top_n=full_page_top_n, wait_timeout=ingest_wait)
+        return payload
+
+    def _cached_search(
         self,
-        *,
         query: str,
-        fetch_full_page: bool,
+        fetch: Callable[[], Dict[str, Any]],
+        *,
+        refresh: Callable[[], Dict[str, Any]] | None = None,
         max_results: int,
+        fetch_full_page: bool,
+        full_page_top_n: int,
         max_tokens: int,
+        strategy: str,
+        backends: List[str] | None,
     ) -> Dict[str, Any]:
-        if not self.serpapi_key:
-            raise RuntimeError("SERPAPI_API_KEY 未配置，无法使用 SerpApi 搜索")
-        if GoogleSearch is None:
-            raise RuntimeError("未安装 google-search-results，无法使用 SerpApi")
-
-        params = {
-            "engine": "google",
-            "q": query,
-            "api_key": self.serpapi_key,
-            "gl": "cn",
-            "hl": "zh-cn",
-            "num": max_results,
+
+        cache_params = {
+            "max_results": max_results,
+            "gl": self.gl,
+            "hl": self.hl,
+            "fetch_full_page": fetch_full_page,
+            "strategy": strategy,
+            "backends": sorted(backends) if backends else None,
         }
+        if fetch_full_page:
+            cache_params["full_page_top_n"] = full_page_top_n
+            cache_params["max_tokens_per_source"] = max_tokens
+
+        payload, status = self.cache.get_or_fetch(query, cache_params, fetch, refresh=refresh)
+        payload["cache_status"] = status
+        return payload
+
+    @property
+    def fetcher(self) -> PageFetcher:
+        if self._fetcher is None:
+            self._fetcher = _get_default_fetcher()
+        return self._fetcher
+
+    def _attach_full_pages(
+        self,
+        payload: Dict[str, Any],
+        *,
+        top_n: int,
+        max_tokens: int,
+        timeout: float,
+        on_page: Callable[[str, str | None, str], None] | None = None,
+    ) -> None:
+        """并发抓取前 N 条结果的全文，替换为截断后的 raw_content。
 
-        response = GoogleSearch(params).get_dict()
+        ``on_page(url, title, markdown)`` 在每个页面可用时立即回调（用于流式入库）。
+        """
+        results = payload.get("results") or []
+        targets = [item for item in results[: max(0, top_n)] if item.get("url")]
+        if not targets:
+            return
+
+        titles = {item["url"]: item.get("title") for item in targets}
+        stream = None
+        if on_page is not None:
+            def stream(url: str, page: str) -> None:
+                on_page(url, titles.get(url), page)
+
+        pages: Dict[str, str] = {}
+        if self.cache is not None:
+            for item in targets:
+                cached = self.cache.get_page(item["url"])
+                if cached:
+                    pages[item["url"]] = cached
+                    if stream is not None:
+                        stream(item["url"], cached)
+
+        to_fetch = [item["url"] for item in targets if item["url"] not in pages]
+        fetched = self.fetcher.fetch_many(to_fetch, timeout=timeout, on_page=stream) if to_fetch else {}
+        if self.cache is not None:
+            for url, page in fetched.items():
+                try:
+                    self.cache.put_page(url, page)
+                except Exception as exc:  # pragma: no cover - 缓存写入失败不影响搜索
+                    logger.debug("Failed to cache page %s: %s", url, exc)
+        pages.update(fetched)
+
+        missing = 0
+        for item in targets:
+            page = pages.get(item["url"])
+            if page:
+                item["raw_content"] = _limit_text(page, max_tokens)
+            else:
+                missing += 1
 
-        answer_box = response.get("answer_box") or {}
-        answer = answer_box.get("answer") or answer_box.get("snippet")
+        if missing:
+            # 部分页面抓取失败的结果不写入缓存，避免在整个 TTL 内反复返回摘要
+            payload["partial"] = True
+            payload.setdefault("notices", []).append(
+                f"{missing} 个页面在 {timeout:g}s 内未能抓取全文，已使用摘要代替"
+            )
+
+    def _start_ingest(self, namespace: str | None) -> _RagIngestBatch | None:
+        if self.rag_tool is None:
+            logger.warning("ingest_to_rag 已开启但未配置 rag_tool，跳过入库")
+            return None
+        if self._ingest_pool is None:
+            self._ingest_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-rag-ingest")
+        ingest = _RagIngestBatch(
+            self.rag_tool,
+            self._ingest_pool,
+            namespace=namespace or self.rag_namespace,
+            ttl=self.rag_ttl,
+        )
+        with self._ingest_lock:
+            self._ingest_batches[ingest.batch_id] = ingest
+            while len(self._ingest_batches) > MAX_TRACKED_INGESTS:
+                self._ingest_batches.popitem(last=False)
+            now = time.monotonic()
+            due = now - self._last_rag_expire.get(ingest.namespace, float("-inf")) >= DEFAULT_RAG_EXPIRE_INTERVAL
+            if due:
+                self._last_rag_expire[ingest.namespace] = now
+        if due:
+            # 过期清理是独立的后台维护步骤，不计入本次入库批次
+            self._ingest_pool.submit(self.expire_rag_pages, ingest.namespace)
+        return ingest
+
+    def expire_rag_pages(self, namespace: str | None = None, grace: float = DEFAULT_RAG_EXPIRE_GRACE) -> int:
+        """清理命名空间中过期超过 grace 秒的网页分块，返回清理的页面数"""
+        if self.rag_tool is None:
+            return 0
+        try:
+            return self.rag_tool.expire_web_pages(namespace or self.rag_namespace, grace=grace)
+        except Exception as exc:
+            logger.warning("清理过期网页失败: %s", exc)
+            return 0
+
+    def get_ingest_status(self, batch_id: str) -> Dict[str, Any] | None:
+        """查询一次搜索的入库进度（不等待）；批次过旧或不存在时返回 None"""
+        with self._ingest_lock:
+            ingest = self._ingest_batches.get(batch_id)
+        return ingest.wait(0) if ingest is not None else None
+
+    def _finish_ingest(
+        self,
+        ingest: _RagIngestBatch,
+        payload: Dict[str, Any],
+        *,
+        top_n: int,
+        wait_timeout: float = DEFAULT_INGEST_WAIT,
+    ) -> None:
+        """补交未在抓取阶段入库的页面（如结果来自缓存），最多等待 wait_timeout 秒后返回
+
+        未完成的入库继续在后台执行，可用 rag_ingest.batch_id 通过 get_ingest_status() 查询。
+
+        只入库实际抓取到的全文；抓取失败时 raw_content 可能只是截断的摘要，不入库。
+        """
+        if self.cache is not None:
+            for item in (payload.get("results") or [])[: max(0, top_n)]:
+                url = item.get("url")
+                if not url or url in ingest.submitted:
+                    continue
+                body = self.cache.get_page(url)
+                if body:
+                    ingest.submit(url, item.get("title"), body)
+
+        summary = ingest.wait(max(0.0, wait_timeout))
+        summary["batch_id"] = ingest.batch_id
+        payload["rag_ingest"] = summary
+        written = summary.get("added", 0) + summary.get("updated", 0)
+        unchanged = summary.get("skipped", 0) + summary.get("refreshed", 0)
+        notice = f"已将 {written} 个页面写入知识库（命名空间 {summary['namespace']}，{summary['chunks']} 个分块）"
+        if unchanged:
+            notice += f"，{unchanged} 个未变化页面已跳过"
+        if summary.get("failed"):
+            notice += f"，{summary['failed']} 个页面入库失败"
+        if summary.get("pending"):
+            notice += f"，{summary['pending']} 个页面仍在后台入库"
+        payload.setdefault("notices", []).append(notice)
+
+    def _search_backends(
+        self,
+        *,
+        query: str,
+        fetch_full_page: bool,
+        max_results: int,
+        max_tokens: int,
+        strategy: str,
+        backends: List[str] | None,
+    ) -> Dict[str, Any]:
+        if self.router is None or not self.router.names:
+            raise RuntimeError("没有可用的搜索后端，请配置 SERPAPI_API_KEY / TAVILY_API_KEY 或安装 ddgs")
+
+        response = self.router.search(
+            query,
+            max_results=max_results,
+            strategy=strategy,
+            backends=backends,
+        )
 
         results = []
-        for item in response.get("organic_results", [])[:max_results]:
-            raw_content = item.get("snippet")
+        for item in (response.get("results") or [])[:max_results]:
+            raw_content = item.get("raw_content")
+            if raw_content is None and fetch_full_page:
+                raw_content = item.get("content") or None
             if raw_content and fetch_full_page:
                 raw_content = _limit_text(raw_content, max_tokens)
             results.append(
                 _normalized_result(
-                    title=item.get("title") or item.get("link", ""),
-                    url=item.get("link", ""),
-                    content=item.get("snippet") or "",
+                    title=item.get("title") or item.get("url", ""),
+                    url=item.get("url", ""),
+                    content=item.get("content") or "",
                     raw_content=raw_content,
                 )
             )
 
-        return _structured_payload(results, answer=answer)
+        payload = _structured_payload(
+            results,
+            answer=response.get("answer"),
+            notices=response.get("notices"),
+        )
+        payload["backend"] = response.get("backend")
+        return payload
 
     def _format_text_response(self, *, query: str, payload: Dict[str, Any]) -> str:
         answer = payload.get("answer")
         notices = payload.get("notices") or []
         results = payload.get("results") or []
 
-        lines = [f"🔍 搜索关键词：{query}", f"🧭 使用搜索源：google"]
+        lines = [f"🔍 搜索关键词：{query}", f"🧭 使用搜索源：{payload.get('backend') or 'unknown'}"]
         if answer:
             lines.append(f"💡 直接答案：{answer}")
 
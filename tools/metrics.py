@@ -0,0 +1,217 @@
+"""工具调用指标 - 记录每个工具的延迟、错误与载荷大小
+
+为 ToolRegistry 与各 Agent 的工具调用提供统一的观测数据：
+- 调用次数、异常次数
+- 延迟直方图（p50/p95/p99）
+- 输入/输出字节数与估算 token 数
+- 快照 API 与 Prometheus 文本导出
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import bisect
+import json
+import threading
+
+# 延迟直方图桶（秒），与 Prometheus 默认桶接近，补充了慢工具常见的长尾区间
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# 用于计算分位数的最近样本数
+DEFAULT_SAMPLE_SIZE = 1024
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本 token 数（复用 context.builder.count_tokens，与上下文预算口径一致）"""
+    # 延迟导入：context.builder 依赖 tools 包，模块级导入会形成循环
+    from context.builder import count_tokens
+    return count_tokens(text)
+
+
+def _payload_text(payload: Any) -> str:
+    """将工具输入/输出统一转换为文本以便计量"""
+    if payload is None:
+        return ""
+    if isinstance(payload, str):
+        return payload
+    try:
+        return json.dumps(payload, ensure_ascii=False, default=str)
+    except Exception:
+        return str(payload)
+
+
+def _percentile(sorted_samples: List[float], q: float) -> float:
+    """最近邻分位数（样本已排序）"""
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, max(0, int(round(q * (len(sorted_samples) - 1)))))
+    return sorted_samples[idx]
+
+
+class _ToolStats:
+    """单个工具的累计统计"""
+
+    def __init__(self, buckets: Tuple[float, ...], sample_size: int):
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.samples: deque = deque(maxlen=sample_size)
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+
+class ToolMetrics:
+    """工具调用指标收集器（线程安全）
+
+    用法:
+        metrics = ToolMetrics()
+        metrics.record("search", input_payload, output, latency=0.42)
+        metrics.snapshot()          # 字典快照
+        metrics.to_prometheus()     # Prometheus 文本格式
+    """
+
+    def __init__(
+            self,
+            buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+            sample_size: int = DEFAULT_SAMPLE_SIZE
+    ):
+        self.buckets = tuple(sorted(buckets))
+        self.sample_size = sample_size
+        self._stats: Dict[str, _ToolStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+            self,
+            tool_name: str,
+            input_payload: Any,
+            output: Any,
+            latency: float,
+            error: bool = False
+    ) -> None:
+        """记录一次工具调用
+
+        Args:
+            tool_name: 工具名称
+            input_payload: 工具输入（字符串或参数字典）
+            output: 工具输出（异常时可为错误信息）
+            latency: 耗时（秒）
+            error: 是否发生异常
+        """
+        input_text = _payload_text(input_payload)
+        output_text = _payload_text(output)
+        input_bytes = len(input_text.encode("utf-8"))
+        output_bytes = len(output_text.encode("utf-8"))
+        input_tokens = estimate_tokens(input_text)
+        output_tokens = estimate_tokens(output_text)
+        latency = max(0.0, float(latency))
+
+        with self._lock:
+            stats = self._stats.get(tool_name)
+            if stats is None:
+                stats = _ToolStats(self.buckets, self.sample_size)
+                self._stats[tool_name] = stats
+
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.latency_sum += latency
+            stats.latency_max = max(stats.latency_max, latency)
+            stats.bucket_counts[bisect.bisect_left(self.buckets, latency)] += 1
+            stats.samples.append(latency)
+            stats.input_bytes += input_bytes
+            stats.output_bytes += output_bytes
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+
+    def snapshot(self, tool_name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """获取指标快照
+
+        Args:
+            tool_name: 只返回指定工具（默认返回全部）
+
+        Returns:
+            {tool_name: {calls, errors, latency_p50, ...}}
+        """
+        with self._lock:
+            items = [
+                (name, stats) for name, stats in self._stats.items()
+                if tool_name is None or name == tool_name
+            ]
+            result = {}
+            for name, stats in items:
+                samples = sorted(stats.samples)
+                calls = stats.calls or 1
+                result[name] = {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "error_rate": stats.errors / calls,
+                    "latency_avg": stats.latency_sum / calls,
+                    "latency_max": stats.latency_max,
+                    "latency_p50": _percentile(samples, 0.50),
+                    "latency_p95": _percentile(samples, 0.95),
+                    "latency_p99": _percentile(samples, 0.99),
+                    "input_bytes": stats.input_bytes,
+                    "output_bytes": stats.output_bytes,
+                    "input_tokens": stats.input_tokens,
+                    "output_tokens": stats.output_tokens,
+                }
+            return result
+
+    def to_prometheus(self, prefix: str = "myagents_tool") -> str:
+        """导出 Prometheus 文本格式（exposition format 0.0.4）"""
+        lines: List[str] = []
+        with self._lock:
+            items = sorted(self._stats.items())
+
+            def metric_header(name: str, metric_type: str, help_text: str):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+
+            metric_header("calls_total", "counter", "Total tool calls.")
+            for name, stats in items:
+                lines.append(f'{prefix}_calls_total{{tool="{_escape_label(name)}"}} {stats.calls}')
+
+            metric_header("errors_total", "counter", "Total tool calls that raised an exception.")
+            for name, stats in items:
+                lines.append(f'{prefix}_errors_total{{tool="{_escape_label(name)}"}} {stats.errors}')
+
+            metric_header("latency_seconds", "histogram", "Tool call latency in seconds.")
+            for name, stats in items:
+                label = _escape_label(name)
+                cumulative = 0
+                for bound, count in zip(self.buckets, stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_latency_seconds_bucket{{tool="{label}",le="{bound:g}"}} {cumulative}')
+                cumulative += stats.bucket_counts[-1]
+                lines.append(f'{prefix}_latency_seconds_bucket{{tool="{label}",le="+Inf"}} {cumulative}')
+                lines.append(f'{prefix}_latency_seconds_sum{{tool="{label}"}} {stats.latency_sum:.6f}')
+                lines.append(f'{prefix}_latency_seconds_count{{tool="{label}"}} {stats.calls}')
+
+            for metric, attr, help_text in (
+                    ("input_bytes_total", "input_bytes", "Total tool input size in bytes."),
+                    ("output_bytes_total", "output_bytes", "Total tool output size in bytes."),
+                    ("input_tokens_total", "input_tokens", "Estimated total tool input tokens."),
+                    ("output_tokens_total", "output_tokens", "Estimated total tool output tokens."),
+            ):
+                metric_header(metric, "counter", help_text)
+                for name, stats in items:
+                    lines.append(f'{prefix}_{metric}{{tool="{_escape_label(name)}"}} {getattr(stats, attr)}')
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self, tool_name: Optional[str] = None) -> None:
+        """清空指标"""
+        with self._lock:
+            if tool_name is None:
+                self._stats.clear()
+            else:
+                self._stats.pop(tool_name, None)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
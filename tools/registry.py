@@ -1,7 +1,10 @@
 """工具注册表 - MyAgents原生工具系统"""
 
 from typing import Optional, Any, Callable
+import time
+
 from .base import Tool
+from .metrics import ToolMetrics
 
 class ToolRegistry:
     """
@@ -13,9 +16,11 @@ class ToolRegistry:
     2. 函数直接注册（简便）
     """
 
-    def __init__(self):
+    def __init__(self, metrics: Optional[ToolMetrics] = None):
         self._tools: dict[str, Tool] = {}
         self._functions: dict[str, dict[str, Any]] = {}
+        # 工具调用指标（延迟、错误、载荷大小）
+        self.metrics = metrics or ToolMetrics()
 
     def register_tool(self, tool: Tool, auto_expand: bool = True):
         """
@@ -96,23 +101,41 @@ class ToolRegistry:
         # 优先查找Tool对象
         if name in self._tools:
             tool = self._tools[name]
+            start = time.perf_counter()
             try:
                 # 简化参数传递，直接传入字符串
-                return tool.run({"input": input_text})
+                result = tool.run({"input": input_text})
             except Exception as e:
-                return f"错误：执行工具 '{name}' 时发生异常: {str(e)}"
+                result = f"错误：执行工具 '{name}' 时发生异常: {str(e)}"
+                self.metrics.record(name, input_text, result, time.perf_counter() - start, error=True)
+                return result
+            self.metrics.record(name, input_text, result, time.perf_counter() - start)
+            return result
 
         # 查找函数工具
         elif name in self._functions:
             func = self._functions[name]["func"]
+            start = time.perf_counter()
             try:
-                return func(input_text)
+                result = func(input_text)
             except Exception as e:
-                return f"错误：执行工具 '{name}' 时发生异常: {str(e)}"
+                result = f"错误：执行工具 '{name}' 时发生异常: {str(e)}"
+                self.metrics.record(name, input_text, result, time.perf_counter() - start, error=True)
+                return result
+            self.metrics.record(name, input_text, result, time.perf_counter() - start)
+            return result
 
         else:
             return f"错误：未找到名为 '{name}' 的工具。"
 
+    def get_metrics_snapshot(self, name: Optional[str] = None) -> dict[str, dict[str, Any]]:
+        """获取工具调用指标快照（调用次数、延迟分位数、错误数、载荷大小）"""
+        return self.metrics.snapshot(name)
+
+    def export_prometheus_metrics(self) -> str:
+        """以 Prometheus 文本格式导出工具调用指标"""
+        return self.metrics.to_prometheus()
+
     def get_tools_description(self) -> str:
         """
         获取所有可用工具的格式化描述字符串